@@ -1,11 +1,10 @@
 import streamlit as st
 import argparse
 import pandas as pd
-import json
 import time
 from datetime import datetime
 from streamlit_autorefresh import st_autorefresh
-from database_utils import connect_to_database, close_connection, query_recent_blocks
+from explorer_data import recent_blocks as load_recent_blocks
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Block ingestion script for Substrate-based chains")
@@ -56,6 +55,12 @@ count = st_autorefresh(interval=30000, limit=100, key="fizzbuzzcounter")
 
 placeholder = st.empty()
 
+
+def summary_value(value):
+    # Blocks ingested before the summary columns existed have none
+    return "n/a" if pd.isna(value) else int(value)
+
+
 chain = args.chain
 relay_chain = args.relay_chain
 
@@ -63,10 +68,7 @@ with placeholder.container():
 
     try:
 
-        db_connection = connect_to_database(database_info)
-        fetch_last_block_query = f"SELECT * FROM blocks_{args.relay_chain}_{args.chain} ORDER BY number DESC LIMIT 50"
-        recent_blocks = query_recent_blocks(db_connection, database_info, chain, relay_chain)
-        close_connection(db_connection, database_info)
+        recent_blocks = load_recent_blocks(database_info, chain, relay_chain)
 
         recent_blocks['timestamp'] = recent_blocks['timestamp'].apply(lambda x: datetime.fromtimestamp(x/1000).strftime("%Y-%m-%d %H:%M:%S") )
 
@@ -91,46 +93,25 @@ with placeholder.container():
         # Create two columns for displaying extrinsics and events metrics
         extrinsics_col, events_col = st.columns(2)
 
+        head = recent_blocks.iloc[0]
+
         # Display the number of extrinsics in the most recent block
-        if args.database == 'postgres':
-            num_extrinsics = len(recent_blocks['extrinsics'].iloc[0])
-        elif args.database == 'mysql':
-            num_extrinsics = len(json.loads(recent_blocks['extrinsics'].iloc[0]))
-        elif args.database == 'bigquery':
-            num_extrinsics = len(recent_blocks['extrinsics'].iloc[0])
-        else:
-            num_extrinsics = 0  # Default value if database type is not recognized
-        extrinsics_col.metric("Extrinsics", num_extrinsics)
-
-        # Calculate the total number of events in the most recent block
-        if args.database == 'postgres':
-            num_events = (
-                len(recent_blocks['onfinalize'].iloc[0]['events']) +
-                len(recent_blocks['oninitialize'].iloc[0]['events']) +
-                sum(len(ex['events']) for ex in recent_blocks['extrinsics'].iloc[0])
-            )
-        elif args.database == 'mysql':
-            num_events = (
-                len(json.loads(recent_blocks['onfinalize'].iloc[0])['events']) +
-                len(json.loads(recent_blocks['oninitialize'].iloc[0])['events']) +
-                sum(len(ex['events']) for ex in json.loads(recent_blocks['extrinsics'].iloc[0]))
-            )
-        elif args.database == 'bigquery':
-            num_events = (
-                len(recent_blocks['onfinalize'].iloc[0]['events']) +
-                len(recent_blocks['oninitialize'].iloc[0]['events']) +
-                sum(len(ex['events']) for ex in recent_blocks['extrinsics'].iloc[0])
-            )
-        else:
-            num_events = 0  # Default value if database type is not recognized
-        
+        extrinsics_col.metric("Extrinsics", summary_value(head['extrinsic_count']))
+
         # Display the total number of events
-        events_col.metric("Events", num_events)
+        events_col.metric("Events", summary_value(head['event_count']))
+
+        # Display the signed and failed extrinsics, fees and weight of the most recent block
+        signed_col, failed_col, fee_col, weight_col = st.columns(4)
+        signed_col.metric("Signed Extrinsics", summary_value(head['signed_extrinsic_count']))
+        failed_col.metric("Failed Extrinsics", summary_value(head['failed_extrinsic_count']))
+        fee_col.metric("Fees", summary_value(head['total_fee']))
+        weight_col.metric("Weight", summary_value(head['weight']))
 
         # Display a table of the most recent blocks
         st.header("Recent Blocks")
 
-        st.dataframe(recent_blocks[['number', 'timestamp', 'hash', 'finalized']])
+        st.dataframe(recent_blocks[['number', 'timestamp', 'hash', 'finalized', 'extrinsic_count', 'event_count']])
         
     except Exception as e:
         st.error("Oops...something went wrong, please refresh the page")
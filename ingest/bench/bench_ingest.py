@@ -0,0 +1,196 @@
+"""
+End-to-end ingest throughput benchmark against the stub sidecar.
+
+Serves the fixtures from stub_sidecar.py and runs main.py against it,
+in historical or live mode, once per backend. Every run is a fresh process
+with --reset_tables, so results do not depend on earlier runs. It reports
+blocks/sec, p50/p99 per stage from the --profile hooks, and the process's peak
+RSS:
+
+    python bench/bench_ingest.py --backend parquet --mode historical --blocks 2000 --workers 8
+    python bench/bench_ingest.py --backend parquet --backend postgres --db_host localhost \\
+        --db_port 5432 --db_user postgres --db_password postgres --db_name bench
+
+parquet and sqlite need no server. postgres, mysql and bigquery use the
+--db_* options, typically pointing at local containers. In live mode the stub
+head advances every --block_time seconds.
+The run ends once --blocks blocks are written. Set --block_time below the
+ingest's per-block time to measure live throughput rather than the block rate.
+
+The shipped fixtures are synthetic (see fixtures.py), so the results compare
+changes against each other rather than predicting throughput on a real chain.
+Use --json to keep the results for comparing before and after a change.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import FIXTURES_DIR
+from stub_sidecar import StubSidecar
+
+FIRST_BLOCK = 1000000
+STAGES = ('fetch', 'transform', 'encode')
+# Seconds between profile windows collected from the ingest process
+COLLECT_INTERVAL = 1
+
+
+def run_ingest(ingest_argv, target_blocks, connection, verbose=False):
+    """
+    Run main.py in this (child) process until it finishes or has written target_blocks blocks.
+
+    Sends a dict with the elapsed time, the profile samples and the peak RSS over connection.
+    """
+    if not verbose:
+        sys.stdout = open(os.devnull, "w")
+    import main
+    import profiling
+
+    blocks, batches = [], []
+    written = threading.Event()
+
+    def collect(window_blocks, window_batches, elapsed):
+        blocks.extend(window_blocks)
+        batches.extend(window_batches)
+        if sum(size for _, size in batches) >= target_blocks:
+            written.set()
+
+    profiling.start(COLLECT_INTERVAL, on_report=collect)
+    sys.argv = ["main.py"] + ingest_argv
+    started_at = time.perf_counter()
+    ingest = threading.Thread(target=main.main, daemon=True)
+    ingest.start()
+    # Live mode never returns, so the run also ends once enough blocks are written
+    while ingest.is_alive() and not written.wait(0.05):
+        pass
+    elapsed = time.perf_counter() - started_at
+    profiling.stop()
+
+    connection.send({
+        'elapsed': elapsed,
+        'blocks': [(block['timings'], block['extrinsics'], block['bytes']) for block in blocks],
+        'batches': batches,
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    })
+    connection.close()
+    # Skips joining the live loop and the pools' threads
+    os._exit(0)
+
+
+def summarize(backend, mode, result):
+    from profiling import percentile
+
+    written = sum(size for _, size in result['batches'])
+    row = {
+        'backend': backend,
+        'mode': mode,
+        'blocks': written,
+        'seconds': round(result['elapsed'], 2),
+        'blocks_per_second': round(written / max(result['elapsed'], 1e-9), 1),
+        'max_rss_mb': round(result['max_rss_kb'] / 1024, 1),
+    }
+    stage_values = {stage: [] for stage in STAGES}
+    for timings, _, _ in result['blocks']:
+        for stage, seconds in timings.items():
+            stage_values.setdefault(stage, []).append(seconds)
+    stage_values['write/block'] = [seconds / max(1, size) for seconds, size in result['batches']]
+    for stage, values in stage_values.items():
+        values.sort()
+        row[f'{stage} p50 ms'] = round(percentile(values, 50) * 1000, 2)
+        row[f'{stage} p99 ms'] = round(percentile(values, 99) * 1000, 2)
+    return row
+
+
+def database_argv(args, backend, data_dir):
+    if backend == 'parquet':
+        return ["--database", "parquet", "--db_path", os.path.join(data_dir, "lake")]
+    if backend == 'sqlite':
+        return ["--database", "sqlite", "--db_path", os.path.join(data_dir, "bench.sqlite")]
+    argv = ["--database", backend, "--db_path", data_dir]
+    for option in ("db_host", "db_port", "db_user", "db_password", "db_name", "db_project",
+                   "db_dataset", "db_table", "db_cred_path"):
+        value = getattr(args, option)
+        if value is not None:
+            argv += [f"--{option}", str(value)]
+    return argv
+
+
+def run_benchmark(args, backend, mode):
+    head = FIRST_BLOCK + args.blocks - 1 if mode == "historical" else FIRST_BLOCK
+    stub = StubSidecar(args.fixtures_dir, head=head, block_time=args.block_time if mode == "live" else None,
+                       latency=args.latency_ms / 1000).start()
+    data_dir = tempfile.mkdtemp(prefix=f"bench-{backend}-")
+    ingest_argv = [
+        "--chain", "bench", "--relay_chain", "bench", "--ingest_mode", mode,
+        "--start_block", str(FIRST_BLOCK), "--end_block", str(head),
+        "--wss", "ws://127.0.0.1:1", "--sidecar_url", stub.url, "--poll_only", "--poll_interval", str(args.poll_interval),
+        "--workers", str(args.workers), "--batch_size", str(args.batch_size), "--reset_tables",
+    ] + database_argv(args, backend, data_dir) + args.ingest_args
+
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=run_ingest, args=(ingest_argv, args.blocks, sender, args.verbose))
+    try:
+        process.start()
+        sender.close()
+        if not receiver.poll(args.timeout):
+            raise TimeoutError(f"{backend} {mode} did not finish within {args.timeout}s")
+        return summarize(backend, mode, receiver.recv())
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        stub.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def print_results(rows):
+    columns = ['backend', 'mode', 'blocks', 'seconds', 'blocks_per_second'] + \
+        [f'{stage} {p} ms' for stage in STAGES + ('write/block',) for p in ('p50', 'p99')] + ['max_rss_mb']
+    widths = [max(len(column), *(len(str(row.get(column, ''))) for row in rows)) for column in columns]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row.get(column, '')).rjust(width) for column, width in zip(columns, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark main.py against a stub sidecar serving block fixtures")
+    parser.add_argument("--backend", action="append", help="Database type to benchmark (repeatable, default parquet)")
+    parser.add_argument("--mode", action="append", choices=["historical", "live"], help="Ingest mode (repeatable, default historical)")
+    parser.add_argument("--blocks", type=int, default=1000, help="Blocks to ingest per run")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch_size", type=int, default=50)
+    parser.add_argument("--block_time", type=float, default=0.01, help="Seconds between stub heads in live mode")
+    parser.add_argument("--poll_interval", type=float, default=0.05, help="Seconds between head polls in live mode")
+    parser.add_argument("--latency_ms", type=float, default=0, help="Delay the stub adds to every response")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds before a run is abandoned")
+    parser.add_argument("--fixtures_dir", default=FIXTURES_DIR)
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the ingest output")
+    for option in ("db_host", "db_port", "db_user", "db_password", "db_name", "db_project", "db_dataset", "db_table", "db_cred_path"):
+        parser.add_argument(f"--{option}")
+    parser.add_argument("ingest_args", nargs=argparse.REMAINDER, help="Extra main.py arguments, after --")
+    args = parser.parse_args()
+    args.ingest_args = [arg for arg in args.ingest_args if arg != "--"]
+
+    rows = []
+    for backend in args.backend or ["parquet"]:
+        for mode in args.mode or ["historical"]:
+            print(f"Running {mode} ingest of {args.blocks} blocks into {backend}")
+            rows.append(run_benchmark(args, backend, mode))
+    print_results(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Micro-benchmark block serialization over the benchmark fixtures.
+
+Compares the original double encoding (every args/info/data/value encoded in
+place, then the whole structure encoded again) with serializer.py using the
+standard library json module and, when installed, orjson.
+
+    python bench/bench_serializer.py --iterations 50
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serializer
+from write_block import transformBlock
+from fixtures import FIXTURES_DIR, load_fixtures
+
+POSTGRES_COLUMNS = (
+    "relay_chain", "chain", "timestamp", "number", "hash", "parenthash", "stateroot",
+    "extrinsicsroot", "authorid", "finalized", "oninitialize", "onfinalize", "logs", "extrinsics"
+)
+
+
+def legacy_row(block_data):
+    block_data = transformBlock(block_data, "bench", "bench")
+    for log in block_data['logs']:
+        log['value'] = json.dumps(log['value'])
+    for event in block_data['onInitialize']['events'] + block_data['onFinalize']['events']:
+        event['data'] = json.dumps(event['data'])
+    for extrinsic in block_data['extrinsics']:
+        extrinsic['args'] = json.dumps(extrinsic['args'])
+        extrinsic['info'] = json.dumps(extrinsic['info'])
+        for event in extrinsic['events']:
+            event['data'] = json.dumps(event['data'])
+    return (
+        json.dumps(block_data['onInitialize']), json.dumps(block_data['onFinalize']),
+        json.dumps(block_data['logs']), json.dumps(block_data['extrinsics'])
+    )
+
+
+def serializer_row(block_data):
+    return serializer.sql_row(transformBlock(block_data, "bench", "bench"), POSTGRES_COLUMNS)
+
+
+def serializer_bigquery_row(block_data):
+    return serializer.bigquery_row(transformBlock(block_data, "bench", "bench"))
+
+
+def time_variant(raw, build_row, iterations):
+    """
+    Returns:
+        tuple: (microseconds per block, encoded bytes per block)
+    """
+    # Decoding is done up front so only the transform + encode is timed.
+    blocks = [json.loads(raw) for _ in range(iterations)]
+    started_at = time.perf_counter()
+    for block_data in blocks:
+        row = build_row(block_data)
+    elapsed = time.perf_counter() - started_at
+    if isinstance(row, dict):
+        encoded = len(json.dumps(row))
+    else:
+        encoded = sum(len(value) for value in row if isinstance(value, str))
+    return elapsed / iterations * 1e6, encoded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark block serialization")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--fixtures_dir", default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    fast_json = serializer.orjson
+    variants = [("legacy double encode", legacy_row, None)]
+    variants.append(("serializer json", serializer_row, None))
+    if fast_json is not None:
+        variants.append(("serializer orjson", serializer_row, fast_json))
+    variants.append(("serializer bigquery", serializer_bigquery_row, fast_json))
+
+    print(f"{'fixture':<20} {'extrinsics':>10} {'variant':<22} {'us/block':>10} {'bytes':>10}")
+    for name, raw in load_fixtures(args.fixtures_dir).items():
+        extrinsics = len(json.loads(raw)['extrinsics'])
+        for label, build_row, json_library in variants:
+            serializer.orjson = json_library
+            micros, encoded = time_variant(raw, build_row, args.iterations)
+            print(f"{name:<20} {extrinsics:>10} {label:<22} {micros:>10.0f} {encoded:>10}")
+    serializer.orjson = fast_json
+
+
+if __name__ == "__main__":
+    main()
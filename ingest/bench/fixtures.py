@@ -0,0 +1,45 @@
+"""
+Benchmark fixtures: gzipped sidecar /blocks/{id} responses.
+
+The fixtures shipped in fixtures/ are synthetic. They follow sidecar's response
+shape, with a quiet block, transfers, parachain inclusions and a large
+utility.batchAll with XCM, but the numbers, timestamps, hashes and signatures
+are made up. Extrinsic and event counts are chosen to exercise the transforms,
+not sampled from a real chain. Record real blocks with record_fixtures.py to
+benchmark on a representative mix.
+"""
+import glob
+import gzip
+import json
+import os
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def fixture_path(name, directory=FIXTURES_DIR):
+    return os.path.join(directory, f"{name}.json.gz")
+
+
+def load_fixture_text(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return f.read()
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """
+    Load every sidecar /blocks/{id} response fixture in directory.
+
+    Returns:
+        dict: Fixture name -> raw response text, in name order.
+    """
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*.json.gz'))):
+        name = os.path.basename(path)[:-len('.json.gz')]
+        fixtures[name] = load_fixture_text(path)
+    return fixtures
+
+
+def save_fixture(name, block_data, directory=FIXTURES_DIR):
+    os.makedirs(directory, exist_ok=True)
+    with gzip.open(fixture_path(name, directory), 'wt', encoding='utf-8') as f:
+        json.dump(block_data, f, separators=(',', ':'))
@@ -0,0 +1,36 @@
+"""
+Record sidecar /blocks/{id} responses as benchmark fixtures.
+
+    python bench/record_fixtures.py --sidecar_url http://localhost:8080 \
+        --block relay_transfers=<block number> --block relay_batch_xcm=<block number>
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sidecar_client import SidecarClient
+from fixtures import FIXTURES_DIR, save_fixture
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Record sidecar block responses as benchmark fixtures")
+    parser.add_argument("--sidecar_url", required=True, help="Base URL of the Substrate API Sidecar")
+    parser.add_argument("--block", required=True, action="append", help="Fixture to record, as name=block_number")
+    parser.add_argument("--output_dir", default=FIXTURES_DIR, help="Directory to write fixtures to")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    client = SidecarClient(args.sidecar_url)
+    for spec in args.block:
+        name, block_id = spec.split('=', 1)
+        response = client.get_block(block_id)
+        save_fixture(name, response.data, args.output_dir)
+        print(f"Recorded block {block_id} as {name} ({len(response.data['extrinsics'])} extrinsics, {response.latency:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
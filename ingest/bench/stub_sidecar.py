@@ -0,0 +1,145 @@
+"""
+A local stand-in for Substrate API Sidecar that serves the benchmark fixtures.
+
+Block n is fixture n mod the number of fixtures, with its number, hash and
+parentHash rewritten so consecutive blocks form a chain. The head is either
+fixed or advances one block every block_time seconds, for live mode. Responses
+are encoded once per fixture up front, so the stub costs little CPU next to the
+ingest it serves.
+
+Serves /blocks/{id}, /blocks/{id}/header, /blocks/head and /blocks/head/header
+(the finalized query parameter is ignored: every block is final). Run it on its
+own to point a full ingest deployment at it:
+
+    python bench/stub_sidecar.py --port 8080 --head 1000000 --block_time 6
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import FIXTURES_DIR, load_fixtures
+
+BLOCK_PATH = re.compile(r"^/blocks/(head|\d+)(/header)?/?$")
+HEADER_FIELDS = ('parentHash', 'number', 'stateRoot', 'extrinsicsRoot')
+PLACEHOLDERS = {'number': "@@number@@", 'hash': "@@hash@@", 'parentHash': "@@parentHash@@"}
+
+
+def block_hash(number):
+    return f"0x{number:064x}"
+
+
+class StubSidecar:
+    """
+    Serve the fixtures over HTTP in a background thread.
+
+    Attributes:
+        url (str): Base URL to pass as --sidecar_url.
+        requests (int): Block and header requests served.
+    """
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR, head=None, block_time=None, latency=0, host='127.0.0.1', port=0):
+        fixtures = load_fixtures(fixtures_dir)
+        if not fixtures:
+            raise ValueError(f"No fixtures in {fixtures_dir}")
+        self.blocks = []
+        self.headers = []
+        for text in fixtures.values():
+            block_data = json.loads(text)
+            block_data.update(PLACEHOLDERS)
+            self.blocks.append(json.dumps(block_data, separators=(',', ':')))
+            header = {field: block_data[field] for field in HEADER_FIELDS}
+            header['digest'] = {'logs': []}
+            self.headers.append(json.dumps(header, separators=(',', ':')))
+        self.head = head
+        self.block_time = block_time
+        self.latency = latency
+        self.requests = 0
+        self.started_at = time.monotonic()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_port}"
+
+    def current_head(self):
+        if self.block_time:
+            return self.head + int((time.monotonic() - self.started_at) / self.block_time)
+        return self.head
+
+    def render(self, number, header=False):
+        templates = self.headers if header else self.blocks
+        text = templates[number % len(templates)]
+        text = text.replace(f'"{PLACEHOLDERS["number"]}"', f'"{number}"')
+        text = text.replace(f'"{PLACEHOLDERS["hash"]}"', f'"{block_hash(number)}"')
+        text = text.replace(f'"{PLACEHOLDERS["parentHash"]}"', f'"{block_hash(number - 1)}"')
+        return text.encode()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                match = BLOCK_PATH.match(self.path.split('?', 1)[0])
+                if match is None:
+                    self.send_error(404)
+                    return
+                head = stub.current_head()
+                block_id, header = match.groups()
+                number = head if block_id == 'head' else int(block_id)
+                if number > head:
+                    self.send_error(404, f"Block {number} is past the head {head}")
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+                body = stub.render(number, header=header is not None)
+                stub.requests += 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.started_at = time.monotonic()
+        threading.Thread(target=self._server.serve_forever, name="stub-sidecar", daemon=True).start()
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve sidecar block fixtures")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (0.0.0.0 to reach it from containers)")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--head", type=int, default=1000000, help="Chain head (at startup, with --block_time)")
+    parser.add_argument("--block_time", type=float, help="Seconds between new heads (fixed head when unset)")
+    parser.add_argument("--latency_ms", type=float, default=0, help="Delay added to every response")
+    parser.add_argument("--fixtures_dir", default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    stub = StubSidecar(args.fixtures_dir, args.head, args.block_time, args.latency_ms / 1000, args.host, args.port)
+    print(f"Serving {len(stub.blocks)} fixtures at {stub.url}")
+    stub.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.close()
+
+
+if __name__ == "__main__":
+    main()
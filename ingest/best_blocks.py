@@ -0,0 +1,156 @@
+from database_utils import BlockBatcher, database_connection, delete_unfinalized_blocks, mark_blocks_finalized
+
+
+class BestBlockIngest:
+    """
+    Follow the best chain, writing each block as soon as it is imported, and flip
+    the finalized flag of written blocks with one UPDATE per range as finality
+    advances.
+
+    The hashes of the blocks written above the last finalized block are kept in
+    memory. A new block whose parentHash differs from the hash written at the
+    height below means the chain reorganized: the fork point is found by walking
+    parent hashes back through sidecar headers, and only the blocks above it are
+    fetched and written again. If the new best chain is shorter, the unfinalized
+    rows above its head are deleted once it has been written. Every row up to
+    last_block is therefore on the current best chain, no row above it survives a
+    reorg, and only those rows are ever marked finalized.
+
+    The checkpoint follows finalized_block, so a restart fetches the unfinalized
+    suffix again rather than trusting it.
+    """
+
+    def __init__(self, database_info, chain, relay_chain, sidecar_client, checkpoint, fetch_block, batch_size):
+        """
+        Args:
+            database_info (dict): Database connection settings.
+            chain (str): The name of the chain.
+            relay_chain (str): The name of the relay chain.
+            sidecar_client (SidecarClient): Client used to read headers while locating a fork point.
+            checkpoint (Checkpoint): The live checkpoint, advanced as blocks are finalized.
+            fetch_block (callable): Returns the transformed block for a block number, or raises.
+            batch_size (int): Blocks written per database batch.
+        """
+        self.database_info = database_info
+        self.chain = chain
+        self.relay_chain = relay_chain
+        self.sidecar_client = sidecar_client
+        self.checkpoint = checkpoint
+        self.fetch_block = fetch_block
+        # Never due on time: a cycle is written batch_size blocks at a time and flushed at its end
+        self.batcher = BlockBatcher(database_info, batch_size=batch_size, max_linger=float('inf'))
+        self.last_block = checkpoint.last_block
+        self.finalized_block = checkpoint.last_block
+        self.hashes = {}
+        # Rows above last_block may be orphaned: after a reorg, and after a restart, which forgets the hashes
+        self.prune_needed = True
+
+    def sync(self, best_head, finalized_head, finalized_parent_hash):
+        """
+        Write blocks up to best_head, then mark blocks up to finalized_head finalized.
+
+        Args:
+            best_head (int): Number of the best block.
+            finalized_head (int): Number of the finalized head.
+            finalized_parent_hash (str): parentHash of the finalized head, used to
+                catch orphaned blocks that no new best block has replaced yet.
+        """
+        if self.last_block < 0:
+            # First run: start from the finalized head
+            self.last_block = self.finalized_block = finalized_head - 1
+        parent = finalized_head - 1
+        if parent <= self.last_block and self.hashes.get(parent) not in (None, finalized_parent_hash):
+            self.rewind(self.find_fork_point(parent, finalized_parent_hash))
+        head = max(best_head, finalized_head)
+        if head < self.last_block:
+            # The best chain is now shorter than the written one; head itself is written again
+            parent_hash = self.sidecar_client.get_header(head).data['parentHash']
+            self.rewind(self.find_fork_point(head - 1, parent_hash))
+        self.ingest_to(head)
+        self.prune_above_head()
+        self.finalize_to(finalized_head)
+
+    def ingest_to(self, best_head):
+        block_id = self.last_block + 1
+        while block_id <= best_head:
+            block_data = self.fetch_block(block_id)
+            parent_hash = self.hashes.get(block_id - 1)
+            if parent_hash is not None and block_data['parentHash'] != parent_hash:
+                # Blocks already buffered are written first; re-ingesting overwrites any orphans among them
+                self.batcher.flush()
+                fork_point = self.find_fork_point(block_id - 1, block_data['parentHash'])
+                self.rewind(fork_point)
+                block_id = fork_point + 1
+                continue
+            self.batcher.add(block_data)
+            self.hashes[block_id] = block_data['hash']
+            self.last_block = block_id
+            print(f"Processed block {block_id}")
+            block_id += 1
+        self.batcher.flush()
+
+    def find_fork_point(self, number, chain_hash):
+        """
+        Find the highest written block that is still on the best chain.
+
+        Args:
+            number (int): Height to start from.
+            chain_hash (str): Hash of the best chain's block at that height.
+
+        Returns:
+            int: The fork point. Blocks above it were written from an orphaned fork.
+        """
+        while number > self.finalized_block and self.hashes.get(number) not in (None, chain_hash):
+            chain_hash = self.sidecar_client.get_header(number).data['parentHash']
+            number -= 1
+        return number
+
+    def rewind(self, fork_point):
+        print(f"Chain reorganized: re-ingesting blocks {fork_point + 1}..{self.last_block} from the new best chain")
+        for number in [number for number in self.hashes if number > fork_point]:
+            del self.hashes[number]
+        self.last_block = fork_point
+        self.prune_needed = True
+
+    def prune_above_head(self):
+        """
+        Delete the unfinalized rows above last_block, left by a fork longer than the best chain.
+        """
+        if not self.prune_needed:
+            return
+        try:
+            with database_connection(self.database_info) as db_connection:
+                delete_unfinalized_blocks(db_connection, self.database_info, self.chain, self.relay_chain, self.last_block)
+        except Exception as e:
+            # Blocks written later overwrite the rows they reach; the rest are deleted on the next cycle
+            print(f"Error deleting orphaned blocks above {self.last_block}: {e}")
+            return
+        self.prune_needed = False
+
+    def finalize_to(self, finalized_head):
+        end_block = min(finalized_head, self.last_block)
+        if end_block <= self.finalized_block:
+            return
+        try:
+            with database_connection(self.database_info) as db_connection:
+                mark_blocks_finalized(db_connection, self.database_info, self.chain, self.relay_chain,
+                                      self.finalized_block + 1, end_block)
+        except Exception as e:
+            # The written blocks are still valid; the range is retried on the next cycle
+            print(f"Error marking blocks {self.finalized_block + 1}..{end_block} finalized: {e}")
+            return
+        print(f"Marked blocks {self.finalized_block + 1}..{end_block} finalized")
+        self.finalized_block = end_block
+        self.checkpoint.advance_to(end_block)
+        # The finalized block's hash stays so the next block's parent can be checked
+        for number in [number for number in self.hashes if number < end_block]:
+            del self.hashes[number]
+
+    def reset(self):
+        """
+        Drop buffered blocks and go back to the last finalized block, after a failed cycle.
+        """
+        self.batcher.discard()
+        self.hashes.clear()
+        self.last_block = self.finalized_block
+        self.prune_needed = True
@@ -1,7 +1,18 @@
 import os
+import datetime
+import hashlib
+import io
+import threading
+import time
 from google.cloud import bigquery
 from google.oauth2 import service_account
 import json
+from serializer import bigquery_row, dumps, extrinsic_records, event_records
+
+# When each table may take its next batch in this process, and the batches that already hold a slot
+_next_load_at = {}
+_reserved_batches = set()
+_next_load_lock = threading.Lock()
 
 def connect_to_bigquery(project_id, credentials_path):
     """
@@ -23,6 +34,17 @@ def connect_to_bigquery(project_id, credentials_path):
 
     return bigquery.Client(credentials=credentials, project=project_id)
 
+# Per-block summary columns computed at ingest time
+SUMMARY_FIELDS = [
+    bigquery.SchemaField("extrinsic_count", "INTEGER"),
+    bigquery.SchemaField("event_count", "INTEGER"),
+    bigquery.SchemaField("signed_extrinsic_count", "INTEGER"),
+    bigquery.SchemaField("failed_extrinsic_count", "INTEGER"),
+    bigquery.SchemaField("total_fee", "BIGNUMERIC"),
+    bigquery.SchemaField("total_tip", "BIGNUMERIC"),
+    bigquery.SchemaField("weight", "INTEGER"),
+]
+
 def create_blocks_table(client, dataset_id, table_id, project_id):
     """
     Create the blocks table if it doesn't exist.
@@ -38,7 +60,7 @@ def create_blocks_table(client, dataset_id, table_id, project_id):
         bigquery.SchemaField("relay_chain", "STRING", mode="REQUIRED"),
         bigquery.SchemaField("chain", "STRING", mode="REQUIRED"),
         bigquery.SchemaField("timestamp", "INTEGER", mode="REQUIRED"),
-        bigquery.SchemaField("number", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("number", "INTEGER", mode="REQUIRED"),
         bigquery.SchemaField("hash", "STRING", mode="REQUIRED"),
         bigquery.SchemaField("parenthash", "STRING", mode="REQUIRED"),
         bigquery.SchemaField("stateroot", "STRING", mode="REQUIRED"),
@@ -96,12 +118,196 @@ def create_blocks_table(client, dataset_id, table_id, project_id):
             bigquery.SchemaField("index", "STRING"),
             bigquery.SchemaField("value", "STRING")
         ])
-    ]
+    ] + SUMMARY_FIELDS
 
     table = bigquery.Table(f"{project_id}.{dataset_id}.{table_id}", schema=schema)
+    # Clustering on number keeps head lookups and block ranges to a few storage blocks
+    table.clustering_fields = ["number"]
+    table = client.create_table(table, exists_ok=True)
+    migrate_number_column(client, table)
+    migrate_summary_columns(client, client.get_table(table.reference))
+    create_search_index(client, f"{project_id}.{dataset_id}.{table_id}", f"{table_id}_hash", ["hash"])
+    print(f"Created table {table.project}.{table.dataset_id}.{table.table_id}")
+
+def create_search_index(client, table_path, index_name, columns):
+    """
+    Create a search index for exact-match lookups on STRING columns, if it doesn't exist.
+    
+    BigQuery has no B-tree indexes. A search index with the no-op analyzer lets
+    `column = value` lookups skip the storage blocks that cannot match, once the
+    table is large enough for BigQuery to use it. A table can have only one
+    search index, so it covers every looked-up column. Creating it needs the
+    right edition and permissions, and lookups still work without it, so a
+    failure only prints a warning.
+    
+    Args:
+        client (google.cloud.bigquery.client.Client): A BigQuery client.
+        table_path (str): project.dataset.table of the indexed table.
+        index_name (str): The index name.
+        columns (list): The STRING columns to index.
+    """
+    try:
+        client.query(f"""
+        CREATE SEARCH INDEX IF NOT EXISTS {index_name}
+        ON `{table_path}` ({", ".join(columns)})
+        OPTIONS (analyzer = 'NO_OP_ANALYZER')
+        """).result()
+    except Exception as e:
+        print(f"Could not create search index {index_name} on {table_path}: {e}")
+
+def migrate_summary_columns(client, table):
+    """
+    Add the summary columns missing from a blocks table created without them.
+    
+    Adding NULLABLE columns is a metadata-only schema update; existing rows read
+    NULL until re-ingested.
+    
+    Args:
+        client (google.cloud.bigquery.client.Client): A BigQuery client.
+        table (google.cloud.bigquery.table.Table): The blocks table.
+    """
+    existing = {field.name for field in table.schema}
+    missing = [field for field in SUMMARY_FIELDS if field.name not in existing]
+    if not missing:
+        return
+    print(f"Adding summary columns {[field.name for field in missing]} to {table.table_id}")
+    table.schema = list(table.schema) + missing
+    client.update_table(table, ["schema"])
+
+def migrate_number_column(client, table):
+    """
+    Rewrite a blocks table created with a STRING number column to INT64, clustered by number.
+    
+    BigQuery cannot change STRING to INT64 with ALTER COLUMN, so the table is
+    replaced in place from its own contents.
+    
+    Args:
+        client (google.cloud.bigquery.client.Client): A BigQuery client.
+        table (google.cloud.bigquery.table.Table): The blocks table.
+    """
+    number_field = next((field for field in table.schema if field.name == "number"), None)
+    if number_field is None or number_field.field_type != "STRING":
+        return
+    table_path = f"`{table.project}.{table.dataset_id}.{table.table_id}`"
+    print(f"Migrating {table_path}.number from STRING to INT64")
+    client.query(f"""
+    CREATE OR REPLACE TABLE {table_path}
+    CLUSTER BY number
+    AS SELECT * REPLACE (CAST(number AS INT64) AS number) FROM {table_path}
+    """).result()
+
+def create_checkpoints_table(client, dataset_id, table_id, project_id):
+    """
+    Create the ingest checkpoints table ({table_id}_checkpoints) if it doesn't exist.
+    
+    Args:
+        client (google.cloud.bigquery.client.Client): A BigQuery client.
+        dataset_id (str): The ID of the dataset to create the table in.
+        table_id (str): The ID of the blocks table the checkpoints belong to.
+        project_id (str): The Google Cloud project ID.
+    """
+    schema = [
+        bigquery.SchemaField("relay_chain", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("chain", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("stream", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("last_block", "INTEGER", mode="REQUIRED"),
+        bigquery.SchemaField("updated_at", "TIMESTAMP", mode="REQUIRED"),
+    ]
+    table = bigquery.Table(f"{project_id}.{dataset_id}.{table_id}_checkpoints", schema=schema)
     table = client.create_table(table, exists_ok=True)
     print(f"Created table {table.project}.{table.dataset_id}.{table.table_id}")
 
+def create_details_tables(client, dataset_id, table_id, project_id):
+    """
+    Create the normalized extrinsics ({table_id}_extrinsics) and events
+    ({table_id}_events) tables if they don't exist.
+    
+    BigQuery has no secondary indexes, so the tables are clustered on the
+    columns queries filter by instead.
+    
+    Args:
+        client (google.cloud.bigquery.client.Client): A BigQuery client.
+        dataset_id (str): The ID of the dataset to create the tables in.
+        table_id (str): The ID of the blocks table the tables belong to.
+        project_id (str): The Google Cloud project ID.
+    """
+    extrinsics_schema = [
+        bigquery.SchemaField("number", "INTEGER", mode="REQUIRED"),
+        bigquery.SchemaField("extrinsic_index", "INTEGER", mode="REQUIRED"),
+        bigquery.SchemaField("hash", "STRING"),
+        bigquery.SchemaField("pallet", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("method", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("signer", "STRING"),
+        bigquery.SchemaField("nonce", "INTEGER"),
+        bigquery.SchemaField("tip", "BIGNUMERIC"),
+        bigquery.SchemaField("fee", "BIGNUMERIC"),
+        bigquery.SchemaField("success", "BOOLEAN"),
+        bigquery.SchemaField("paysfee", "BOOLEAN"),
+    ]
+    events_schema = [
+        bigquery.SchemaField("number", "INTEGER", mode="REQUIRED"),
+        bigquery.SchemaField("event_index", "INTEGER", mode="REQUIRED"),
+        bigquery.SchemaField("extrinsic_index", "INTEGER"),
+        bigquery.SchemaField("phase", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("pallet", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("method", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("data", "STRING"),
+    ]
+    for suffix, schema, clustering_fields in (
+        ("extrinsics", extrinsics_schema, ["pallet", "method", "signer", "number"]),
+        ("events", events_schema, ["pallet", "method", "number"]),
+    ):
+        table = bigquery.Table(f"{project_id}.{dataset_id}.{table_id}_{suffix}", schema=schema)
+        table.clustering_fields = clustering_fields
+        table = client.create_table(table, exists_ok=True)
+        print(f"Created table {table.project}.{table.dataset_id}.{table.table_id}")
+    create_search_index(client, f"{project_id}.{dataset_id}.{table_id}_extrinsics", f"{table_id}_extrinsics_lookup", ["hash", "signer"])
+
+def load_checkpoint(client, dataset_id, table_id, chain, relay_chain, stream):
+    """
+    Read the last committed block recorded for an ingest stream.
+    
+    Returns:
+        int: The last committed block number, or None if the stream has no checkpoint.
+    """
+    query_str = f"""
+    SELECT last_block FROM `{client.project}.{dataset_id}.{table_id}_checkpoints`
+    WHERE relay_chain = @relay_chain AND chain = @chain AND stream = @stream
+    """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("relay_chain", "STRING", relay_chain),
+            bigquery.ScalarQueryParameter("chain", "STRING", chain),
+            bigquery.ScalarQueryParameter("stream", "STRING", stream),
+        ]
+    )
+    rows = list(client.query(query_str, job_config=job_config).result())
+    return int(rows[0]["last_block"]) if rows else None
+
+def save_checkpoint(client, dataset_id, table_id, chain, relay_chain, stream, last_block):
+    """
+    Record the last committed block for an ingest stream with a MERGE statement.
+    """
+    query_str = f"""
+    MERGE `{client.project}.{dataset_id}.{table_id}_checkpoints` AS target
+    USING (SELECT @relay_chain AS relay_chain, @chain AS chain, @stream AS stream, @last_block AS last_block) AS source
+    ON target.relay_chain = source.relay_chain AND target.chain = source.chain AND target.stream = source.stream
+    WHEN MATCHED THEN
+        UPDATE SET last_block = source.last_block, updated_at = CURRENT_TIMESTAMP()
+    WHEN NOT MATCHED THEN
+        INSERT (relay_chain, chain, stream, last_block, updated_at)
+        VALUES (source.relay_chain, source.chain, source.stream, source.last_block, CURRENT_TIMESTAMP())
+    """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("relay_chain", "STRING", relay_chain),
+            bigquery.ScalarQueryParameter("chain", "STRING", chain),
+            bigquery.ScalarQueryParameter("stream", "STRING", stream),
+            bigquery.ScalarQueryParameter("last_block", "INT64", last_block),
+        ]
+    )
+    client.query(query_str, job_config=job_config).result()
+
 def insert_block(client, dataset_id, table_id, block_data):
     """
     Insert a block into the BigQuery table.
@@ -113,12 +319,181 @@ def insert_block(client, dataset_id, table_id, block_data):
         block_data (dict): The block data to insert.
     """
     table_ref = client.dataset(dataset_id).table(table_id)
-    errors = client.insert_rows_json(table_ref, [block_data])
+    errors = client.insert_rows_json(table_ref, [bigquery_row(block_data)])
     if errors:
         print(f"Encountered errors while inserting rows: {errors}")
     else:
+        insert_block_details(client, dataset_id, table_id, [block_data])
         print(f"Inserted 1 row into {dataset_id}.{table_id}")
 
+def insert_blocks(client, dataset_id, table_id, blocks, chunk_size=500):
+    """
+    Insert many blocks into the BigQuery table, chunk_size rows per request.
+    
+    Args:
+        client (google.cloud.bigquery.client.Client): A BigQuery client.
+        dataset_id (str): The ID of the dataset containing the table.
+        table_id (str): The ID of the table to insert into.
+        blocks (list): The block data dicts to insert.
+        chunk_size (int): Maximum rows per insert_rows_json request.
+
+    Raises:
+        RuntimeError: If BigQuery rejected any rows.
+    """
+    table_ref = client.dataset(dataset_id).table(table_id)
+    for start in range(0, len(blocks), chunk_size):
+        chunk = [bigquery_row(block_data) for block_data in blocks[start:start + chunk_size]]
+        errors = client.insert_rows_json(table_ref, chunk)
+        if errors:
+            raise RuntimeError(f"Encountered errors while inserting rows: {errors}")
+    insert_block_details(client, dataset_id, table_id, blocks, chunk_size)
+    print(f"Inserted {len(blocks)} rows into {dataset_id}.{table_id}")
+
+def insert_block_details(client, dataset_id, table_id, blocks, chunk_size=500):
+    """
+    Insert the extrinsics and events rows of blocks into the normalized tables.
+    
+    Streaming inserts are not transactional, so rows carry insert IDs derived
+    from (number, index) and BigQuery drops best-effort duplicates when a
+    batch is retried.
+    
+    Args:
+        client (google.cloud.bigquery.client.Client): A BigQuery client.
+        dataset_id (str): The ID of the dataset containing the tables.
+        table_id (str): The ID of the blocks table the tables belong to.
+        blocks (list): The block data dicts whose details are inserted.
+        chunk_size (int): Maximum rows per insert_rows_json request.
+
+    Raises:
+        RuntimeError: If BigQuery rejected any rows.
+    """
+    for suffix, records, index_column in (
+        ("extrinsics", extrinsic_records, "extrinsic_index"),
+        ("events", event_records, "event_index"),
+    ):
+        table_ref = client.dataset(dataset_id).table(f"{table_id}_{suffix}")
+        rows = [record for block_data in blocks for record in records(block_data)]
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            row_ids = [f"{row['number']}-{row[index_column]}" for row in chunk]
+            errors = client.insert_rows_json(table_ref, chunk, row_ids=row_ids)
+            if errors:
+                raise RuntimeError(f"Encountered errors while inserting {suffix} rows: {errors}")
+
+def load_blocks(client, dataset_id, table_id, blocks, jobs_per_day):
+    """
+    Write blocks, with their extrinsics and events, with one batch load job and one MERGE per table.
+    
+    Load jobs cost nothing and skip the streaming quotas and buffer. Each table's
+    rows are loaded into a staging table, then merged into the table on its key,
+    so a batch that is retried, or loaded again after a restart from an older
+    checkpoint, replaces its rows instead of appending them a second time.
+    
+    BigQuery caps how many jobs may modify a table each day, failed ones
+    included. Batches are therefore spaced so this process starts at most
+    jobs_per_day of them a day, waiting when batches fill faster than that.
+    
+    Args:
+        client (google.cloud.bigquery.client.Client): A BigQuery client.
+        dataset_id (str): The ID of the dataset containing the tables.
+        table_id (str): The ID of the blocks table.
+        blocks (list): The block data dicts to load.
+        jobs_per_day (float): Batches this process may write per day.
+
+    Raises:
+        google.api_core.exceptions.GoogleAPICallError: If a load job or MERGE failed.
+    """
+    numbers = [int(block_data['number']) for block_data in blocks]
+    digest = hashlib.sha1(",".join(str(block_data['hash']) for block_data in blocks).encode()).hexdigest()[:16]
+    batch_id = f"{min(numbers)}_{max(numbers)}_{digest}"
+    table_path = f"{client.project}.{dataset_id}.{table_id}"
+    reserve_load_slot(table_path, batch_id, jobs_per_day)
+    for suffix, rows, key_columns in (
+        ("", [bigquery_row(block_data) for block_data in blocks], ["number"]),
+        ("_extrinsics", [record for block_data in blocks for record in extrinsic_records(block_data)], ["number", "extrinsic_index"]),
+        ("_events", [record for block_data in blocks for record in event_records(block_data)], ["number", "event_index"]),
+    ):
+        merge_rows(client, f"{table_path}{suffix}", rows, key_columns, batch_id)
+    with _next_load_lock:
+        _reserved_batches.discard((table_path, batch_id))
+    print(f"Loaded {len(blocks)} rows into {dataset_id}.{table_id}")
+
+def reserve_load_slot(table_path, batch_id, jobs_per_day):
+    """
+    Block until a batch fits in its table's daily budget.
+
+    Batches are spread evenly over the day rather than allowed in a burst, so a
+    backfill never finds the quota used up hours before it resets. A retry of a
+    batch that already holds a slot goes ahead without taking another.
+
+    Args:
+        table_path (str): project.dataset.table of the blocks table.
+        batch_id (str): Identifies the batch.
+        jobs_per_day (float): Batches this process may write per day.
+    """
+    with _next_load_lock:
+        if (table_path, batch_id) in _reserved_batches:
+            return
+        _reserved_batches.add((table_path, batch_id))
+        now = time.monotonic()
+        start_at = max(now, _next_load_at.get(table_path, now))
+        _next_load_at[table_path] = start_at + 86400 / jobs_per_day
+    delay = start_at - now
+    if delay > 0:
+        print(f"Waiting {delay:.1f}s to stay within {jobs_per_day:g} load jobs per table per day; "
+              f"a larger --bigquery_load_size loads more blocks per job")
+        time.sleep(delay)
+
+def merge_rows(client, table_path, rows, key_columns, batch_id):
+    """
+    Upsert rows into a table through a staging table, and wait for it.
+    
+    The rows are loaded as newline-delimited JSON into {table}_staging_{batch_id},
+    which replaces whatever an earlier attempt left there and expires after a
+    day if the ingest dies before dropping it. A MERGE then updates the rows
+    whose key is already in the table and inserts the rest.
+    
+    Args:
+        client (google.cloud.bigquery.client.Client): A BigQuery client.
+        table_path (str): project.dataset.table of the destination table.
+        rows (list): Row dicts matching the table schema.
+        key_columns (list): Columns that identify a row.
+        batch_id (str): Identifies the batch in the staging table name.
+    """
+    if not rows:
+        return
+    # MERGE fails if one target row matches two source rows, so a block written twice in a batch keeps its last copy
+    rows = list({tuple(row[column] for column in key_columns): row for row in rows}.values())
+    table = client.get_table(table_path)
+    staging = bigquery.Table(f"{table_path}_staging_{batch_id}", schema=table.schema)
+    staging.expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1)
+    staging = client.create_table(staging, exists_ok=True)
+    job_config = bigquery.LoadJobConfig(
+        schema=table.schema,
+        source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+    )
+    data = io.BytesIO("".join(f"{dumps(row)}\n" for row in rows).encode())
+    client.load_table_from_file(data, staging, job_config=job_config).result()
+
+    numbers = [row["number"] for row in rows]
+    columns = [field.name for field in table.schema if field.name not in key_columns]
+    # The range lets BigQuery skip the clustered storage blocks the batch cannot touch
+    condition = " AND ".join(
+        [f"target.number BETWEEN {min(numbers)} AND {max(numbers)}"]
+        + [f"target.`{column}` = source.`{column}`" for column in key_columns]
+    )
+    client.query(f"""
+    MERGE `{table_path}` AS target
+    USING `{table_path}_staging_{batch_id}` AS source
+    ON {condition}
+    WHEN MATCHED THEN
+        UPDATE SET {", ".join(f"`{column}` = source.`{column}`" for column in columns)}
+    WHEN NOT MATCHED THEN
+        INSERT ROW
+    """).result()
+    client.delete_table(staging, not_found_ok=True)
+
 def update_block(client, dataset_id, table_id, block_number, update_data):
     """
     Update a block in the BigQuery table.
@@ -127,7 +502,7 @@ def update_block(client, dataset_id, table_id, block_number, update_data):
         client (google.cloud.bigquery.client.Client): A BigQuery client.
         dataset_id (str): The ID of the dataset containing the table.
         table_id (str): The ID of the table to update.
-        block_number (str): The block number to update.
+        block_number (int): The block number to update.
         update_data (dict): The data to update the block with.
     """
     query = f"""
@@ -138,7 +513,7 @@ def update_block(client, dataset_id, table_id, block_number, update_data):
     
     job_config = bigquery.QueryJobConfig(
         query_parameters=[
-            bigquery.ScalarQueryParameter("block_number", "STRING", block_number),
+            bigquery.ScalarQueryParameter("block_number", "INT64", int(block_number)),
             *[bigquery.ScalarQueryParameter(k, "STRING", v) for k, v in update_data.items()]
         ]
     )
@@ -149,18 +524,66 @@ def update_block(client, dataset_id, table_id, block_number, update_data):
     print(f"Updated block {block_number} in {dataset_id}.{table_id}")
 
 
-def query(client, query_str):
+def mark_finalized(client, dataset_id, table_id, start_block, end_block):
+    """
+    Set finalized on blocks start_block..end_block (inclusive) with a single UPDATE.
+    
+    With streaming inserts, BigQuery rejects DML on rows still in the streaming
+    buffer, so a range written in the last few minutes may fail and is retried
+    on a later cycle.
+    """
+    query_str = f"""
+    UPDATE `{client.project}.{dataset_id}.{table_id}` SET finalized = TRUE
+    WHERE number BETWEEN @start_block AND @end_block AND finalized = FALSE
+    """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("start_block", "INT64", start_block),
+            bigquery.ScalarQueryParameter("end_block", "INT64", end_block),
+        ]
+    )
+    client.query(query_str, job_config=job_config).result()
+
+def delete_unfinalized_blocks(client, dataset_id, table_id, above_block):
+    """
+    Delete the unfinalized blocks above above_block, with their extrinsics and events.
+    
+    Like mark_finalized, this fails while the rows are still in the streaming
+    buffer, and is retried on a later cycle.
+    """
+    table_path = f"{client.project}.{dataset_id}.{table_id}"
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ScalarQueryParameter("above_block", "INT64", above_block)]
+    )
+    for suffix in ("_extrinsics", "_events"):
+        client.query(f"""
+        DELETE FROM `{table_path}{suffix}` WHERE number IN (
+            SELECT number FROM `{table_path}` WHERE number > @above_block AND finalized = FALSE
+        )
+        """, job_config=job_config).result()
+    client.query(f"""
+    DELETE FROM `{table_path}` WHERE number > @above_block AND finalized = FALSE
+    """, job_config=job_config).result()
+
+def query(client, query_str, params=None):
     """
     Execute a query on BigQuery and return the results as a dataframe.
     
     Args:
         client (google.cloud.bigquery.client.Client): A BigQuery client.
         query_str (str): The query string to execute.
+        params (dict): Values bound to @name parameters in query_str; ints are INT64, everything else STRING.
         
     Returns:
         pandas.DataFrame: The query results as a DataFrame.
     """
-    query_job = client.query(query_str)
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter(name, "INT64" if isinstance(value, int) else "STRING", value)
+            for name, value in (params or {}).items()
+        ]
+    )
+    query_job = client.query(query_str, job_config=job_config)
     results = query_job.result()
     df = results.to_dataframe()
     
@@ -0,0 +1,199 @@
+"""
+Local on-disk cache of raw sidecar block responses.
+
+Blocks are stored content-addressed: each distinct response is written once,
+gzip-compressed, under objects/<sha256[:2]>/<sha256>.json.gz, and a SQLite
+index maps (relay_chain, chain, number) and block hash to the object. The index
+records when each object was last read, so once the cache outgrows its size cap
+the least recently used objects are evicted.
+
+Only finalized blocks are cached: a block number can still point at a
+different block until it is finalized.
+"""
+import gzip
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from serializer import dumps, loads
+from sidecar_client import SidecarError, SidecarResponse
+
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+COMPRESS_LEVEL = 6
+# Fraction of max_bytes the cache is trimmed to once it overflows, so eviction does not run on every put
+EVICT_TO = 0.9
+
+
+class BlockCache:
+    """
+    Content-addressed, size-capped cache of raw sidecar block JSON.
+
+    Safe to share between threads. Several processes may open the same
+    directory; the index is a WAL-mode SQLite database and object files are
+    written atomically.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite"), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS objects (
+                digest TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS objects_last_access ON objects (last_access);
+            CREATE TABLE IF NOT EXISTS blocks (
+                relay_chain TEXT NOT NULL,
+                chain TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (relay_chain, chain, number)
+            );
+            CREATE INDEX IF NOT EXISTS blocks_hash ON blocks (relay_chain, chain, hash);
+            CREATE INDEX IF NOT EXISTS blocks_digest ON blocks (digest);
+        """)
+        self._db.commit()
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, "objects", digest[:2], f"{digest}.json.gz")
+
+    def get(self, chain, relay_chain, block_id):
+        """
+        Return the cached sidecar JSON for a block number or hash, or None on a miss.
+        """
+        if isinstance(block_id, str) and block_id.startswith("0x"):
+            where, key = "hash = ?", block_id
+        else:
+            where, key = "number = ?", int(block_id)
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT digest FROM blocks WHERE relay_chain = ? AND chain = ? AND {where}", (relay_chain, chain, key)
+            ).fetchone()
+            if row is None:
+                return None
+            digest = row[0]
+            self._db.execute("UPDATE objects SET last_access = ? WHERE digest = ?", (time.time(), digest))
+            self._db.commit()
+        try:
+            with open(self._object_path(digest), "rb") as f:
+                return loads(gzip.decompress(f.read()))
+        except (OSError, ValueError) as e:
+            print(f"Dropping unreadable cache entry for block {block_id}: {e}")
+            self._forget([digest])
+            return None
+
+    def put(self, chain, relay_chain, block_data):
+        """
+        Cache a raw sidecar block if it is finalized.
+
+        Returns:
+            bool: Whether the block was cached.
+        """
+        if block_data.get('finalized') is not True:
+            return False
+        raw = dumps(block_data).encode()
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(gzip.compress(raw, compresslevel=COMPRESS_LEVEL, mtime=0))
+            os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            inserted = self._db.execute(
+                "INSERT OR IGNORE INTO objects (digest, size, last_access) VALUES (?, ?, ?)",
+                (digest, size, time.time())
+            ).rowcount
+            self._db.execute(
+                "INSERT OR REPLACE INTO blocks (relay_chain, chain, number, hash, digest) VALUES (?, ?, ?, ?, ?)",
+                (relay_chain, chain, int(block_data['number']), block_data['hash'], digest)
+            )
+            self._db.commit()
+            if inserted:
+                self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+        return True
+
+    def _evict(self):
+        # Called with the lock held. Other processes may have changed the cache, so start from the real size.
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+        target = self.max_bytes * EVICT_TO
+        evicted = 0
+        while self._size > target:
+            rows = self._db.execute("SELECT digest, size FROM objects ORDER BY last_access LIMIT 256").fetchall()
+            if not rows:
+                break
+            digests = []
+            for digest, size in rows:
+                if self._size <= target:
+                    break
+                digests.append(digest)
+                self._size -= size
+            self._delete(digests)
+            evicted += len(digests)
+        if evicted:
+            print(f"Evicted {evicted} blocks from the block cache")
+
+    def _delete(self, digests):
+        self._db.executemany("DELETE FROM blocks WHERE digest = ?", [(digest,) for digest in digests])
+        self._db.executemany("DELETE FROM objects WHERE digest = ?", [(digest,) for digest in digests])
+        self._db.commit()
+        for digest in digests:
+            try:
+                os.remove(self._object_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def _forget(self, digests):
+        with self._lock:
+            self._delete(digests)
+            self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class CachedSidecarClient:
+    """
+    SidecarClient wrapper that serves /blocks/{id} from a BlockCache.
+
+    Misses are fetched from sidecar and cached, unless offline is set, in which
+    case a miss raises SidecarError so a re-ingest never touches sidecar. All
+    other requests go straight to the wrapped client.
+    """
+
+    def __init__(self, client, cache, chain, relay_chain, offline=False):
+        self.client = client
+        self.cache = cache
+        self.chain = chain
+        self.relay_chain = relay_chain
+        self.offline = offline
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def get_block(self, block_id):
+        started_at = time.monotonic()
+        block_data = self.cache.get(self.chain, self.relay_chain, block_id)
+        if block_data is not None:
+            return SidecarResponse(block_data, 200, time.monotonic() - started_at, 0, f"cache:{self.cache.directory}/{block_id}")
+        if self.offline:
+            raise SidecarError(f"Block {block_id} is not in the block cache at {self.cache.directory}", status_code=404)
+        response = self.client.get_block(block_id)
+        self.cache.put(self.chain, self.relay_chain, response.data)
+        return response
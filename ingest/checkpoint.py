@@ -0,0 +1,84 @@
+import time
+
+from database_utils import database_connection, load_checkpoint, save_checkpoint
+
+
+def historical_stream(start_block, end_block):
+    """
+    Checkpoint stream name for a historical range, so different ranges resume independently.
+    """
+    return f"historical:{start_block}-{end_block}"
+
+
+LIVE_STREAM = "live"
+
+
+class Checkpoint:
+    """
+    Track the highest block below which every block of a stream has been committed,
+    and persist it so a restarted ingest can resume after it.
+
+    Blocks may be committed out of order (parallel workers, batches); the
+    checkpoint only advances over a contiguous prefix, so a resumed run never skips
+    a block that was not written. Saves are throttled to one per save_interval
+    seconds; call save() when the run ends.
+    """
+
+    def __init__(self, database_info, chain, relay_chain, stream, last_block, save_interval=0):
+        self.database_info = database_info
+        self.chain = chain
+        self.relay_chain = relay_chain
+        self.stream = stream
+        self.last_block = last_block
+        self.save_interval = save_interval
+        self._committed_ahead = set()
+        self._saved_block = last_block
+        self._saved_at = time.time()
+
+    @classmethod
+    def load(cls, database_info, chain, relay_chain, stream, default_last_block, save_interval=0):
+        """
+        Load a stream's checkpoint, starting from default_last_block when none exists.
+        """
+        with database_connection(database_info) as db_connection:
+            last_block = load_checkpoint(db_connection, database_info, chain, relay_chain, stream)
+        if last_block is None:
+            last_block = default_last_block
+        else:
+            print(f"Resuming {stream} for {chain} on {relay_chain} after block {last_block}")
+        return cls(database_info, chain, relay_chain, stream, last_block, save_interval)
+
+    def mark_committed(self, block_numbers):
+        """
+        Record committed blocks and persist the checkpoint if it advanced.
+        """
+        for number in block_numbers:
+            number = int(number)
+            if number > self.last_block:
+                self._committed_ahead.add(number)
+        while self.last_block + 1 in self._committed_ahead:
+            self.last_block += 1
+            self._committed_ahead.remove(self.last_block)
+        if time.time() - self._saved_at >= self.save_interval:
+            self.save()
+
+    def advance_to(self, last_block):
+        """
+        Move the checkpoint to last_block, for callers that commit strictly in order.
+        """
+        last_block = int(last_block)
+        if last_block > self.last_block:
+            self._committed_ahead = {number for number in self._committed_ahead if number > last_block}
+            self.last_block = last_block
+        self.mark_committed(())
+
+    def save(self):
+        if self.last_block == self._saved_block:
+            return
+        try:
+            with database_connection(self.database_info) as db_connection:
+                save_checkpoint(db_connection, self.database_info, self.chain, self.relay_chain, self.stream, self.last_block)
+            self._saved_block = self.last_block
+            self._saved_at = time.time()
+        except Exception as e:
+            print(f"Error saving checkpoint for {self.stream} at block {self.last_block}: {e}")
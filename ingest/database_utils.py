@@ -1,4 +1,22 @@
 from typing import Dict, Any
+from contextlib import contextmanager
+import queue
+import threading
+import time
+
+import metrics
+import profiling
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_HEALTH_CHECK_INTERVAL = 30
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_BATCH_LINGER = 5.0
+DEFAULT_BIGQUERY_LOAD_SIZE = 5000
+DEFAULT_BIGQUERY_LOAD_INTERVAL = 300.0
+# BigQuery allows 1500 jobs that modify a table per day; the rest is left for retries of failed jobs
+BIGQUERY_LOAD_JOBS_PER_DAY = 1000
+# Most rows a hash lookup returns
+SEARCH_RESULT_LIMIT = 100
 
 def connect_to_database(database_info: Dict[str, Any]):
     if database_info['database'] == 'postgres':
@@ -22,57 +40,473 @@ def connect_to_database(database_info: Dict[str, Any]):
     elif database_info['database'] == 'bigquery':
         from bigquery_utils import connect_to_bigquery
         return connect_to_bigquery(database_info['database_project'], database_info['database_credentials'])
+    elif database_info['database'] == 'sqlite':
+        from sqlite_utils import connect_to_sqlite
+        return connect_to_sqlite(database_info['database_path'])
+    elif database_info['database'] == 'parquet':
+        from parquet_utils import connect_to_parquet, DEFAULT_PARTITION_BY, DEFAULT_RANGE_SIZE, DEFAULT_ROW_GROUP_SIZE, DEFAULT_COMPRESSION
+        return connect_to_parquet(
+            database_info['database_path'],
+            database_info.get('database_partition_by') or DEFAULT_PARTITION_BY,
+            database_info.get('database_range_size') or DEFAULT_RANGE_SIZE,
+            database_info.get('database_row_group_size') or DEFAULT_ROW_GROUP_SIZE,
+            database_info.get('database_compression') or DEFAULT_COMPRESSION
+        )
     else:
         raise ValueError(f"Unsupported database type: {database_info['database']}")
 
-def create_tables(db_connection, database_info: Dict[str, Any], chain: str, relay_chain: str):
+def create_tables(db_connection, database_info: Dict[str, Any], chain: str, relay_chain: str, reset: bool = False):
     if database_info['database'] == 'postgres':
         from postgres_utils import create_tables as create_postgres_tables
-        create_postgres_tables(db_connection, chain, relay_chain)
+        create_postgres_tables(db_connection, chain, relay_chain, reset)
     elif database_info['database'] == 'mysql':
         from mysql_utils import create_tables as create_mysql_tables
-        create_mysql_tables(db_connection, chain, relay_chain)
+        create_mysql_tables(db_connection, chain, relay_chain, reset)
+    elif database_info['database'] == 'sqlite':
+        from sqlite_utils import create_tables as create_sqlite_tables
+        create_sqlite_tables(db_connection, chain, relay_chain, reset)
     elif database_info['database'] == 'bigquery':
-        from bigquery_utils import create_blocks_table as create_bigquery_tables
+        from bigquery_utils import create_blocks_table as create_bigquery_tables, create_checkpoints_table, create_details_tables
         create_bigquery_tables(db_connection, database_info['database_dataset'], database_info['database_table'], database_info['database_project'])
+        create_details_tables(db_connection, database_info['database_dataset'], database_info['database_table'], database_info['database_project'])
+        create_checkpoints_table(db_connection, database_info['database_dataset'], database_info['database_table'], database_info['database_project'])
+    elif database_info['database'] == 'parquet':
+        from parquet_utils import create_tables as create_parquet_tables
+        create_parquet_tables(db_connection, chain, relay_chain, reset)
+    else:
+        raise ValueError(f"Unsupported database type: {database_info['database']}")
+
+
+def load_checkpoint(db_connection, database_info: Dict[str, Any], chain: str, relay_chain: str, stream: str):
+    """
+    Return the last committed block for an ingest stream, or None if it has no checkpoint.
+    """
+    if database_info['database'] == 'postgres':
+        from postgres_utils import load_checkpoint as load
+    elif database_info['database'] == 'mysql':
+        from mysql_utils import load_checkpoint as load
+    elif database_info['database'] == 'sqlite':
+        from sqlite_utils import load_checkpoint as load
+    elif database_info['database'] == 'bigquery':
+        from bigquery_utils import load_checkpoint as load_bigquery
+        return load_bigquery(db_connection, database_info['database_dataset'], database_info['database_table'], chain, relay_chain, stream)
+    elif database_info['database'] == 'parquet':
+        from parquet_utils import load_checkpoint as load
     else:
         raise ValueError(f"Unsupported database type: {database_info['database']}")
+    return load(db_connection, chain, relay_chain, stream)
+
+
+def save_checkpoint(db_connection, database_info: Dict[str, Any], chain: str, relay_chain: str, stream: str, last_block: int):
+    if database_info['database'] == 'postgres':
+        from postgres_utils import save_checkpoint as save
+    elif database_info['database'] == 'mysql':
+        from mysql_utils import save_checkpoint as save
+    elif database_info['database'] == 'sqlite':
+        from sqlite_utils import save_checkpoint as save
+    elif database_info['database'] == 'bigquery':
+        from bigquery_utils import save_checkpoint as save_bigquery
+        save_bigquery(db_connection, database_info['database_dataset'], database_info['database_table'], chain, relay_chain, stream, last_block)
+        return
+    elif database_info['database'] == 'parquet':
+        from parquet_utils import save_checkpoint as save
+    else:
+        raise ValueError(f"Unsupported database type: {database_info['database']}")
+    save(db_connection, chain, relay_chain, stream, last_block)
 
 
 def insert_block_data(database_info, db_connection, block_data, chain_name, relay_chain):
     if database_info['database'] == 'postgres':
-        from postgres_utils import connect_to_postgres, close_connection, insert_block_data
+        from postgres_utils import insert_block_data
         insert_block_data(db_connection, block_data, chain_name, relay_chain)
-        close_connection(db_connection)
     elif database_info['database'] == 'mysql':
-        from mysql_utils import connect_to_mysql, close_connection, insert_block_data
+        from mysql_utils import insert_block_data
         insert_block_data(db_connection, block_data, chain_name, relay_chain)
-        close_connection(db_connection)
-    elif database_info['database'] == 'bigquery':
-        from bigquery_utils import connect_to_bigquery, insert_block
+    elif database_info['database'] == 'sqlite':
+        from sqlite_utils import insert_block_data
+        insert_block_data(db_connection, block_data, chain_name, relay_chain)
+    elif database_info['database'] == 'bigquery' and database_info.get('database_write_method') == 'stream':
+        from bigquery_utils import insert_block
         insert_block(db_connection, database_info['database_dataset'], database_info['database_table'], block_data)
+    elif database_info['database'] == 'bigquery':
+        from bigquery_utils import load_blocks
+        load_blocks(db_connection, database_info['database_dataset'], database_info['database_table'], [block_data],
+                    database_info.get('database_load_jobs_per_day', BIGQUERY_LOAD_JOBS_PER_DAY))
+    elif database_info['database'] == 'parquet':
+        from parquet_utils import insert_blocks as insert_parquet_blocks
+        insert_parquet_blocks(db_connection, [block_data], chain_name, relay_chain)
+
+
+def insert_blocks(database_info, db_connection, blocks):
+    """
+    Write a batch of transformed blocks, with their normalized extrinsics and
+    events rows, with one round of statements and one commit.
+
+    Blocks are grouped by chain, and duplicate block numbers within a batch keep
+    the last copy so a single upsert statement never touches the same row twice.
+    """
+    batches: Dict[tuple, Dict[Any, Dict[str, Any]]] = {}
+    for block_data in blocks:
+        key = (block_data['chain'], block_data['relay_chain'])
+        batches.setdefault(key, {})[block_data['number']] = block_data
+
+    started_at = time.perf_counter()
+    with metrics.db_write(len(blocks)):
+        for (chain_name, relay_chain), by_number in batches.items():
+            chain_blocks = list(by_number.values())
+            if database_info['database'] == 'postgres' and database_info.get('database_bulk_load'):
+                from postgres_utils import bulk_load_blocks
+                bulk_load_blocks(db_connection, chain_blocks, chain_name, relay_chain)
+            elif database_info['database'] == 'postgres':
+                from postgres_utils import insert_blocks_data
+                insert_blocks_data(db_connection, chain_blocks, chain_name, relay_chain)
+            elif database_info['database'] == 'mysql':
+                from mysql_utils import insert_blocks_data
+                insert_blocks_data(db_connection, chain_blocks, chain_name, relay_chain)
+            elif database_info['database'] == 'sqlite':
+                from sqlite_utils import insert_blocks_data
+                insert_blocks_data(db_connection, chain_blocks, chain_name, relay_chain)
+            elif database_info['database'] == 'bigquery' and database_info.get('database_write_method') == 'stream':
+                from bigquery_utils import insert_blocks as insert_bigquery_blocks
+                insert_bigquery_blocks(db_connection, database_info['database_dataset'], database_info['database_table'], chain_blocks)
+            elif database_info['database'] == 'bigquery':
+                from bigquery_utils import load_blocks
+                load_blocks(db_connection, database_info['database_dataset'], database_info['database_table'], chain_blocks,
+                            database_info.get('database_load_jobs_per_day', BIGQUERY_LOAD_JOBS_PER_DAY))
+            elif database_info['database'] == 'parquet':
+                from parquet_utils import insert_blocks as insert_parquet_blocks
+                insert_parquet_blocks(db_connection, chain_blocks, chain_name, relay_chain)
+            else:
+                raise ValueError(f"Unsupported database type: {database_info['database']}")
+    profiling.record_write(time.perf_counter() - started_at, len(blocks))
+    metrics.blocks_ingested([int(block_data['number']) for block_data in blocks])
+
+
+def mark_blocks_finalized(db_connection, database_info: Dict[str, Any], chain: str, relay_chain: str, start_block: int, end_block: int):
+    """
+    Set finalized on blocks start_block..end_block (inclusive) with a single UPDATE.
+    """
+    if database_info['database'] == 'postgres':
+        from postgres_utils import mark_finalized
+    elif database_info['database'] == 'mysql':
+        from mysql_utils import mark_finalized
+    elif database_info['database'] == 'sqlite':
+        from sqlite_utils import mark_finalized
+    elif database_info['database'] == 'bigquery':
+        from bigquery_utils import mark_finalized as mark_bigquery_finalized
+        mark_bigquery_finalized(db_connection, database_info['database_dataset'], database_info['database_table'], start_block, end_block)
+        return
+    else:
+        raise ValueError(f"Unsupported database type: {database_info['database']}")
+    mark_finalized(db_connection, chain, relay_chain, start_block, end_block)
+
+
+def delete_unfinalized_blocks(db_connection, database_info: Dict[str, Any], chain: str, relay_chain: str, above_block: int):
+    """
+    Delete the unfinalized blocks above above_block, with their extrinsics and events.
+    """
+    if database_info['database'] == 'postgres':
+        from postgres_utils import delete_unfinalized_blocks as delete_blocks
+    elif database_info['database'] == 'mysql':
+        from mysql_utils import delete_unfinalized_blocks as delete_blocks
+    elif database_info['database'] == 'sqlite':
+        from sqlite_utils import delete_unfinalized_blocks as delete_blocks
+    elif database_info['database'] == 'bigquery':
+        from bigquery_utils import delete_unfinalized_blocks as delete_bigquery_blocks
+        delete_bigquery_blocks(db_connection, database_info['database_dataset'], database_info['database_table'], above_block)
+        return
+    else:
+        raise ValueError(f"Unsupported database type: {database_info['database']}")
+    delete_blocks(db_connection, chain, relay_chain, above_block)
+
+
+def begin_bulk_load(db_connection, database_info: Dict[str, Any], chain: str, relay_chain: str):
+    """
+    Prepare the blocks table for a bulk load by deferring its secondary indexes.
+
+    Returns:
+        list: State to hand back to end_bulk_load.
+    """
+    if database_info['database'] == 'postgres':
+        from postgres_utils import defer_secondary_indexes
+        return defer_secondary_indexes(db_connection, chain, relay_chain)
+    elif database_info['database'] == 'sqlite':
+        from sqlite_utils import defer_secondary_indexes
+        return defer_secondary_indexes(db_connection, chain, relay_chain)
+    raise ValueError(f"Bulk load is not supported for database type: {database_info['database']}")
+
+
+def end_bulk_load(db_connection, database_info: Dict[str, Any], chain: str, relay_chain: str, deferred):
+    if database_info['database'] == 'postgres':
+        from postgres_utils import restore_secondary_indexes
+        restore_secondary_indexes(db_connection, chain, relay_chain, deferred)
+    elif database_info['database'] == 'sqlite':
+        from sqlite_utils import restore_secondary_indexes
+        restore_secondary_indexes(db_connection, chain, relay_chain, deferred)
+    else:
+        raise ValueError(f"Bulk load is not supported for database type: {database_info['database']}")
+
+
+class BlockBatcher:
+    """
+    Buffer transformed blocks and write them with insert_blocks once the batch is
+    full or the oldest buffered block has waited max_linger seconds.
+
+    Not thread-safe: a single thread should own the batcher and call add,
+    flush_if_due and flush.
+    """
+
+    def __init__(self, database_info: Dict[str, Any], batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_linger: float = DEFAULT_BATCH_LINGER):
+        self.database_info = database_info
+        self.batch_size = max(1, batch_size)
+        self.max_linger = max_linger
+        self._blocks = []
+        self._oldest = None
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def seconds_until_due(self):
+        """
+        Seconds until the buffered batch must be flushed, or None when it is empty.
+        """
+        if self._oldest is None:
+            return None
+        return max(0.0, self.max_linger - (time.time() - self._oldest))
+
+    def add(self, block_data):
+        """
+        Buffer a block, flushing if that fills the batch or the linger time is up.
+
+        Returns:
+            list: The blocks written by this call (empty if nothing was flushed).
+        """
+        if self._oldest is None:
+            self._oldest = time.time()
+        self._blocks.append(block_data)
+        if len(self._blocks) >= self.batch_size:
+            return self.flush()
+        return self.flush_if_due()
+
+    def flush_if_due(self):
+        if self._oldest is not None and self.seconds_until_due() == 0:
+            return self.flush()
+        return []
+
+    def flush(self):
+        """
+        Write every buffered block in one batch.
+
+        On failure the blocks stay buffered and the exception propagates, so the
+        caller can retry or call discard().
+        """
+        if not self._blocks:
+            return []
+        with database_connection(self.database_info) as db_connection:
+            insert_blocks(self.database_info, db_connection, self._blocks)
+        written = self._blocks
+        self._blocks = []
+        self._oldest = None
+        return written
+
+    def discard(self):
+        """
+        Drop the buffered blocks and return them.
+        """
+        dropped = self._blocks
+        self._blocks = []
+        self._oldest = None
+        return dropped
 
 
 def close_connection(db_connection, database_info: Dict[str, Any]):
-    if database_info['database'] in ['postgres', 'mysql']:
+    if database_info['database'] in ['postgres', 'mysql', 'sqlite']:
         if database_info['database'] == 'postgres':
             from postgres_utils import close_connection as close_postgres
         elif database_info['database'] == 'mysql':
             from mysql_utils import close_connection as close_mysql
+        elif database_info['database'] == 'sqlite':
+            from sqlite_utils import close_connection as close_sqlite
         
         close_function = locals()[f'close_{database_info["database"]}']
         close_function(db_connection)
-    elif database_info['database'] == 'bigquery':
-        # BigQuery doesn't require explicit connection closing
+    elif database_info['database'] in ['bigquery', 'parquet']:
+        # BigQuery and Parquet don't require explicit connection closing
         pass
     else:
         raise ValueError(f"Unsupported database type: {database_info['database']}")
 
+def is_connection_healthy(db_connection, database_info: Dict[str, Any]) -> bool:
+    """
+    Check that a pooled connection is still usable with a cheap round trip.
+    """
+    try:
+        if database_info['database'] == 'postgres':
+            if db_connection.closed:
+                return False
+            cursor = db_connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            db_connection.rollback()
+        elif database_info['database'] == 'mysql':
+            db_connection.ping(reconnect=True, attempts=1, delay=0)
+        elif database_info['database'] == 'sqlite':
+            db_connection.execute("SELECT 1")
+        return True
+    except Exception as e:
+        print(f"Pooled {database_info['database']} connection failed health check: {e}")
+        return False
+
+
+def reset_connection(db_connection, database_info: Dict[str, Any]):
+    """
+    End any transaction left open by the last user so the connection does not hold
+    a stale snapshot (or an aborted transaction) while it sits in the pool.
+    """
+    if database_info['database'] == 'postgres':
+        db_connection.rollback()
+    elif database_info['database'] in ['mysql', 'sqlite']:
+        if db_connection.in_transaction:
+            db_connection.rollback()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of connections for a single database_info.
+
+    At most `size` connections are checked out at once; callers block until one is
+    returned. Idle connections are health checked before reuse when they have not
+    been used for `health_check_interval` seconds, and broken ones are replaced.
+    """
+
+    def __init__(self, database_info: Dict[str, Any], size: int = DEFAULT_POOL_SIZE,
+                 health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL):
+        self.database_info = database_info
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _open(self):
+        db_connection = connect_to_database(self.database_info)
+        if db_connection is None:
+            raise ConnectionError(f"Could not connect to {self.database_info['database']}")
+        return db_connection
+
+    def _discard(self, db_connection):
+        try:
+            close_connection(db_connection, self.database_info)
+        except Exception as e:
+            print(f"Error closing pooled connection: {e}")
+
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    db_connection, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._open()
+                if time.time() - last_used < self.health_check_interval \
+                        or is_connection_healthy(db_connection, self.database_info):
+                    return db_connection
+                self._discard(db_connection)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, db_connection, broken: bool = False):
+        try:
+            if db_connection is None:
+                return
+            if not broken:
+                try:
+                    reset_connection(db_connection, self.database_info)
+                except Exception as e:
+                    print(f"Error resetting pooled connection: {e}")
+                    broken = True
+            if broken:
+                self._discard(db_connection)
+            else:
+                self._idle.put((db_connection, time.time()))
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        while True:
+            try:
+                db_connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(db_connection)
+
+
+_pools: Dict[tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(database_info: Dict[str, Any]) -> tuple:
+    return tuple(
+        database_info.get(key) for key in (
+            'database', 'database_host', 'database_port', 'database_name', 'database_user',
+            'database_project', 'database_path'
+        )
+    )
+
+
+def get_connection_pool(database_info: Dict[str, Any]) -> ConnectionPool:
+    """
+    Return the process-wide pool for database_info, creating it on first use.
+
+    The pool is sized from database_info['database_pool_size'] when set.
+    """
+    key = _pool_key(database_info)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            size = int(database_info.get('database_pool_size') or DEFAULT_POOL_SIZE)
+            pool = ConnectionPool(database_info, size=size)
+            _pools[key] = pool
+        return pool
+
+
+@contextmanager
+def database_connection(database_info: Dict[str, Any], pool: ConnectionPool = None):
+    """
+    Check a connection out of the shared pool, or of pool if given, for the duration of a with-block.
+
+    If the block raises, the connection is rolled back and discarded so the next
+    caller gets a fresh one.
+    """
+    pool = pool or get_connection_pool(database_info)
+    db_connection = pool.acquire()
+    try:
+        yield db_connection
+    except Exception:
+        pool.release(db_connection, broken=True)
+        raise
+    else:
+        pool.release(db_connection)
+
+
+def close_connection_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
+
+
 def query_last_block(db_connection, database_info: Dict[str, Any], chain: str, relay_chain: str, block_num = None):
+    if database_info['database'] == 'parquet':
+        from parquet_utils import query_last_block as query_parquet_last_block
+        return query_parquet_last_block(db_connection, chain, relay_chain, block_num)
     if database_info['database'] == 'postgres':
         from postgres_utils import query
     elif database_info['database'] == 'mysql':
         from mysql_utils import query_block_data as query
+    elif database_info['database'] == 'sqlite':
+        from sqlite_utils import query_block_data as query
     elif database_info['database'] == 'bigquery':
         from bigquery_utils import query
     else:
@@ -85,26 +519,161 @@ def query_last_block(db_connection, database_info: Dict[str, Any], chain: str, r
             fetch_last_block_query = f"SELECT * FROM blocks_{relay_chain}_{chain} ORDER BY number DESC LIMIT 1"
     else:
         if database_info['database'] == 'bigquery':
-            fetch_last_block_query = f"SELECT * FROM {database_info['database_dataset']}.{database_info['database_table']} WHERE number='{block_num}' LIMIT 1"
-        elif database_info['database'] == 'postgres':
-            fetch_last_block_query = f"SELECT * FROM blocks_{relay_chain}_{chain} WHERE number='{block_num}' LIMIT 1"
+            fetch_last_block_query = f"SELECT * FROM {database_info['database_dataset']}.{database_info['database_table']} WHERE number = {int(block_num)} LIMIT 1"
         else:
-            fetch_last_block_query = f"SELECT * FROM blocks_{relay_chain}_{chain} WHERE number={block_num} LIMIT 1"
+            fetch_last_block_query = f"SELECT * FROM blocks_{relay_chain}_{chain} WHERE number = {int(block_num)} LIMIT 1"
     return query(db_connection, fetch_last_block_query)
 
-def query_recent_blocks(db_connection, database_info: Dict[str, Any], chain: str, relay_chain: str):
+def query_max_block_number(db_connection, database_info: Dict[str, Any], chain: str, relay_chain: str):
+    """
+    Return the highest stored block number, or None if the table is empty.
+
+    Only the number is read, which the primary key (or BigQuery clustering)
+    answers without touching the JSON columns.
+    """
+    if database_info['database'] == 'parquet':
+        from parquet_utils import query_max_block_number as query_parquet_max_block_number
+        return query_parquet_max_block_number(db_connection, chain, relay_chain)
+    if database_info['database'] == 'postgres':
+        from postgres_utils import query
+    elif database_info['database'] == 'mysql':
+        from mysql_utils import query_block_data as query
+    elif database_info['database'] == 'sqlite':
+        from sqlite_utils import query_block_data as query
+    elif database_info['database'] == 'bigquery':
+        from bigquery_utils import query
+    else:
+        raise ValueError(f"Unsupported database type: {database_info['database']}")
+
+    if database_info['database'] == 'bigquery':
+        max_block_query = f"SELECT MAX(number) AS number FROM {database_info['database_dataset']}.{database_info['database_table']}"
+    else:
+        max_block_query = f"SELECT MAX(number) AS number FROM blocks_{relay_chain}_{chain}"
+    df = query(db_connection, max_block_query)
+    if df is None:
+        raise RuntimeError(f"Failed to query the last block of {chain} on {relay_chain}")
+    if df.empty or df['number'].isna().iloc[0]:
+        return None
+    return int(df['number'].iloc[0])
+
+def query_recent_blocks(db_connection, database_info: Dict[str, Any], chain: str, relay_chain: str, columns=None, limit=50):
+    """
+    Return the newest limit blocks, newest first.
+
+    Args:
+        columns (list): Block columns to select, or None for all of them. Selecting
+            only the scalar columns keeps the JSON columns off the wire.
+    """
+    if database_info['database'] == 'parquet':
+        from parquet_utils import query_recent_blocks as query_parquet_recent_blocks
+        return query_parquet_recent_blocks(db_connection, chain, relay_chain, columns, limit)
     if database_info['database'] == 'postgres':
         from postgres_utils import query
     elif database_info['database'] == 'mysql':
         from mysql_utils import query_block_data as query
+    elif database_info['database'] == 'sqlite':
+        from sqlite_utils import query_block_data as query
     elif database_info['database'] == 'bigquery':
         from bigquery_utils import query
     else:
         raise ValueError(f"Unsupported database type: {database_info['database']}")
 
+    select_list = ", ".join(columns) if columns else "*"
     if database_info['database'] == 'bigquery':
-        fetch_last_block_query = f"SELECT * FROM {database_info['database_dataset']}.{database_info['database_table']} ORDER BY number DESC LIMIT 50"
+        fetch_last_block_query = f"SELECT {select_list} FROM {database_info['database_dataset']}.{database_info['database_table']} ORDER BY number DESC LIMIT {int(limit)}"
     else:
-        fetch_last_block_query = f"SELECT * FROM blocks_{relay_chain}_{chain} ORDER BY number DESC LIMIT 50"
+        fetch_last_block_query = f"SELECT {select_list} FROM blocks_{relay_chain}_{chain} ORDER BY number DESC LIMIT {int(limit)}"
+
+    return query(db_connection, fetch_last_block_query)
 
-    return query(db_connection, fetch_last_block_query)
\ No newline at end of file
+def _query_function(database_info: Dict[str, Any]):
+    if database_info['database'] == 'postgres':
+        from postgres_utils import query
+    elif database_info['database'] == 'mysql':
+        from mysql_utils import query_block_data as query
+    elif database_info['database'] == 'sqlite':
+        from sqlite_utils import query_block_data as query
+    elif database_info['database'] == 'bigquery':
+        from bigquery_utils import query
+    else:
+        raise ValueError(f"Unsupported database type: {database_info['database']}")
+    return query
+
+def _param(database_info: Dict[str, Any], name: str) -> str:
+    # BigQuery binds @name, sqlite3 :name; psycopg2 and mysql-connector bind %(name)s
+    if database_info['database'] == 'bigquery':
+        return f"@{name}"
+    if database_info['database'] == 'sqlite':
+        return f":{name}"
+    return f"%({name})s"
+
+def _search_tables(database_info: Dict[str, Any], chain: str, relay_chain: str):
+    if database_info['database'] == 'bigquery':
+        table = f"{database_info['database_dataset']}.{database_info['database_table']}"
+        return table, f"{table}_extrinsics"
+    return f"blocks_{relay_chain}_{chain}", f"extrinsics_{relay_chain}_{chain}"
+
+def _search(db_connection, database_info: Dict[str, Any], query_str: str, params: Dict[str, Any]):
+    df = _query_function(database_info)(db_connection, query_str, params)
+    if df is None:
+        raise RuntimeError("Search query failed")
+    return df
+
+def query_block_by_hash(db_connection, database_info: Dict[str, Any], chain: str, relay_chain: str, block_hash: str):
+    """
+    Return the block with the given hash as a one-row DataFrame (empty if there is none), using the hash index.
+    """
+    if database_info['database'] == 'parquet':
+        from parquet_utils import query_block_by_hash as query_parquet_block_by_hash
+        return query_parquet_block_by_hash(db_connection, chain, relay_chain, block_hash)
+    blocks_table, _ = _search_tables(database_info, chain, relay_chain)
+    query_str = f"SELECT * FROM {blocks_table} WHERE hash = {_param(database_info, 'hash')} LIMIT 1"
+    return _search(db_connection, database_info, query_str, {'hash': block_hash})
+
+def query_extrinsics_by_hash(db_connection, database_info: Dict[str, Any], chain: str, relay_chain: str, extrinsic_hash: str):
+    """
+    Return the extrinsics with the given hash, newest first.
+
+    An extrinsic hash is not unique on chain (an unsigned extrinsic can repeat in
+    another block), so this can return several rows.
+    """
+    if database_info['database'] == 'parquet':
+        from parquet_utils import query_extrinsics_by_hash as query_parquet_extrinsics_by_hash
+        return query_parquet_extrinsics_by_hash(db_connection, chain, relay_chain, extrinsic_hash)
+    _, extrinsics_table = _search_tables(database_info, chain, relay_chain)
+    query_str = (
+        f"SELECT * FROM {extrinsics_table} WHERE hash = {_param(database_info, 'hash')} "
+        f"ORDER BY number DESC, extrinsic_index DESC LIMIT {SEARCH_RESULT_LIMIT}"
+    )
+    return _search(db_connection, database_info, query_str, {'hash': extrinsic_hash})
+
+def query_signer_extrinsics(db_connection, database_info: Dict[str, Any], chain: str, relay_chain: str, signer: str,
+                            limit: int = 25, before=None):
+    """
+    Return one page of a signer's extrinsics, newest first.
+
+    Pages are keyset paginated: pass the (number, extrinsic_index) of the last
+    row of a page as before to get the next one. Each page is a single index
+    range scan however deep into the history it is, unlike OFFSET.
+    """
+    if database_info['database'] == 'parquet':
+        from parquet_utils import query_signer_extrinsics as query_parquet_signer_extrinsics
+        return query_parquet_signer_extrinsics(db_connection, chain, relay_chain, signer, limit, before)
+    _, extrinsics_table = _search_tables(database_info, chain, relay_chain)
+    params = {'signer': signer}
+    where = f"signer = {_param(database_info, 'signer')}"
+    if before is not None:
+        params['before_number'], params['before_index'] = int(before[0]), int(before[1])
+        before_number, before_index = _param(database_info, 'before_number'), _param(database_info, 'before_index')
+        if database_info['database'] in ['postgres', 'sqlite']:
+            # A row-value comparison is a single range bound on the (signer, number, extrinsic_index) index
+            where += f" AND (number, extrinsic_index) < ({before_number}, {before_index})"
+        else:
+            # MySQL does not range-scan on a row-value inequality, so number <= gives the index its range
+            where += (f" AND number <= {before_number}"
+                      f" AND (number < {before_number} OR (number = {before_number} AND extrinsic_index < {before_index}))")
+    query_str = (
+        f"SELECT * FROM {extrinsics_table} WHERE {where} "
+        f"ORDER BY number DESC, extrinsic_index DESC LIMIT {int(limit)}"
+    )
+    return _search(db_connection, database_info, query_str, params)
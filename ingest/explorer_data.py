@@ -0,0 +1,88 @@
+"""
+Cached data access for the Streamlit explorer pages.
+
+Every page rerun (each autorefresh, in every open session) goes through these
+functions. The connection pool is a Streamlit resource, so reruns reuse open
+connections. Query results are cached for a short TTL, shared by all sessions,
+so a few open dashboards cost about one query per TTL instead of one per
+refresh. Each function selects only the columns its widget shows.
+"""
+import streamlit as st
+
+from database_utils import (
+    database_connection, get_connection_pool, query_last_block, query_recent_blocks,
+    query_block_by_hash, query_extrinsics_by_hash, query_signer_extrinsics
+)
+
+# The chain produces a block about every 6 seconds
+RECENT_BLOCKS_TTL = 6
+# A stored block only changes until it is finalized
+BLOCK_TTL = 300
+EXPLORER_POOL_SIZE = 4
+SIGNER_PAGE_SIZE = 25
+
+RECENT_BLOCK_COLUMNS = [
+    'number', 'timestamp', 'hash', 'finalized', 'extrinsic_count', 'event_count',
+    'signed_extrinsic_count', 'failed_extrinsic_count', 'total_fee', 'weight'
+]
+
+
+@st.cache_resource
+def connection_pool(database_info):
+    """
+    The explorer's connection pool, created once per server process.
+    """
+    return get_connection_pool({**database_info, 'database_pool_size': EXPLORER_POOL_SIZE})
+
+
+@st.cache_data(ttl=RECENT_BLOCKS_TTL, show_spinner=False)
+def recent_blocks(database_info, chain, relay_chain, limit=50):
+    """
+    The newest limit blocks with only the columns the home page shows: scalar and summary columns, no JSON.
+    """
+    with database_connection(database_info, pool=connection_pool(database_info)) as db_connection:
+        df = query_recent_blocks(db_connection, database_info, chain, relay_chain, columns=RECENT_BLOCK_COLUMNS, limit=limit)
+    if df is None:
+        # Raised rather than returned, so the failure is not cached
+        raise RuntimeError(f"Failed to query the recent blocks of {chain} on {relay_chain}")
+    return df
+
+
+@st.cache_data(ttl=BLOCK_TTL, show_spinner=False)
+def block(database_info, chain, relay_chain, block_num):
+    """
+    Every column of one block, for the block details page.
+    """
+    with database_connection(database_info, pool=connection_pool(database_info)) as db_connection:
+        df = query_last_block(db_connection, database_info, chain, relay_chain, block_num)
+    if df is None:
+        raise RuntimeError(f"Failed to query block {block_num} of {chain} on {relay_chain}")
+    return df
+
+
+@st.cache_data(ttl=BLOCK_TTL, show_spinner=False)
+def block_by_hash(database_info, chain, relay_chain, block_hash):
+    """
+    Every column of the block with the given hash.
+    """
+    with database_connection(database_info, pool=connection_pool(database_info)) as db_connection:
+        return query_block_by_hash(db_connection, database_info, chain, relay_chain, block_hash)
+
+
+@st.cache_data(ttl=BLOCK_TTL, show_spinner=False)
+def extrinsics_by_hash(database_info, chain, relay_chain, extrinsic_hash):
+    """
+    The extrinsics with the given hash, from the extrinsics table.
+    """
+    with database_connection(database_info, pool=connection_pool(database_info)) as db_connection:
+        return query_extrinsics_by_hash(db_connection, database_info, chain, relay_chain, extrinsic_hash)
+
+
+@st.cache_data(ttl=RECENT_BLOCKS_TTL, show_spinner=False)
+def signer_extrinsics(database_info, chain, relay_chain, signer, before=None):
+    """
+    One page of a signer's extrinsics, newest first, starting after the (number, extrinsic_index) before.
+    """
+    with database_connection(database_info, pool=connection_pool(database_info)) as db_connection:
+        return query_signer_extrinsics(db_connection, database_info, chain, relay_chain, signer,
+                                       limit=SIGNER_PAGE_SIZE, before=before)
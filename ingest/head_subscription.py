@@ -0,0 +1,146 @@
+"""
+Follow the chain head over the node's JSON-RPC WebSocket endpoint.
+
+A background thread subscribes to chain_subscribeNewHeads and
+chain_subscribeFinalizedHeads and keeps the latest best and finalized block
+numbers, so live ingest can start on a block as soon as it is announced
+instead of polling sidecar on a fixed interval. The thread reconnects with
+backoff when the connection drops; callers check `connected` and fall back to
+polling in the meantime.
+
+websocket-client is optional: without it the subscription never connects and
+live ingest polls.
+"""
+import json
+import random
+import threading
+
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+DEFAULT_STALL_TIMEOUT = 60
+DEFAULT_RECONNECT_DELAY = 1
+DEFAULT_RECONNECT_DELAY_MAX = 30
+
+# Subscription method -> notification method
+SUBSCRIPTIONS = {
+    'chain_subscribeNewHeads': 'chain_newHead',
+    'chain_subscribeFinalizedHeads': 'chain_finalizedHead',
+}
+
+
+class HeadSubscription:
+    """
+    Track the best and finalized chain head from WebSocket notifications.
+
+    Attributes:
+        best_head (int): Number of the latest announced block, or None before the first notification.
+        finalized_head (int): Number of the latest finalized block, or None before the first notification.
+        connected (bool): Whether the subscription is currently live.
+    """
+
+    def __init__(self, url, stall_timeout=DEFAULT_STALL_TIMEOUT, reconnect_delay=DEFAULT_RECONNECT_DELAY,
+                 reconnect_delay_max=DEFAULT_RECONNECT_DELAY_MAX):
+        self.url = url
+        self.stall_timeout = stall_timeout
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_delay_max = reconnect_delay_max
+        self.best_head = None
+        self.finalized_head = None
+        self.connected = False
+        self._condition = threading.Condition()
+        self._closed = threading.Event()
+        self._socket = None
+        self._thread = threading.Thread(target=self._run, name="head-subscription", daemon=True)
+
+    def start(self):
+        """
+        Start the subscription thread. Returns self so it can be chained onto the constructor.
+        """
+        if websocket is None:
+            print("websocket-client is not installed; polling sidecar for new heads instead")
+        elif not self.url:
+            print("No WebSocket URL configured; polling sidecar for new heads instead")
+        else:
+            self._thread.start()
+        return self
+
+    def close(self):
+        self._closed.set()
+        socket = self._socket
+        if socket is not None:
+            socket.close()
+
+    def wait_for_head(self, after, timeout, finalized=True):
+        """
+        Block until the head moves past block `after`, the subscription drops, or timeout passes.
+
+        Args:
+            after (int): Block number the caller has already processed.
+            timeout (float): Maximum seconds to wait.
+            finalized (bool): Wait on the finalized head instead of the best head.
+
+        Returns:
+            int: The latest head, which is only greater than `after` if a new block arrived, or None if no head is known.
+        """
+        def head():
+            return self.finalized_head if finalized else self.best_head
+
+        with self._condition:
+            self._condition.wait_for(
+                lambda: not self.connected or (head() is not None and head() > after), timeout=timeout
+            )
+            return head()
+
+    def _set_state(self, **changes):
+        with self._condition:
+            for name, value in changes.items():
+                setattr(self, name, value)
+            self._condition.notify_all()
+
+    def _subscribe(self, socket):
+        for request_id, method in enumerate(SUBSCRIPTIONS, start=1):
+            socket.send(json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": []}))
+
+    def _handle(self, message):
+        method = message.get('method')
+        if method not in SUBSCRIPTIONS.values():
+            if 'error' in message:
+                raise RuntimeError(f"Subscription request {message.get('id')} failed: {message['error']}")
+            return
+        number = int(message['params']['result']['number'], 16)
+        if method == 'chain_finalizedHead':
+            self._set_state(finalized_head=number)
+        else:
+            self._set_state(best_head=number)
+
+    def _run(self):
+        failures = 0
+        while not self._closed.is_set():
+            try:
+                self._socket = websocket.create_connection(self.url, timeout=self.stall_timeout)
+                self._subscribe(self._socket)
+                print(f"Subscribed to new and finalized heads at {self.url}")
+                failures = 0
+                self._set_state(connected=True)
+                while not self._closed.is_set():
+                    # A timeout here means no head was announced for stall_timeout seconds
+                    message = self._socket.recv()
+                    if not message:
+                        raise ConnectionError("connection closed by the node")
+                    self._handle(json.loads(message))
+            except Exception as e:
+                if self._closed.is_set():
+                    break
+                print(f"Head subscription to {self.url} dropped: {e}")
+            finally:
+                self._set_state(connected=False)
+                if self._socket is not None:
+                    self._socket.close()
+                    self._socket = None
+            failures += 1
+            delay = random.uniform(0, min(self.reconnect_delay_max, self.reconnect_delay * 2 ** (failures - 1)))
+            print(f"Polling sidecar for new heads; reconnecting in {delay:.2f}s")
+            self._closed.wait(delay)
@@ -5,10 +5,19 @@ import time
 import requests
 import traceback
 import subprocess
-from write_block import writeBlock
+import metrics
+import profiling
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from write_block import prepareBlock
+from sidecar_client import SidecarClient, SidecarError, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, DEFAULT_MAX_RETRIES, DEFAULT_EJECT_AFTER, DEFAULT_EJECT_SECONDS
+from block_cache import BlockCache, CachedSidecarClient, DEFAULT_MAX_BYTES
 from database_utils import *
+from checkpoint import Checkpoint, LIVE_STREAM, historical_stream
+from head_subscription import HeadSubscription
+from best_blocks import BestBlockIngest
+from sharded_ingest import run_sharded_ingest
 
-def parse_arguments():
+def build_argument_parser():
     parser = argparse.ArgumentParser(description="Block ingestion script for Substrate-based chains")
     parser.add_argument("--chain", required=True, help="Name of the chain to process")
     parser.add_argument("--relay_chain", required=True, help="Name of the relay chain")
@@ -28,12 +37,47 @@ def parse_arguments():
     parser.add_argument("--db_user", required=False, help="Database user")
     parser.add_argument("--db_password", required=False, help="Database password")
     parser.add_argument("--db_name", required=False, help="Database name")
-    return parser.parse_args()
+    parser.add_argument("--db_pool_size", required=False, type=int, help="Maximum pooled database connections (defaults to workers + 1)")
+    parser.add_argument("--workers", required=False, type=int, default=1, help="Number of blocks fetched and written concurrently in historical mode")
+    parser.add_argument("--processes", required=False, type=int, default=1, help="Processes historical mode is sharded across, each running --workers threads")
+    parser.add_argument("--shard_size", required=False, type=int, help="Blocks per shard when --processes > 1 (defaults to 4 shards per process)")
+    parser.add_argument("--shard_retries", required=False, type=int, default=2, help="Times a shard that failed is run again before it is reported")
+    parser.add_argument("--batch_size", required=False, type=int, default=DEFAULT_BATCH_SIZE, help="Blocks written per database batch")
+    parser.add_argument("--batch_linger", required=False, type=float, default=DEFAULT_BATCH_LINGER, help="Maximum seconds a block waits in a partial batch in historical mode")
+    parser.add_argument("--bulk_load", action="store_true", help="Load historical blocks with deferred indexes, and COPY on postgres (postgres and sqlite only)")
+    parser.add_argument("--parquet_partition_by", required=False, default="range", help="Comma-separated Parquet partition keys, outermost first: range, day")
+    parser.add_argument("--parquet_range_size", required=False, type=int, help="Blocks per block_range partition of a Parquet dataset")
+    parser.add_argument("--parquet_row_group_size", required=False, type=int, help="Maximum rows per Parquet row group")
+    parser.add_argument("--parquet_compression", required=False, help="Parquet compression codec (zstd, snappy, gzip or none)")
+    parser.add_argument("--bigquery_write_method", required=False, default="load", choices=["load", "stream"], help="Write BigQuery rows with batch load jobs, or with streaming inserts")
+    parser.add_argument("--bigquery_load_size", required=False, type=int, default=DEFAULT_BIGQUERY_LOAD_SIZE, help="Blocks per BigQuery load job (replaces --batch_size)")
+    parser.add_argument("--bigquery_load_interval", required=False, type=float, default=DEFAULT_BIGQUERY_LOAD_INTERVAL, help="Maximum seconds a block waits for a BigQuery load job, in live mode too (replaces --batch_linger)")
+    parser.add_argument("--sidecar_url", required=False, default="http://172.18.0.1:8080", help="Base URL of the Substrate API Sidecar, or a comma-separated list of instances to spread requests across")
+    parser.add_argument("--sidecar_connect_timeout", required=False, type=float, default=DEFAULT_CONNECT_TIMEOUT, help="Seconds to wait for a sidecar connection")
+    parser.add_argument("--sidecar_timeout", required=False, type=float, default=DEFAULT_READ_TIMEOUT, help="Seconds to wait for a sidecar response")
+    parser.add_argument("--sidecar_retries", required=False, type=int, default=DEFAULT_MAX_RETRIES, help="Retries per sidecar request, with exponential backoff")
+    parser.add_argument("--sidecar_eject_after", required=False, type=int, default=DEFAULT_EJECT_AFTER, help="Failed requests in a row after which a sidecar instance is taken out of rotation")
+    parser.add_argument("--sidecar_eject_seconds", required=False, type=float, default=DEFAULT_EJECT_SECONDS, help="Seconds a failing sidecar instance stays out of rotation")
+    parser.add_argument("--block_cache", required=False, help="Directory of a local cache of raw sidecar blocks (disabled when unset)")
+    parser.add_argument("--block_cache_size_mb", required=False, type=int, default=DEFAULT_MAX_BYTES // 1024 ** 2, help="Size cap of the block cache in MB; least recently used blocks are evicted past it")
+    parser.add_argument("--from_cache", action="store_true", help="Read blocks only from --block_cache and never fetch them from sidecar (historical mode)")
+    parser.add_argument("--reset_tables", action="store_true", help="Drop the blocks table and checkpoints for this chain before ingesting")
+    parser.add_argument("--poll_interval", required=False, type=float, default=6, help="Seconds between chain head polls in live mode when no head subscription is connected")
+    parser.add_argument("--poll_only", action="store_true", help="Poll sidecar for the chain head instead of subscribing to finalized heads over --wss")
+    parser.add_argument("--best_blocks", action="store_true", help="In live mode, ingest best blocks as soon as they are imported and mark them finalized as finality advances")
+    parser.add_argument("--block_retries", required=False, type=int, default=5, help="Attempts per block before it is reported as failed in historical mode")
+    parser.add_argument("--metrics_port", required=False, type=int, help="Port to serve Prometheus metrics on (disabled when unset)")
+    parser.add_argument("--profile", action="store_true", help="Record per-block stage timings and payload sizes and print percentile summaries")
+    parser.add_argument("--profile_interval", required=False, type=float, default=profiling.DEFAULT_INTERVAL, help="Seconds between --profile summaries")
+    parser.add_argument("--profile_stacks", required=False, help="With --profile, sample the transform stage and write collapsed stacks to this file")
+    return parser
 
 
-def main():
-    args = parse_arguments()
-    
+def parse_arguments():
+    return build_argument_parser().parse_args()
+
+
+def build_database_info(args):
     database_info = {
         'database': args.database,
         'database_project': args.db_project,
@@ -46,101 +90,440 @@ def main():
         'database_port': args.db_port,
         'database_user': args.db_user,
         'database_password': args.db_password,
-        'database_name': args.db_name
+        'database_name': args.db_name,
+        'database_pool_size': args.db_pool_size or max(1, args.workers) + 1,
+        'database_bulk_load': args.bulk_load and args.ingest_mode == "historical",
+        'database_partition_by': tuple(key.strip() for key in args.parquet_partition_by.split(",") if key.strip()),
+        'database_range_size': args.parquet_range_size,
+        'database_row_group_size': args.parquet_row_group_size,
+        'database_compression': args.parquet_compression,
+        'database_write_method': args.bigquery_write_method,
+        # Shard processes load concurrently, so they split the daily load job budget
+        'database_load_jobs_per_day': BIGQUERY_LOAD_JOBS_PER_DAY / max(1, args.processes)
     }
 
+    if database_info['database_bulk_load'] and args.database not in ['postgres', 'sqlite']:
+        raise ValueError("--bulk_load is only supported for postgres and sqlite")
+    if args.database == 'parquet' and args.best_blocks:
+        # Parquet files are append-only, so finality cannot be flipped on blocks already written
+        raise ValueError("--best_blocks is not supported for parquet")
+    if uses_bigquery_loads(args) and args.best_blocks:
+        # Best blocks are written every cycle, which would run through the daily load job quota
+        raise ValueError("--best_blocks needs --bigquery_write_method stream")
+    return database_info
+
+
+def uses_bigquery_loads(args):
+    return args.database == 'bigquery' and args.bigquery_write_method == 'load'
+
+
+def write_batch_settings(args):
+    """
+    Return the blocks per database write and the longest a partial batch waits.
+
+    BigQuery allows 1500 jobs that modify a table per day, so load jobs are batched
+    by --bigquery_load_size and --bigquery_load_interval instead, and paced to
+    BIGQUERY_LOAD_JOBS_PER_DAY across all processes.
+    """
+    if uses_bigquery_loads(args):
+        return args.bigquery_load_size, args.bigquery_load_interval
+    return args.batch_size, args.batch_linger
+
+
+def start_metrics(args):
+    metrics.configure(args.chain, args.database)
+    if args.metrics_port:
+        metrics.start_server(args.metrics_port)
+
+
+def start_profiling(args, suffix=None):
+    if args.profile_stacks and not args.profile:
+        raise ValueError("--profile_stacks requires --profile")
+    if args.profile:
+        stacks_path = args.profile_stacks
+        if stacks_path and suffix:
+            stacks_path = f"{stacks_path}.{suffix}"
+        profiling.start(args.profile_interval, stacks_path)
+
+
+def checkpoint_save_interval(database_info):
+    # Checkpoint writes are DML jobs on BigQuery, so save them at most every 30 seconds there.
+    return 30 if database_info['database'] == 'bigquery' else 0
+
+
+def load_historical_checkpoint(args, database_info):
+    return Checkpoint.load(
+        database_info, args.chain, args.relay_chain,
+        historical_stream(args.start_block, args.end_block),
+        default_last_block=args.start_block - 1,
+        save_interval=checkpoint_save_interval(database_info)
+    )
+
+
+def load_live_checkpoint(args, database_info):
+    return Checkpoint.load(
+        database_info, args.chain, args.relay_chain, LIVE_STREAM,
+        default_last_block=-1,
+        save_interval=checkpoint_save_interval(database_info)
+    )
+
+
+def build_sidecar_client(args, pool_size):
+    sidecar_client = SidecarClient(
+        [url.strip() for url in args.sidecar_url.split(",") if url.strip()],
+        pool_size=pool_size,
+        connect_timeout=args.sidecar_connect_timeout,
+        read_timeout=args.sidecar_timeout,
+        max_retries=args.sidecar_retries,
+        eject_after=args.sidecar_eject_after,
+        eject_seconds=args.sidecar_eject_seconds
+    )
+    if args.from_cache and (not args.block_cache or args.ingest_mode != "historical"):
+        raise ValueError("--from_cache requires --block_cache and historical mode")
+    if args.block_cache:
+        block_cache = BlockCache(args.block_cache, max_bytes=args.block_cache_size_mb * 1024 ** 2)
+        sidecar_client = CachedSidecarClient(sidecar_client, block_cache, args.chain, args.relay_chain, offline=args.from_cache)
+    return sidecar_client
+
+
+def main():
+    args = parse_arguments()
+    database_info = build_database_info(args)
+    start_metrics(args)
+    start_profiling(args)
+
     # Connect to the database
-    db_connection = connect_to_database(database_info)
-    create_tables(db_connection, database_info, args.chain, args.relay_chain)
-    close_connection(db_connection, database_info)
+    with database_connection(database_info) as db_connection:
+        create_tables(db_connection, database_info, args.chain, args.relay_chain, reset=args.reset_tables)
     print(f"Connected to {args.database} and created tables for {args.chain} on {args.relay_chain}")
 
-    sidecar_url = "http://172.18.0.1:8080"
+    sidecar_client = build_sidecar_client(args, pool_size=max(1, args.workers) + 1)
 
     last_block = -1
+    batch_size, batch_linger = write_batch_settings(args)
+    bigquery_loads = uses_bigquery_loads(args)
+    # Live blocks are written batch_size at a time and flushed at the end of each cycle, except
+    # BigQuery loads, which wait for a full batch or --bigquery_load_interval
+    live_batcher = BlockBatcher(database_info, batch_size=batch_size, max_linger=batch_linger if bigquery_loads else float('inf'))
 
     if args.ingest_mode == "historical":
         try:
-            # Process blocks from start_block to end_block
-            for block_id in range(args.start_block, args.end_block + 1):
-                # Prepare the request for writing a block
-                block_write_request = {
-                    "chainName": args.chain,
-                    "relayChain": args.relay_chain,
-                    "blockId": block_id,
-                    "endpoint": sidecar_url,
-                    "bucket": "test-polka-data"
-                }
-                # Attempt to write the block, retry if unsuccessful
-                write_status = writeBlock(block_write_request, database_info)
-                while not write_status:
-                    write_status = writeBlock(block_write_request, database_info)
-                print(f"Processed block {block_id}")
+            # Process blocks from start_block (or the block after the checkpoint) to end_block
+            checkpoint = load_historical_checkpoint(args, database_info)
+            start_block = checkpoint.last_block + 1
+            if start_block > args.end_block:
+                print(f"Blocks {args.start_block}..{args.end_block} are already ingested")
+            elif database_info['database_bulk_load']:
+                # Indexes are dropped and rebuilt once here, not per shard
+                with database_connection(database_info) as db_connection:
+                    deferred_indexes = begin_bulk_load(db_connection, database_info, args.chain, args.relay_chain)
+                try:
+                    run_historical_range(args, database_info, sidecar_client, start_block, checkpoint)
+                finally:
+                    with database_connection(database_info) as db_connection:
+                        end_bulk_load(db_connection, database_info, args.chain, args.relay_chain, deferred_indexes)
+            else:
+                run_historical_range(args, database_info, sidecar_client, start_block, checkpoint)
         except Exception as e:
             # Handle any exceptions that occur during processing
             print(f"An error occurred: {e}. Retrying in 6 seconds.")
             print(traceback.format_exc())
+    elif args.best_blocks:
+        run_best_block_ingest(args, database_info, sidecar_client)
     else:
-        # For live ingest_mode, the original logic remains unchanged
+        # Resume after the last committed live block, if there is one. From here on
+        # the cursor is tracked in memory and only reconciled after a failure.
+        checkpoint = load_live_checkpoint(args, database_info)
+        last_block = reconcile_live_cursor(args, database_info, checkpoint)
+        head_subscription = None if args.poll_only else HeadSubscription(args.wss).start()
+        # Fetch the latest block number from the chain
+        chain_head = fetch_chain_head(sidecar_client)
         while True:
             try:
-                # Fetch the latest block number from the chain
-                chain_head = fetch_chain_head(sidecar_url)
-                
                 if chain_head == last_block:
                     # No new blocks since last check
-                    print("No new blocks to process. Retrying in 6 seconds.")
+                    print("No new blocks to process.")
                 elif last_block == -1:
                     # First run, start from the block before the current head
                     last_block = chain_head - 1
                 elif chain_head is not None:
                     # Process new blocks
+                    written = []
                     for block_id in range(last_block + 1, chain_head + 1):
                         # Prepare the request for writing a block
-                        block_write_request = {
-                            "chainName": args.chain,
-                            "relayChain": args.relay_chain,
-                            "blockId": block_id,
-                            "endpoint": sidecar_url,
-                            "bucket": "test-polka-data"
-                        }
-                        # Attempt to write the block, retry if unsuccessful
-                        write_status = writeBlock(block_write_request, database_info)
-                        while not write_status:
-                            write_status = writeBlock(block_write_request, database_info)
+                        block_write_request = build_block_write_request(args, block_id, sidecar_client.endpoint)
+                        # Attempt to fetch the block, backing off between retries
+                        block_data = prepareBlock(block_write_request, sidecar_client)
+                        attempt = 1
+                        while block_data is None:
+                            time.sleep(sidecar_client.backoff_delay(attempt))
+                            attempt += 1
+                            metrics.block_retry()
+                            block_data = prepareBlock(block_write_request, sidecar_client)
+                        written += live_batcher.add(block_data)
                         print(f"Processed block {block_id}")
+                    # Write whatever is left of this cycle's blocks (BigQuery loads only once they are due)
+                    written += live_batcher.flush_if_due() if bigquery_loads else live_batcher.flush()
+                    if len(live_batcher) == 0:
+                        checkpoint.advance_to(chain_head)
+                    elif written:
+                        # The checkpoint stops before the blocks still buffered
+                        checkpoint.advance_to(max(int(block_data['number']) for block_data in written))
                     # Update last processed block
                     last_block = chain_head
                 else:
                     # Failed to fetch chain head
-                    print("Failed to fetch chain head. Retrying in 6 seconds.")
-                
-                # Fetch the latest block number from the database
-                db_connection = connect_to_database(database_info)
-                df = query_last_block(db_connection, database_info, args.chain, args.relay_chain)
-                close_connection(db_connection, database_info)
-
-                last_block = int(df['number'].iloc[0])
+                    print(f"Failed to fetch chain head. Retrying in {args.poll_interval} seconds.")
             except Exception as e:
                 # Handle any exceptions that occur during processing
-                print(f"An error occurred: {e}. Retrying in 6 seconds.")
+                print(f"An error occurred: {e}. Retrying in {args.poll_interval} seconds.")
                 print(traceback.format_exc())
-            
-            # Wait before next iteration
-            time.sleep(6)
+                time.sleep(args.poll_interval)
+                # Part of the cycle may have been written; resume after whatever the database has
+                live_batcher.discard()
+                try:
+                    last_block = reconcile_live_cursor(args, database_info, checkpoint)
+                except Exception as e:
+                    print(f"Failed to reconcile the live cursor, keeping block {last_block}: {e}")
 
+            # Wait for the next finalized head
+            chain_head = wait_for_chain_head(sidecar_client, head_subscription, last_block, args.poll_interval)
+
+    close_connection_pools()
+    profiling.stop()
     print("Completed the ingest")
-    
 
-def fetch_chain_head(sidecar_url):
+
+def run_historical_range(args, database_info, sidecar_client, start_block, checkpoint):
+    if args.processes > 1:
+        return run_sharded_ingest(args, checkpoint)
+    return run_historical_ingest(args, database_info, sidecar_client, start_block, args.end_block, checkpoint)
+
+
+def build_block_write_request(args, block_id, sidecar_url):
+    return {
+        "chainName": args.chain,
+        "relayChain": args.relay_chain,
+        "blockId": block_id,
+        "endpoint": sidecar_url,
+        "bucket": "test-polka-data"
+    }
+
+
+def prepare_block_with_retry(block_write_request, sidecar_client, max_attempts):
+    """
+    Fetch and transform a single block, retrying up to max_attempts times with backoff.
+
+    Returns:
+        dict: The transformed block, or None if every attempt failed.
+    """
+    for attempt in range(1, max_attempts + 1):
+        if attempt > 1:
+            metrics.block_retry()
+        try:
+            block_data = prepareBlock(block_write_request, sidecar_client)
+            if block_data is not None:
+                return block_data
+            print(f"Attempt {attempt}/{max_attempts} for block {block_write_request['blockId']} returned incomplete data")
+        except Exception as e:
+            print(f"Attempt {attempt}/{max_attempts} for block {block_write_request['blockId']} failed: {e}")
+        if attempt < max_attempts:
+            time.sleep(sidecar_client.backoff_delay(attempt))
+    return None
+
+
+def write_batch_with_retry(batcher, write, max_attempts):
+    """
+    Run a batcher write (add, flush_if_due or flush), retrying the flush on failure.
+
+    Returns:
+        tuple: (blocks written, blocks dropped after every attempt failed)
+    """
     try:
-        response = requests.get(f"{sidecar_url}/blocks/head")
-        response.raise_for_status()
-        head_data = response.json()
-        return int(head_data['number'])
-    except requests.RequestException as e:
-        print(f"Error fetching chain head: {e}")
+        return write(), []
+    except Exception as e:
+        print(f"Attempt 1/{max_attempts} to write a batch of {len(batcher)} blocks failed: {e}")
+    for attempt in range(2, max_attempts + 1):
+        metrics.block_retry()
+        try:
+            return batcher.flush(), []
+        except Exception as e:
+            print(f"Attempt {attempt}/{max_attempts} to write a batch of {len(batcher)} blocks failed: {e}")
+    return [], batcher.discard()
+
+
+def run_historical_ingest(args, database_info, sidecar_client, start_block, end_block, checkpoint=None, on_commit=None):
+    """
+    Ingest blocks start_block..end_block across a bounded pool of worker threads.
+
+    Workers fetch and transform blocks; this thread buffers them in a BlockBatcher
+    and writes them batch_size at a time (or after batch_linger seconds). At most
+    2 * workers blocks are being fetched at any time, so memory stays flat
+    regardless of the size of the range. Progress is reported per committed batch
+    and the blocks that exhausted their retries are listed at the end. Committed
+    blocks advance checkpoint, if one is given, and are passed to on_commit.
+    """
+    block_ids = iter(range(start_block, end_block + 1))
+    total_blocks = end_block - start_block + 1
+    max_in_flight = max(1, args.workers) * 2
+    batch_size, batch_linger = write_batch_settings(args)
+    batcher = BlockBatcher(database_info, batch_size=batch_size, max_linger=batch_linger)
+    committed = 0
+    failed_blocks = []
+    started_at = time.time()
+
+    def record(result):
+        nonlocal committed
+        written, dropped = result
+        if written:
+            committed += len(written)
+            numbers = [int(block_data['number']) for block_data in written]
+            if checkpoint is not None:
+                checkpoint.mark_committed(numbers)
+            if on_commit is not None:
+                on_commit(numbers)
+            rate = committed / max(time.time() - started_at, 1e-9)
+            print(f"Processed blocks {min(numbers)}..{max(numbers)} "
+                  f"({committed}/{total_blocks}, {rate:.2f} blocks/s)")
+        metrics.failed_blocks(len(dropped))
+        for block_data in dropped:
+            failed_blocks.append(int(block_data['number']))
+            print(f"Failed block {block_data['number']}: batch write failed after {args.block_retries} attempts")
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        pending = {}
+        while True:
+            while len(pending) < max_in_flight:
+                block_id = next(block_ids, None)
+                if block_id is None:
+                    break
+                block_write_request = build_block_write_request(args, block_id, sidecar_client.endpoint)
+                future = executor.submit(prepare_block_with_retry, block_write_request, sidecar_client, args.block_retries)
+                pending[future] = block_id
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, timeout=batcher.seconds_until_due(), return_when=FIRST_COMPLETED)
+            for future in done:
+                block_id = pending.pop(future)
+                try:
+                    block_data = future.result()
+                except Exception as e:
+                    print(f"Block {block_id} raised an unexpected error: {e}")
+                    block_data = None
+
+                if block_data is None:
+                    failed_blocks.append(block_id)
+                    metrics.failed_blocks()
+                    print(f"Failed block {block_id} after {args.block_retries} attempts")
+                    continue
+                record(write_batch_with_retry(batcher, lambda: batcher.add(block_data), args.block_retries))
+
+            record(write_batch_with_retry(batcher, batcher.flush_if_due, args.block_retries))
+
+    record(write_batch_with_retry(batcher, batcher.flush, args.block_retries))
+
+    if checkpoint is not None:
+        checkpoint.save()
+    elapsed = time.time() - started_at
+    print(f"Historical ingest finished: {committed}/{total_blocks} blocks in {elapsed:.1f}s "
+          f"with {args.workers} worker(s)")
+    if failed_blocks:
+        print(f"Failed blocks: {sorted(failed_blocks)}")
+    return failed_blocks
+
+
+def run_best_block_ingest(args, database_info, sidecar_client):
+    """
+    Live ingest of best blocks, with finality applied in bulk and reorgs repaired. Runs forever.
+    """
+    checkpoint = load_live_checkpoint(args, database_info)
+    head_subscription = None if args.poll_only else HeadSubscription(args.wss).start()
+
+    def fetch_block(block_id):
+        block_write_request = build_block_write_request(args, block_id, sidecar_client.endpoint)
+        block_data = prepare_block_with_retry(block_write_request, sidecar_client, args.block_retries)
+        if block_data is None:
+            raise RuntimeError(f"Failed to fetch block {block_id}")
+        return block_data
+
+    best_block_ingest = BestBlockIngest(
+        database_info, args.chain, args.relay_chain, sidecar_client, checkpoint, fetch_block, args.batch_size
+    )
+    best_head = fetch_chain_head(sidecar_client, finalized=False)
+    while True:
+        try:
+            if best_head is None:
+                print(f"Failed to fetch chain head. Retrying in {args.poll_interval} seconds.")
+            else:
+                finalized_header = sidecar_client.get_head_header().data
+                best_block_ingest.sync(best_head, int(finalized_header['number']), finalized_header['parentHash'])
+        except Exception as e:
+            print(f"An error occurred: {e}. Retrying in {args.poll_interval} seconds.")
+            print(traceback.format_exc())
+            time.sleep(args.poll_interval)
+            # Unfinalized blocks are fetched again from the last finalized block
+            best_block_ingest.reset()
+
+        # Wait for the next best block
+        best_head = wait_for_chain_head(
+            sidecar_client, head_subscription, best_block_ingest.last_block, args.poll_interval, finalized=False
+        )
+
+
+def reconcile_live_cursor(args, database_info, checkpoint):
+    """
+    Return the block live ingest should continue after: the later of the live
+    checkpoint and the highest block in the database.
+
+    Blocks found past the checkpoint were committed before their checkpoint was
+    saved, so the checkpoint is advanced over them. A stream with no live
+    checkpoint yet (-1) is left alone and starts at the chain head: the table's
+    highest block may come from a historical run far behind the head.
+    """
+    if checkpoint.last_block < 0:
+        return checkpoint.last_block
+    with database_connection(database_info) as db_connection:
+        max_block = query_max_block_number(db_connection, database_info, args.chain, args.relay_chain)
+    if max_block is not None and max_block > checkpoint.last_block:
+        print(f"Continuing live ingest after block {max_block}, the last block in the database")
+        checkpoint.advance_to(max_block)
+    return checkpoint.last_block
+
+
+def fetch_chain_head(sidecar_client, finalized=True):
+    try:
+        response = sidecar_client.get_head_header(finalized)
+        chain_head = int(response.data['number'])
+        metrics.chain_head(chain_head)
+        return chain_head
+    except SidecarError as e:
+        print(f"Error fetching chain head (HTTP {e.status_code}, {e.attempts} attempts): {e}")
         return None
+
+
+def wait_for_chain_head(sidecar_client, head_subscription, last_block, poll_interval, finalized=True):
+    """
+    Wait for the finalized (or, if finalized is False, the best) head to move past last_block and return it.
+
+    While the head subscription is connected this returns as soon as a new
+    head is announced. Sidecar is polled instead after poll_interval
+    seconds when there is no subscription, and after the subscription's stall
+    timeout when it is connected but silent.
+
+    Returns:
+        int: The chain head, which may still equal last_block, or None if it could not be fetched.
+    """
+    if head_subscription is not None and head_subscription.connected:
+        chain_head = head_subscription.wait_for_head(last_block, timeout=head_subscription.stall_timeout, finalized=finalized)
+        if chain_head is not None and chain_head > last_block:
+            metrics.chain_head(chain_head)
+            return chain_head
+        if head_subscription.connected:
+            return fetch_chain_head(sidecar_client, finalized)
+    time.sleep(poll_interval)
+    return fetch_chain_head(sidecar_client, finalized)
     
 
 if __name__ == "__main__":
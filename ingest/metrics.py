@@ -0,0 +1,155 @@
+"""
+Prometheus metrics for the ingest process.
+
+Counters and histograms for the blocks written, sidecar request latency and
+retries, transform time, database write latency and batch size, and gauges for
+the chain head, the last ingested block and the lag between them. Together
+they show whether a slow backfill is waiting on sidecar, the transforms or the
+database. Every metric is labelled with the chain and the database backend.
+
+main.py and pipeline.py call configure() at startup and serve the metrics on
+--metrics_port. prometheus_client is optional: without it every function here
+is a no-op.
+
+With --processes > 1 only the parent process serves metrics. The shard
+processes report their committed blocks to it, so blocks ingested and the
+ingested block gauges are exported, but their stage timings are not.
+"""
+import time
+from contextlib import contextmanager
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+LABELS = ('chain', 'backend')
+TRANSFORM_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+DB_WRITE_BUCKETS = (.01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+BATCH_SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+_labels = {'chain': 'unknown', 'backend': 'unknown'}
+_chain_head = None
+_last_block = None
+
+if prometheus_client is not None:
+    BLOCKS_INGESTED = prometheus_client.Counter(
+        'dotlake_blocks_ingested_total', 'Blocks written to the database', LABELS)
+    FAILED_BLOCKS = prometheus_client.Counter(
+        'dotlake_failed_blocks_total', 'Blocks given up on after every attempt failed', LABELS)
+    BLOCK_RETRIES = prometheus_client.Counter(
+        'dotlake_block_retries_total', 'Block fetches and batch writes attempted again after a failure', LABELS)
+    SIDECAR_REQUEST_SECONDS = prometheus_client.Histogram(
+        'dotlake_sidecar_request_seconds', 'Latency of sidecar requests, per attempt', LABELS + ('outcome',))
+    SIDECAR_RETRIES = prometheus_client.Counter(
+        'dotlake_sidecar_retries_total', 'Sidecar requests retried after a failed attempt', LABELS)
+    TRANSFORM_SECONDS = prometheus_client.Histogram(
+        'dotlake_transform_seconds', 'Time to transform one sidecar block into rows', LABELS, buckets=TRANSFORM_BUCKETS)
+    DB_WRITE_SECONDS = prometheus_client.Histogram(
+        'dotlake_db_write_seconds', 'Latency of one batch write to the database', LABELS + ('outcome',),
+        buckets=DB_WRITE_BUCKETS)
+    BATCH_SIZE = prometheus_client.Histogram(
+        'dotlake_batch_size_blocks', 'Blocks per database batch write', LABELS, buckets=BATCH_SIZE_BUCKETS)
+    CHAIN_HEAD = prometheus_client.Gauge(
+        'dotlake_chain_head', 'Latest chain head seen', LABELS)
+    LAST_INGESTED_BLOCK = prometheus_client.Gauge(
+        'dotlake_last_ingested_block', 'Highest block written to the database', LABELS)
+    HEAD_LAG = prometheus_client.Gauge(
+        'dotlake_head_lag_blocks', 'Blocks between the chain head and the highest block written', LABELS)
+
+
+def configure(chain, backend):
+    """
+    Set the chain and backend labels of every metric this process reports.
+    """
+    _labels['chain'] = chain
+    _labels['backend'] = backend
+
+
+def start_server(port):
+    """
+    Serve the metrics over HTTP on port, in a background thread.
+    """
+    if prometheus_client is None:
+        print(f"prometheus_client is not installed; not serving metrics on port {port}")
+        return
+    prometheus_client.start_http_server(port)
+    print(f"Serving metrics on port {port}")
+
+
+def blocks_ingested(numbers):
+    """
+    Count blocks written to the database and advance the last ingested block to the highest of them.
+    """
+    global _last_block
+    if prometheus_client is None or not numbers:
+        return
+    BLOCKS_INGESTED.labels(**_labels).inc(len(numbers))
+    highest = max(numbers)
+    if _last_block is None or highest > _last_block:
+        _last_block = highest
+        LAST_INGESTED_BLOCK.labels(**_labels).set(highest)
+        _update_lag()
+
+
+def chain_head(number):
+    """
+    Record the latest chain head seen.
+    """
+    global _chain_head
+    if prometheus_client is None or number is None:
+        return
+    _chain_head = number
+    CHAIN_HEAD.labels(**_labels).set(number)
+    _update_lag()
+
+
+def _update_lag():
+    if _chain_head is not None and _last_block is not None:
+        HEAD_LAG.labels(**_labels).set(max(0, _chain_head - _last_block))
+
+
+def failed_blocks(count=1):
+    if prometheus_client is not None and count:
+        FAILED_BLOCKS.labels(**_labels).inc(count)
+
+
+def block_retry():
+    if prometheus_client is not None:
+        BLOCK_RETRIES.labels(**_labels).inc()
+
+
+def sidecar_request(latency, outcome):
+    """
+    Record one sidecar request attempt; outcome is 'ok' or 'error'.
+    """
+    if prometheus_client is not None:
+        SIDECAR_REQUEST_SECONDS.labels(outcome=outcome, **_labels).observe(latency)
+
+
+def sidecar_retry():
+    if prometheus_client is not None:
+        SIDECAR_RETRIES.labels(**_labels).inc()
+
+
+def transform_time(seconds):
+    if prometheus_client is not None:
+        TRANSFORM_SECONDS.labels(**_labels).observe(seconds)
+
+
+@contextmanager
+def db_write(batch_size):
+    """
+    Time a batch write to the database and record its size; the outcome label is 'error' if it raises.
+    """
+    if prometheus_client is None:
+        yield
+        return
+    started_at = time.monotonic()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        DB_WRITE_SECONDS.labels(outcome=outcome, **_labels).observe(time.monotonic() - started_at)
+        BATCH_SIZE.labels(**_labels).observe(batch_size)
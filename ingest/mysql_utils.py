@@ -3,6 +3,7 @@ import mysql.connector
 from mysql.connector import Error
 import json
 import pandas as pd
+from serializer import sql_row, record_row, extrinsic_records, event_records, EXTRINSIC_COLUMNS, EVENT_COLUMNS
 
 def connect_to_mysql(host, port, database, user, password):
     """
@@ -33,22 +34,28 @@ def connect_to_mysql(host, port, database, user, password):
         print(f"Error connecting to MySQL database: {e}")
     return None
 
-def create_tables(connection, chain, relay_chain):
+def create_tables(connection, chain, relay_chain, reset=False):
     """
     Create necessary tables in the MySQL database if they don't exist.
 
+    Existing tables and their data are kept so ingest can resume from its
+    checkpoint, unless reset is set.
+
     Args:
         connection (mysql.connector.connection.MySQLConnection): The database connection object.
+        reset (bool): Drop the blocks table and this chain's checkpoints first.
     """
     try:
-        delete_table(connection, f"blocks_{relay_chain}_{chain}")
+        if reset:
+            for table_name in block_table_names(chain, relay_chain):
+                delete_table(connection, table_name)
         cursor = connection.cursor()
         cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS blocks_{relay_chain}_{chain} (
                 relay_chain VARCHAR(255),
                 chain VARCHAR(255),
                 timestamp BIGINT,
-                number VARCHAR(255) PRIMARY KEY,
+                number BIGINT PRIMARY KEY,
                 hash VARCHAR(255),
                 parenthash VARCHAR(255),
                 stateroot VARCHAR(255),
@@ -58,82 +65,253 @@ def create_tables(connection, chain, relay_chain):
                 extrinsics JSON,
                 onfinalize JSON,
                 oninitialize JSON,
-                logs JSON
+                logs JSON,
+                extrinsic_count INT,
+                event_count INT,
+                signed_extrinsic_count INT,
+                failed_extrinsic_count INT,
+                total_fee DECIMAL(39, 0),
+                total_tip DECIMAL(39, 0),
+                weight BIGINT
+            )
+        """)
+        # number is the clustered primary key, so head lookups and range scans in either direction use it directly
+        migrate_number_column(cursor, chain, relay_chain)
+        migrate_summary_columns(cursor, chain, relay_chain)
+        ensure_index(cursor, f"blocks_{relay_chain}_{chain}", "hash", "hash")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+                relay_chain VARCHAR(255),
+                chain VARCHAR(255),
+                stream VARCHAR(255),
+                last_block BIGINT NOT NULL,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (relay_chain, chain, stream)
+            )
+        """)
+        if reset:
+            cursor.execute(
+                "DELETE FROM ingest_checkpoints WHERE relay_chain = %s AND chain = %s",
+                (relay_chain, chain)
+            )
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS extrinsics_{relay_chain}_{chain} (
+                number BIGINT NOT NULL,
+                extrinsic_index INT NOT NULL,
+                hash VARCHAR(255),
+                pallet VARCHAR(255) NOT NULL,
+                method VARCHAR(255) NOT NULL,
+                signer VARCHAR(255),
+                nonce BIGINT,
+                tip DECIMAL(39, 0),
+                fee DECIMAL(39, 0),
+                success BOOLEAN,
+                paysfee BOOLEAN,
+                PRIMARY KEY (number, extrinsic_index),
+                INDEX pallet_method (pallet, method),
+                INDEX signer (signer, pallet, method),
+                INDEX signer_number (signer, number, extrinsic_index),
+                INDEX hash (hash)
+            )
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS events_{relay_chain}_{chain} (
+                number BIGINT NOT NULL,
+                event_index INT NOT NULL,
+                extrinsic_index INT,
+                phase VARCHAR(32) NOT NULL,
+                pallet VARCHAR(255) NOT NULL,
+                method VARCHAR(255) NOT NULL,
+                data JSON,
+                PRIMARY KEY (number, event_index),
+                INDEX pallet_method (pallet, method)
             )
         """)
-        # cursor.execute("""
-        #     CREATE TABLE IF NOT EXISTS extrinsics (
-        #         block_number VARCHAR(255),
-        #         pallet VARCHAR(255),
-        #         method VARCHAR(255),
-        #         signature VARCHAR(255),
-        #         signer_id VARCHAR(255),
-        #         events JSON,
-        #         FOREIGN KEY (block_number) REFERENCES blocks(number)
-        #     )
-        # """)
+        # Tables created before hash and signer search existed
+        ensure_index(cursor, f"extrinsics_{relay_chain}_{chain}", "signer_number", "signer, number, extrinsic_index")
+        ensure_index(cursor, f"extrinsics_{relay_chain}_{chain}", "hash", "hash")
         connection.commit()
         print("Tables created successfully")
     except Error as e:
         print(f"Error creating tables: {e}")
 
+# Per-block summary columns computed at ingest time, added to tables created before they existed
+SUMMARY_COLUMNS = {
+    "extrinsic_count": "INT",
+    "event_count": "INT",
+    "signed_extrinsic_count": "INT",
+    "failed_extrinsic_count": "INT",
+    "total_fee": "DECIMAL(39, 0)",
+    "total_tip": "DECIMAL(39, 0)",
+    "weight": "BIGINT",
+}
+
+BLOCK_COLUMNS = (
+    "relay_chain", "chain", "timestamp", "number", "hash", "parenthash", "stateroot",
+    "extrinsicsroot", "authorid", "finalized", "extrinsics", "onfinalize", "oninitialize", "logs"
+) + tuple(SUMMARY_COLUMNS)
+
+
+def migrate_number_column(cursor, chain, relay_chain):
+    """
+    Convert the number column of a blocks table created with VARCHAR(255) to BIGINT in place.
+
+    Args:
+        cursor (mysql.connector.cursor.MySQLCursor): A cursor on the database connection.
+        chain (str): The name of the chain.
+        relay_chain (str): The name of the relay chain.
+    """
+    table_name = f"blocks_{relay_chain}_{chain}"
+    cursor.execute("""
+        SELECT DATA_TYPE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'number'
+    """, (table_name,))
+    row = cursor.fetchone()
+    if row is not None and row[0].lower() != 'bigint':
+        print(f"Migrating {table_name}.number from {row[0]} to BIGINT")
+        cursor.execute(f"ALTER TABLE {table_name} MODIFY number BIGINT NOT NULL")
+
+
+def migrate_summary_columns(cursor, chain, relay_chain):
+    """
+    Add the summary columns missing from a blocks table created without them. Existing rows keep NULLs until re-ingested.
+
+    Args:
+        cursor (mysql.connector.cursor.MySQLCursor): A cursor on the database connection.
+        chain (str): The name of the chain.
+        relay_chain (str): The name of the relay chain.
+    """
+    table_name = f"blocks_{relay_chain}_{chain}"
+    cursor.execute("""
+        SELECT COLUMN_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table_name,))
+    existing = {row[0].lower() for row in cursor.fetchall()}
+    missing = [column for column in SUMMARY_COLUMNS if column not in existing]
+    if missing:
+        print(f"Adding summary columns {missing} to {table_name}")
+        cursor.execute(f"ALTER TABLE {table_name} " + ", ".join(f"ADD COLUMN {column} {SUMMARY_COLUMNS[column]}" for column in missing))
+
+
+def ensure_index(cursor, table_name, index_name, columns):
+    """
+    Create an index unless the table already has one with that name. MySQL has no CREATE INDEX IF NOT EXISTS.
+
+    Args:
+        cursor (mysql.connector.cursor.MySQLCursor): A cursor on the database connection.
+        table_name (str): The table to index.
+        index_name (str): The index name.
+        columns (str): Comma-separated indexed columns.
+    """
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1
+    """, (table_name, index_name))
+    if cursor.fetchone() is None:
+        print(f"Creating index {index_name} on {table_name} ({columns})")
+        cursor.execute(f"CREATE INDEX {index_name} ON {table_name} ({columns})")
+
+
+def block_table_names(chain, relay_chain):
+    """
+    Names of the tables written for each block: the blocks table, then the
+    normalized extrinsics and events tables.
+    """
+    return (f"blocks_{relay_chain}_{chain}", f"extrinsics_{relay_chain}_{chain}", f"events_{relay_chain}_{chain}")
+
+
+def replace_block_details(cursor, blocks, chain_name, relay_chain):
+    """
+    Replace the extrinsics and events rows of the given blocks, on the caller's transaction.
+
+    Existing rows are deleted first, so re-ingesting a block never leaves rows
+    from an earlier version of it behind.
+
+    Args:
+        cursor (mysql.connector.cursor.MySQLCursor): A cursor on the database connection.
+        blocks (list): The block data dicts whose details are written.
+        chain_name (str): The name of the chain.
+        relay_chain (str): The name of the relay chain.
+    """
+    _, extrinsics_table, events_table = block_table_names(chain_name, relay_chain)
+    numbers = [block_data['number'] for block_data in blocks]
+    for table_name, columns, records in (
+        (extrinsics_table, EXTRINSIC_COLUMNS, extrinsic_records),
+        (events_table, EVENT_COLUMNS, event_records),
+    ):
+        cursor.execute(
+            f"DELETE FROM {table_name} WHERE number IN ({', '.join(['%s'] * len(numbers))})", numbers
+        )
+        rows = [record_row(record, columns) for block_data in blocks for record in records(block_data)]
+        if rows:
+            cursor.executemany(
+                f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})", rows
+            )
+
+
+def block_row(block_data):
+    """
+    Build the row tuple for a block, in BLOCK_COLUMNS order.
+    """
+    return sql_row(block_data, BLOCK_COLUMNS)
+
+
 def insert_block_data(connection, block_data, chain_name, relay_chain):
     """
-    Insert processed block data into the MySQL database.
+    Insert processed block data into the MySQL database, replacing a block already stored.
 
     Args:
         connection (mysql.connector.connection.MySQLConnection): The database connection object.
         block_data (dict): The block data to be inserted.
     """
+    insert_blocks_data(connection, [block_data], chain_name, relay_chain)
+
+
+def insert_blocks_data(connection, blocks, chain_name, relay_chain):
+    """
+    Upsert many blocks, with their extrinsics and events, using executemany and one commit.
+
+    mysql-connector rewrites the executemany into multi-row INSERT statements.
+
+    Args:
+        connection (mysql.connector.connection.MySQLConnection): The database connection object.
+        blocks (list): The block data dicts to be inserted.
+        chain_name (str): The name of the chain.
+        relay_chain (str): The name of the relay chain.
+    """
     try:
         cursor = connection.cursor()
-        
-        # Insert block data
+        update_clause = ", ".join(f"{column} = VALUES({column})" for column in BLOCK_COLUMNS if column != "number")
         block_insert_query = f"""
-        INSERT INTO blocks_{relay_chain}_{chain_name} (relay_chain, chain, timestamp, number, hash, parenthash, stateroot, extrinsicsroot, authorid, finalized, extrinsics, onfinalize, oninitialize, logs)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        INSERT INTO blocks_{relay_chain}_{chain_name} ({", ".join(BLOCK_COLUMNS)})
+        VALUES ({", ".join(["%s"] * len(BLOCK_COLUMNS))})
+        ON DUPLICATE KEY UPDATE {update_clause}
         """
-        block_values = (
-            block_data['relay_chain'], block_data['chain'], block_data['timestamp'],
-            block_data['number'], block_data['hash'], block_data['parentHash'],
-            block_data['stateRoot'], block_data['extrinsicsRoot'], block_data['authorId'],
-            block_data['finalized'], json.dumps(block_data['extrinsics']),
-            json.dumps(block_data['onFinalize']), json.dumps(block_data['onInitialize']),
-            json.dumps(block_data['logs'])
-        )
-        cursor.execute(block_insert_query, block_values)
-
-        # Insert extrinsics data
-        # extrinsic_insert_query = """
-        # INSERT INTO extrinsics (block_number, pallet, method, signature, signer_id)
-        # VALUES (%s, %s, %s, %s, %s)
-        # """
-        # for extrinsic in block_data['extrinsics']:
-        #     extrinsic_values = (
-        #         block_data['number'], extrinsic['method']['pallet'], extrinsic['method']['method'],
-        #         extrinsic['signature'].get('signature'), extrinsic['signature'].get('signer', {}).get('id')
-        #     )
-        #     cursor.execute(extrinsic_insert_query, extrinsic_values)
-
+        cursor.executemany(block_insert_query, [block_row(block_data) for block_data in blocks])
+        replace_block_details(cursor, blocks, chain_name, relay_chain)
         connection.commit()
-        print(f"Block {block_data['number']} inserted successfully")
+        print(f"{len(blocks)} blocks inserted/updated successfully")
     except Error as e:
-        print(f"Error inserting block data: {e}")
+        print(f"Error inserting block batch: {e}")
+        connection.rollback()
+        raise
 
-def query_block_data(connection, query_str):
+def query_block_data(connection, query_str, params=None):
     """
     Execute a given SQL query on the MySQL database and return the results as a DataFrame.
 
     Args:
         connection (mysql.connector.connection.MySQLConnection): The database connection object.
         query_str (str): The SQL query string to execute.
+        params (dict): Values bound to %(name)s placeholders in query_str.
 
     Returns:
         pandas.DataFrame: The query results as a DataFrame, or None if an error occurs.
     """
+    cursor = None
     try:
         cursor = connection.cursor(dictionary=True)
-        cursor.execute(query_str)
+        cursor.execute(query_str, params)
         results = cursor.fetchall()
         df = pd.DataFrame(results)
         return df
@@ -144,6 +322,88 @@ def query_block_data(connection, query_str):
         if cursor:
             cursor.close()
 
+def mark_finalized(connection, chain, relay_chain, start_block, end_block):
+    """
+    Set finalized on blocks start_block..end_block (inclusive) with a single UPDATE.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"""
+            UPDATE blocks_{relay_chain}_{chain} SET finalized = TRUE
+            WHERE number BETWEEN %s AND %s AND finalized IS NOT TRUE
+        """, (start_block, end_block))
+        connection.commit()
+    except Error as e:
+        print(f"Error marking blocks finalized: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def delete_unfinalized_blocks(connection, chain, relay_chain, above_block):
+    """
+    Delete the unfinalized blocks above above_block, with their extrinsics and events, in one transaction.
+    """
+    blocks_table, extrinsics_table, events_table = block_table_names(chain, relay_chain)
+    cursor = connection.cursor()
+    try:
+        for table_name in (extrinsics_table, events_table):
+            cursor.execute(f"""
+                DELETE FROM {table_name} WHERE number IN (
+                    SELECT number FROM {blocks_table} WHERE number > %s AND finalized IS NOT TRUE
+                )
+            """, (above_block,))
+        cursor.execute(f"DELETE FROM {blocks_table} WHERE number > %s AND finalized IS NOT TRUE", (above_block,))
+        connection.commit()
+    except Error as e:
+        print(f"Error deleting blocks above {above_block}: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def load_checkpoint(connection, chain, relay_chain, stream):
+    """
+    Read the last committed block recorded for an ingest stream.
+
+    Returns:
+        int: The last committed block number, or None if the stream has no checkpoint.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT last_block FROM ingest_checkpoints WHERE relay_chain = %s AND chain = %s AND stream = %s",
+            (relay_chain, chain, stream)
+        )
+        row = cursor.fetchone()
+        connection.commit()
+        return None if row is None else int(row[0])
+    finally:
+        cursor.close()
+
+
+def save_checkpoint(connection, chain, relay_chain, stream, last_block):
+    """
+    Record the last committed block for an ingest stream.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO ingest_checkpoints (relay_chain, chain, stream, last_block)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE last_block = VALUES(last_block), updated_at = CURRENT_TIMESTAMP
+        """, (relay_chain, chain, stream, last_block))
+        connection.commit()
+    except Error as e:
+        print(f"Error saving checkpoint: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
 def delete_table(connection, table_name):
     """
     Delete a table from the MySQL database if it exists.
@@ -52,68 +52,107 @@ st.title("Search Block")
 
 st.sidebar.header("Search Blocks")
 
-# Text input for block number
-block_number = st.text_input("Enter Block Number:", "")
-
-if block_number:
+from explorer_data import block, block_by_hash, extrinsics_by_hash, signer_extrinsics, SIGNER_PAGE_SIZE
+
+
+def show_block(result):
+    """
+    Render the basic information, extrinsics and events of a one-row block result.
+    """
+    st.subheader(f"Block Details: {result['number'].iloc[0]}")
+
+    # Display basic block information
+    st.write("Basic Information:")
+    basic_info = result[['number', 'hash', 'parenthash', 'stateroot', 'extrinsicsroot', 'authorid', 'timestamp', 'finalized']]
+    data = np.array([basic_info.columns, basic_info.iloc[0].to_list()])
+    data = data.transpose()
+    data_df = pd.DataFrame(data)
+    st.dataframe(data_df, hide_index=True)
+
+    # Display extrinsics
+    st.write("Extrinsics:")
+    if args.database == 'postgres':
+        extrinsics = pd.DataFrame(result['extrinsics'].iloc[0])
+    elif args.database in ['mysql', 'sqlite', 'parquet']:
+        extrinsics = pd.DataFrame(json.loads(result['extrinsics'].iloc[0]))
+    elif args.database == 'bigquery':
+        extrinsics = pd.DataFrame(result['extrinsics'].iloc[0])
+    else:
+        extrinsics = pd.DataFrame()  # Default empty DataFrame if database type is not recognized
+    st.dataframe(extrinsics)
+
+    # Display events
+    st.write("Events:")
+    if args.database == 'postgres':
+        events = [
+            event for extrinsic in result['extrinsics'].iloc[0]
+            for event in extrinsic['events']
+        ] + result['oninitialize'].iloc[0]['events'] + result['onfinalize'].iloc[0]['events']
+    elif args.database in ['mysql', 'sqlite', 'parquet']:
+        events = [
+            event for extrinsic in json.loads(result['extrinsics'].iloc[0])
+            for event in extrinsic['events']
+        ] + json.loads(result['oninitialize'].iloc[0])['events'] + json.loads(result['onfinalize'].iloc[0])['events']
+    elif args.database == 'bigquery':
+        events = [
+            event for extrinsic in result['extrinsics'].iloc[0]
+            for event in extrinsic['events']
+        ] + result['oninitialize'].iloc[0]['events'].tolist() + result['onfinalize'].iloc[0]['events'].tolist()
+    else:
+        events = []  # Default empty list if database type is not recognized
+    events = pd.DataFrame(events)
+    st.dataframe(events)
+
+
+search_by = st.radio("Search by:", ["Block number", "Block hash", "Extrinsic hash", "Signer"], horizontal=True)
+search_value = st.text_input(f"Enter {search_by}:", "").strip()
+
+if search_value:
     try:
-        # Convert input to integer
-        block_number = int(block_number)
-
-        from database_utils import connect_to_database, close_connection, query_last_block
-
-        db_connection = connect_to_database(database_info)
-        # fetch_last_block_query = f"SELECT * FROM blocks_{args.relay_chain}_{args.chain} WHERE number = {block_number} LIMIT 1"
-        result = query_last_block(db_connection, database_info, args.chain, args.relay_chain, block_number)
-        close_connection(db_connection, database_info)
-
-        if not result.empty:
-            st.subheader(f"Block Details: {block_number}")
-            
-            # Display basic block information
-            st.write("Basic Information:")
-            basic_info = result[['number', 'hash', 'parenthash', 'stateroot', 'extrinsicsroot', 'authorid', 'timestamp', 'finalized']]
-            data = np.array([basic_info.columns, basic_info.iloc[0].to_list()])
-            data = data.transpose()
-            data_df = pd.DataFrame(data)
-            st.dataframe(data_df, hide_index=True)
-
-            # Display extrinsics
-            st.write("Extrinsics:")
-            if args.database == 'postgres':
-                extrinsics = pd.DataFrame(result['extrinsics'].iloc[0])
-            elif args.database == 'mysql':
-                extrinsics = pd.DataFrame(json.loads(result['extrinsics'].iloc[0]))
-            elif args.database == 'bigquery':
-                extrinsics = pd.DataFrame(result['extrinsics'].iloc[0])
+        if search_by == "Block number":
+            # Convert input to integer
+            block_number = int(search_value)
+            result = block(database_info, args.chain, args.relay_chain, block_number)
+            if not result.empty:
+                show_block(result)
             else:
-                extrinsics = pd.DataFrame()  # Default empty DataFrame if database type is not recognized
-            st.dataframe(extrinsics)
-
-            # Display events
-            st.write("Events:")
-            if args.database == 'postgres':
-                events = [
-                    event for extrinsic in result['extrinsics'].iloc[0]
-                    for event in extrinsic['events']
-                ] + result['oninitialize'].iloc[0]['events'] + result['onfinalize'].iloc[0]['events']
-            elif args.database == 'mysql':
-                events = [
-                    event for extrinsic in json.loads(result['extrinsics'].iloc[0])
-                    for event in extrinsic['events']
-                ] + json.loads(result['oninitialize'].iloc[0])['events'] + json.loads(result['onfinalize'].iloc[0])['events']
-            elif args.database == 'bigquery':
-                events = [
-                    event for extrinsic in result['extrinsics'].iloc[0]
-                    for event in extrinsic['events']
-                ] + result['oninitialize'].iloc[0]['events'].tolist() + result['onfinalize'].iloc[0]['events'].tolist()
+                st.warning(f"No block found with number {block_number}")
+
+        elif search_by == "Block hash":
+            result = block_by_hash(database_info, args.chain, args.relay_chain, search_value)
+            if not result.empty:
+                show_block(result)
             else:
-                events = []  # Default empty list if database type is not recognized
-            events = pd.DataFrame(events)
-            st.dataframe(events)
+                st.warning(f"No block found with hash {search_value}")
+
+        elif search_by == "Extrinsic hash":
+            result = extrinsics_by_hash(database_info, args.chain, args.relay_chain, search_value)
+            if not result.empty:
+                st.subheader(f"Extrinsics with hash {search_value}")
+                st.dataframe(result, hide_index=True)
+            else:
+                st.warning(f"No extrinsic found with hash {search_value}")
 
         else:
-            st.warning(f"No block found with number {block_number}")
+            # Keyset pagination: each page starts after the (number, extrinsic_index) of the previous page's last row
+            if st.session_state.get('signer') != search_value:
+                st.session_state['signer'] = search_value
+                st.session_state['signer_pages'] = [None]
+            pages = st.session_state['signer_pages']
+            result = signer_extrinsics(database_info, args.chain, args.relay_chain, search_value, pages[-1])
+            if result.empty and len(pages) == 1:
+                st.warning(f"No extrinsics found for signer {search_value}")
+            else:
+                st.subheader(f"Extrinsics signed by {search_value} (page {len(pages)})")
+                st.dataframe(result, hide_index=True)
+                previous_column, next_column = st.columns(2)
+                if previous_column.button("Previous page", disabled=len(pages) == 1):
+                    pages.pop()
+                    st.rerun()
+                if next_column.button("Next page", disabled=len(result) < SIGNER_PAGE_SIZE):
+                    last_row = result.iloc[-1]
+                    pages.append((int(last_row['number']), int(last_row['extrinsic_index'])))
+                    st.rerun()
 
     # except ValueError:
     #     st.error("Please enter a valid integer for the block number.")
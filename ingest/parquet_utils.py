@@ -0,0 +1,500 @@
+"""
+Partitioned Parquet sink.
+
+Each chain gets three datasets under the root directory, matching the SQL
+tables: blocks_<relay_chain>_<chain>, extrinsics_<relay_chain>_<chain> and
+events_<relay_chain>_<chain>. Every write appends new files. Files are laid out
+in hive-style partitions by block-number range and/or UTC day:
+
+    <root>/blocks_polkadot_polkadot/block_range=000000000-000099999/part-000000001-000000050-000000000007-<uuid>.parquet
+
+A file is written under a dot-prefixed temporary name (readers skip those) and
+renamed into place with os.replace, so a reader never sees a partial file. The
+block range in the file name lets the last block be found without opening any
+file. Every batch takes the next number of a write sequence shared by all
+processes writing under the root, and stores it in the file name and in each
+row's _write_sequence column. Re-ingested blocks are appended again; readers
+keep the row with the highest sequence.
+
+Each batch adds one small file per dataset and partition, so after every write
+the partitions it touched are compacted. Files are merged only with files of
+a similar size: COMPACT_FAN_IN files of about the same block span become one
+file spanning as many blocks. Files spanning row_group_size blocks or more are
+left alone. Every block is rewritten a few times at most, and a partition keeps
+a few dozen files rather than one per batch. The merged file is renamed into
+place before the files it replaces are deleted, so a reader sees every row at
+least once, and duplicates resolve to the same row. Merged rows keep the
+sequence of the file they came from, and the merged file is named after the
+highest one.
+
+Checkpoints are small JSON files under <root>/_checkpoints, replaced atomically
+the same way.
+"""
+import datetime
+import fcntl
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+import uuid
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from serializer import sql_row, record_row, extrinsic_records, event_records, EXTRINSIC_COLUMNS, EVENT_COLUMNS
+
+DEFAULT_PARTITION_BY = ("range",)
+DEFAULT_RANGE_SIZE = 100000
+DEFAULT_ROW_GROUP_SIZE = 10000
+DEFAULT_COMPRESSION = "zstd"
+PARTITION_KEYS = ("day", "range")
+# Files of the same size tier merged into one, where a tier is the block span rounded down to a power of this
+COMPACT_FAN_IN = 10
+# Per-row write sequence; the highest copy of a row is the current one
+SEQUENCE_COLUMN = "_write_sequence"
+
+BLOCK_SCHEMA = pa.schema([
+    ("relay_chain", pa.string()),
+    ("chain", pa.string()),
+    ("timestamp", pa.int64()),
+    ("number", pa.int64()),
+    ("hash", pa.string()),
+    ("parenthash", pa.string()),
+    ("stateroot", pa.string()),
+    ("extrinsicsroot", pa.string()),
+    ("authorid", pa.string()),
+    ("finalized", pa.bool_()),
+    ("oninitialize", pa.string()),
+    ("onfinalize", pa.string()),
+    ("logs", pa.string()),
+    ("extrinsics", pa.string()),
+    ("extrinsic_count", pa.int32()),
+    ("event_count", pa.int32()),
+    ("signed_extrinsic_count", pa.int32()),
+    ("failed_extrinsic_count", pa.int32()),
+    ("total_fee", pa.string()),
+    ("total_tip", pa.string()),
+    ("weight", pa.int64()),
+])
+EXTRINSIC_SCHEMA = pa.schema([
+    ("number", pa.int64()),
+    ("extrinsic_index", pa.int32()),
+    ("hash", pa.string()),
+    ("pallet", pa.string()),
+    ("method", pa.string()),
+    ("signer", pa.string()),
+    ("nonce", pa.string()),
+    ("tip", pa.string()),
+    ("fee", pa.string()),
+    ("success", pa.bool_()),
+    ("paysfee", pa.bool_()),
+])
+EVENT_SCHEMA = pa.schema([
+    ("number", pa.int64()),
+    ("event_index", pa.int32()),
+    ("extrinsic_index", pa.int32()),
+    ("phase", pa.string()),
+    ("pallet", pa.string()),
+    ("method", pa.string()),
+    ("data", pa.string()),
+])
+
+_PART_NAME = re.compile(r"^part-(\d+)-(\d+)-(\d+)-[0-9a-f]+\.parquet$")
+
+
+class ParquetStore:
+    """
+    Settings of a Parquet dataset root; stands in for a database connection.
+
+    Args:
+        root (str): Directory the datasets are written under.
+        partition_by (tuple): Partition keys, any of "day" and "range", outermost first.
+        range_size (int): Blocks per block_range partition.
+        row_group_size (int): Maximum rows per Parquet row group.
+        compression (str): Parquet compression codec, e.g. "zstd", "snappy" or "none".
+    """
+
+    def __init__(self, root, partition_by=DEFAULT_PARTITION_BY, range_size=DEFAULT_RANGE_SIZE,
+                 row_group_size=DEFAULT_ROW_GROUP_SIZE, compression=DEFAULT_COMPRESSION):
+        unknown = set(partition_by) - set(PARTITION_KEYS)
+        if unknown:
+            raise ValueError(f"Unsupported Parquet partition keys: {sorted(unknown)}")
+        self.root = root
+        self.partition_by = tuple(partition_by)
+        self.range_size = range_size
+        self.row_group_size = row_group_size
+        self.compression = compression
+
+
+def connect_to_parquet(root, partition_by=DEFAULT_PARTITION_BY, range_size=DEFAULT_RANGE_SIZE,
+                       row_group_size=DEFAULT_ROW_GROUP_SIZE, compression=DEFAULT_COMPRESSION):
+    """
+    Open (creating if needed) a Parquet dataset root.
+
+    Returns:
+        ParquetStore: The store, used wherever the other backends take a connection.
+    """
+    os.makedirs(os.path.join(root, "_checkpoints"), exist_ok=True)
+    print(f"Writing Parquet datasets under {root}")
+    return ParquetStore(root, partition_by, range_size, row_group_size, compression)
+
+
+def table_names(chain, relay_chain):
+    return (f"blocks_{relay_chain}_{chain}", f"extrinsics_{relay_chain}_{chain}", f"events_{relay_chain}_{chain}")
+
+
+def create_tables(store, chain, relay_chain, reset=False):
+    """
+    Create the dataset directories for a chain. With reset, delete its datasets and checkpoints first.
+    """
+    for table_name in table_names(chain, relay_chain):
+        path = os.path.join(store.root, table_name)
+        if reset and os.path.isdir(path):
+            shutil.rmtree(path)
+            print(f"Dataset '{path}' has been deleted.")
+        os.makedirs(path, exist_ok=True)
+    if reset:
+        for name in os.listdir(os.path.join(store.root, "_checkpoints")):
+            if name.startswith(f"{relay_chain}_{chain}_"):
+                os.remove(os.path.join(store.root, "_checkpoints", name))
+    print("Tables created successfully")
+
+
+def _partition_dir(store, number, timestamp):
+    parts = []
+    for key in store.partition_by:
+        if key == "day":
+            day = datetime.datetime.fromtimestamp(timestamp / 1000, tz=datetime.timezone.utc).date()
+            parts.append(f"date={day.isoformat()}")
+        else:
+            start = number - number % store.range_size
+            parts.append(f"block_range={start:09d}-{start + store.range_size - 1:09d}")
+    return os.path.join(*parts) if parts else ""
+
+
+def _with_sequence(schema):
+    return schema.append(pa.field(SEQUENCE_COLUMN, pa.int64()))
+
+
+def _next_sequence(store):
+    """
+    Take the next number of the root's write sequence, under a lock shared by every writing process.
+
+    If the sequence file is missing, it restarts above the highest sequence in any file name.
+    """
+    path = os.path.join(store.root, ".write_sequence")
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(path) as f:
+                sequence = int(f.read())
+        except FileNotFoundError:
+            sequence = max((int(match.group(3)) for _, _, names in os.walk(store.root)
+                            for match in map(_PART_NAME.match, names) if match), default=0)
+        sequence += 1
+        fd, tmp_path = tempfile.mkstemp(dir=store.root, prefix=".", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(str(sequence))
+        os.replace(tmp_path, path)
+    return sequence
+
+
+def _write_file(store, directory, schema, rows, first_block, last_block, sequence):
+    """
+    Write rows to a new Parquet file in directory, atomically. Returns the (temporary, final) paths.
+    """
+    schema = _with_sequence(schema)
+    rows = [row + (sequence,) for row in rows]
+    table = pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(zip(*rows), schema)], schema=schema
+    ) if rows else schema.empty_table()
+    return _write_table(store, directory, table, first_block, last_block, sequence)
+
+
+def _write_table(store, directory, table, first_block, last_block, sequence):
+    os.makedirs(directory, exist_ok=True)
+    final_path = os.path.join(
+        directory, f"part-{first_block:09d}-{last_block:09d}-{sequence:012d}-{uuid.uuid4().hex}.parquet"
+    )
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".parquet.tmp")
+    os.close(fd)
+    pq.write_table(table, tmp_path, row_group_size=store.row_group_size, compression=store.compression)
+    return tmp_path, final_path
+
+
+def insert_blocks(store, blocks, chain, relay_chain):
+    """
+    Append blocks, with their extrinsics and events, as new Parquet files: one
+    file per dataset and partition.
+
+    All files of a batch are written under temporary names first and renamed
+    only once every write succeeded, so a failed batch leaves nothing behind.
+    The partitions written to are then compacted.
+    """
+    partitions = {}
+    for block_data in blocks:
+        key = _partition_dir(store, block_data['number'], block_data['timestamp'])
+        partitions.setdefault(key, []).append(block_data)
+
+    sequence = _next_sequence(store)
+    pending = []
+    try:
+        for partition, partition_blocks in partitions.items():
+            first_block = min(block_data['number'] for block_data in partition_blocks)
+            last_block = max(block_data['number'] for block_data in partition_blocks)
+            blocks_table, extrinsics_table, events_table = table_names(chain, relay_chain)
+            for table_name, schema, rows in (
+                (blocks_table, BLOCK_SCHEMA,
+                 [sql_row(block_data, BLOCK_SCHEMA.names) for block_data in partition_blocks]),
+                (extrinsics_table, EXTRINSIC_SCHEMA,
+                 [record_row(record, EXTRINSIC_COLUMNS) for block_data in partition_blocks for record in extrinsic_records(block_data)]),
+                (events_table, EVENT_SCHEMA,
+                 [record_row(record, EVENT_COLUMNS) for block_data in partition_blocks for record in event_records(block_data)]),
+            ):
+                directory = os.path.join(store.root, table_name, partition)
+                pending.append(_write_file(store, directory, schema, rows, first_block, last_block, sequence))
+    except Exception:
+        for tmp_path, _ in pending:
+            os.remove(tmp_path)
+        raise
+    for tmp_path, final_path in pending:
+        os.replace(tmp_path, final_path)
+    print(f"{len(blocks)} blocks written to Parquet")
+
+    # The batch is committed at this point; a failed compaction only leaves small files behind
+    for table_name, schema, key in _datasets(chain, relay_chain):
+        for partition in partitions:
+            try:
+                compact_partition(store, os.path.join(store.root, table_name, partition), schema, key)
+            except Exception as e:
+                print(f"Error compacting {table_name}/{partition}: {e}")
+
+
+def _datasets(chain, relay_chain):
+    """
+    (table name, schema, key columns) of a chain's three datasets.
+    """
+    blocks_table, extrinsics_table, events_table = table_names(chain, relay_chain)
+    return (
+        (blocks_table, BLOCK_SCHEMA, ("number",)),
+        (extrinsics_table, EXTRINSIC_SCHEMA, ("number", "extrinsic_index")),
+        (events_table, EVENT_SCHEMA, ("number", "event_index")),
+    )
+
+
+def _size_tier(first_block, last_block):
+    return int(math.log(last_block - first_block + 1, COMPACT_FAN_IN))
+
+
+def compact_partition(store, directory, schema, key):
+    """
+    Merge the small files of one partition directory, COMPACT_FAN_IN files of a size tier at a time.
+
+    A merge repeats until no tier below row_group_size blocks has COMPACT_FAN_IN
+    files, so merged files cascade into the next tier. A lock file serializes
+    compaction between processes writing the same partition. If another process
+    holds the lock, compaction is skipped, since that process will merge the files.
+    """
+    if not os.path.isdir(directory):
+        return
+    with open(os.path.join(directory, ".compact.lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+        while True:
+            tiers = {}
+            for name in os.listdir(directory):
+                match = _PART_NAME.match(name)
+                if not match:
+                    continue
+                first_block, last_block = int(match.group(1)), int(match.group(2))
+                if last_block - first_block + 1 >= store.row_group_size:
+                    continue
+                tiers.setdefault(_size_tier(first_block, last_block), []).append(
+                    (first_block, last_block, int(match.group(3)), os.path.join(directory, name))
+                )
+            mergeable = [files for _, files in sorted(tiers.items()) if len(files) >= COMPACT_FAN_IN]
+            if not mergeable:
+                return
+            _merge_files(store, directory, schema, key, sorted(mergeable[0])[:COMPACT_FAN_IN])
+
+
+def _merge_files(store, directory, schema, key, files):
+    """
+    Replace files with one file holding their rows, keeping the row with the highest sequence for each key.
+    """
+    paths = [path for _, _, _, path in files]
+    table = pa.concat_tables([pq.read_table(path, schema=_with_sequence(schema)) for path in paths])
+    order = table.select(list(key) + [SEQUENCE_COLUMN]).to_pandas()
+    order["_row"] = range(len(order))
+    order = order.sort_values(SEQUENCE_COLUMN).drop_duplicates(list(key), keep="last").sort_values(list(key))
+    merged = table.take(pa.array(order["_row"].to_numpy()))
+    tmp_path, final_path = _write_table(
+        store, directory, merged, min(first_block for first_block, _, _, _ in files),
+        max(last_block for _, last_block, _, _ in files), max(sequence for _, _, sequence, _ in files)
+    )
+    os.replace(tmp_path, final_path)
+    for path in paths:
+        os.remove(path)
+
+
+def _dataset_files(store, table_name):
+    """
+    List (first_block, last_block, path) for every committed file of a dataset.
+    """
+    files = []
+    for directory, _, names in os.walk(os.path.join(store.root, table_name)):
+        for name in names:
+            match = _PART_NAME.match(name)
+            if match:
+                files.append((int(match.group(1)), int(match.group(2)), os.path.join(directory, name)))
+    return files
+
+
+def _block_files(store, chain, relay_chain):
+    return _dataset_files(store, table_names(chain, relay_chain)[0])
+
+
+def _read_rows(paths, schema, key, filters=None, columns=None):
+    """
+    Read dataset files into a DataFrame, keeping the row with the highest write
+    sequence for each key and sorting newest block first.
+
+    Only the given columns are read (the key columns are always included), or all of them when columns is None.
+    """
+    if columns is not None:
+        columns = list(key) + [column for column in columns if column not in key]
+    tables = []
+    for path in paths:
+        try:
+            tables.append(pq.read_table(
+                path, columns=None if columns is None else columns + [SEQUENCE_COLUMN],
+                filters=filters, schema=_with_sequence(schema)
+            ))
+        except FileNotFoundError:
+            # Merged away by compaction after it was listed
+            continue
+    if not tables:
+        empty = schema.empty_table()
+        return (empty.select(columns) if columns is not None else empty).to_pandas()
+    df = pa.concat_tables(tables).to_pandas()
+    df = df.sort_values(SEQUENCE_COLUMN).drop_duplicates(list(key), keep="last")
+    return df.drop(columns=SEQUENCE_COLUMN).sort_values(list(key), ascending=False).reset_index(drop=True)
+
+
+def _read_blocks(paths, filters=None, columns=None):
+    return _read_rows(paths, BLOCK_SCHEMA, ("number",), filters, columns)
+
+
+def _read_extrinsics(paths, filters=None):
+    return _read_rows(paths, EXTRINSIC_SCHEMA, ("number", "extrinsic_index"), filters)
+
+
+def query_max_block_number(store, chain, relay_chain):
+    """
+    Return the highest stored block number from the file names alone, or None if there are no blocks.
+    """
+    files = _block_files(store, chain, relay_chain)
+    return max(last_block for _, last_block, _ in files) if files else None
+
+
+def query_last_block(store, chain, relay_chain, block_num=None):
+    """
+    Return the newest block, or block block_num, as a one-row DataFrame.
+    """
+    files = _block_files(store, chain, relay_chain)
+    if block_num is None:
+        block_num = max((last_block for _, last_block, _ in files), default=None)
+        if block_num is None:
+            return _read_blocks([])
+    block_num = int(block_num)
+    paths = [path for first_block, last_block, path in files if first_block <= block_num <= last_block]
+    return _read_blocks(paths, filters=[("number", "=", block_num)]).head(1)
+
+
+def query_recent_blocks(store, chain, relay_chain, columns=None, limit=50):
+    """
+    Return the newest limit blocks, reading only the files that can contain them.
+    """
+    files = _block_files(store, chain, relay_chain)
+    if not files:
+        return _read_blocks([], columns=columns)
+    files.sort(key=lambda f: f[1], reverse=True)
+    # The newest limit block numbers; only files whose range reaches them are opened
+    floor = files[0][1] - limit + 1
+    paths = [path for _, last_block, path in files if last_block >= floor]
+    return _read_blocks(paths, filters=[("number", ">=", floor)], columns=columns).head(limit)
+
+
+def query_block_by_hash(store, chain, relay_chain, block_hash):
+    """
+    Return the block with the given hash as a one-row DataFrame. There is no
+    index: every blocks file is scanned, reading only the hash column to filter.
+    """
+    paths = [path for _, _, path in _block_files(store, chain, relay_chain)]
+    return _read_blocks(paths, filters=[("hash", "=", block_hash)]).head(1)
+
+
+def query_extrinsics_by_hash(store, chain, relay_chain, extrinsic_hash, limit=100):
+    """
+    Return the extrinsics with the given hash, newest first, scanning every extrinsics file.
+    """
+    paths = [path for _, _, path in _dataset_files(store, table_names(chain, relay_chain)[1])]
+    return _read_extrinsics(paths, filters=[("hash", "=", extrinsic_hash)]).head(limit)
+
+
+def query_signer_extrinsics(store, chain, relay_chain, signer, limit=25, before=None):
+    """
+    Return one page of a signer's extrinsics, newest first. before is the
+    (number, extrinsic_index) of the last row of the previous page; files
+    entirely above it are skipped.
+    """
+    files = _dataset_files(store, table_names(chain, relay_chain)[1])
+    filters = [("signer", "=", signer)]
+    if before is not None:
+        files = [f for f in files if f[0] <= int(before[0])]
+        filters.append(("number", "<=", int(before[0])))
+    df = _read_extrinsics([path for _, _, path in files], filters=filters)
+    if before is not None:
+        df = df[(df["number"] < int(before[0])) |
+                ((df["number"] == int(before[0])) & (df["extrinsic_index"] < int(before[1])))]
+    return df.head(limit).reset_index(drop=True)
+
+
+def _checkpoint_path(store, chain, relay_chain, stream):
+    safe_stream = re.sub(r"[^A-Za-z0-9_.-]", "_", stream)
+    return os.path.join(store.root, "_checkpoints", f"{relay_chain}_{chain}_{safe_stream}.json")
+
+
+def load_checkpoint(store, chain, relay_chain, stream):
+    """
+    Read the last committed block recorded for an ingest stream.
+
+    Returns:
+        int: The last committed block number, or None if the stream has no checkpoint.
+    """
+    try:
+        with open(_checkpoint_path(store, chain, relay_chain, stream)) as f:
+            return int(json.load(f)["last_block"])
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(store, chain, relay_chain, stream, last_block):
+    """
+    Record the last committed block for an ingest stream, replacing the file atomically.
+    """
+    path = _checkpoint_path(store, chain, relay_chain, stream)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump({
+            "relay_chain": relay_chain,
+            "chain": chain,
+            "stream": stream,
+            "last_block": int(last_block),
+            "updated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }, f)
+    os.replace(tmp_path, path)
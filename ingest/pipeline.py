@@ -0,0 +1,314 @@
+import asyncio
+import metrics
+import multiprocessing
+import profiling
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from main import build_argument_parser, build_database_info, build_sidecar_client, build_block_write_request, fetch_chain_head, \
+    wait_for_chain_head, load_historical_checkpoint, load_live_checkpoint, reconcile_live_cursor, start_metrics, \
+    start_profiling, write_batch_settings
+from head_subscription import HeadSubscription
+from write_block import fetchBlock, transformBlock
+from database_utils import *
+
+# Marks the end of a stage's input on a queue.
+_DONE = object()
+
+
+def parse_arguments():
+    parser = build_argument_parser()
+    parser.description = "Asyncio fetch -> transform -> write block ingestion pipeline for Substrate-based chains"
+    parser.add_argument("--fetchers", required=False, type=int, default=16, help="Sidecar requests in flight at once")
+    parser.add_argument("--transformers", required=False, type=int, default=4, help="Blocks transformed concurrently")
+    parser.add_argument("--transform_processes", action="store_true", help="Run transforms in a process pool instead of threads")
+    parser.add_argument("--queue_size", required=False, type=int, default=64, help="Capacity of each queue between stages")
+    return parser.parse_args()
+
+
+def transform_block(block_data, chain, relay_chain):
+    with profiling.transform_stage():
+        return transformBlock(block_data, chain, relay_chain)
+
+
+def write_batch(database_info, blocks):
+    with database_connection(database_info) as db_connection:
+        insert_blocks(database_info, db_connection, blocks)
+
+
+class Pipeline:
+    """
+    Fetch, transform and write blocks as three asyncio stages joined by bounded queues.
+
+    Fetches and database writes run in worker threads so many sidecar requests can
+    be in flight while a batch is being written. Because every queue is bounded, a
+    slow database stalls the transformers, which in turn stall the fetchers, so
+    memory use is capped at roughly 2 * queue_size blocks plus one batch.
+    """
+
+    def __init__(self, args, database_info, sidecar_client, checkpoint):
+        self.args = args
+        self.checkpoint = checkpoint
+        self.database_info = database_info
+        self.sidecar_client = sidecar_client
+        self.batch_size, self.batch_linger = write_batch_settings(args)
+        self.block_ids = asyncio.Queue(maxsize=args.queue_size)
+        self.raw_blocks = asyncio.Queue(maxsize=args.queue_size)
+        self.rows = asyncio.Queue(maxsize=args.queue_size)
+        self.fetch_executor = ThreadPoolExecutor(max_workers=args.fetchers)
+        if args.transform_processes:
+            self.transform_executor = ProcessPoolExecutor(
+                max_workers=args.transformers, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            self.transform_executor = ThreadPoolExecutor(max_workers=args.transformers)
+        self.write_executor = ThreadPoolExecutor(max_workers=1)
+        self.committed = 0
+        self.failed_blocks = []
+        self.started_at = time.time()
+
+    async def produce_range(self, start_block, end_block):
+        for block_id in range(start_block, end_block + 1):
+            await self.block_ids.put(block_id)
+
+    async def produce_live(self):
+        loop = asyncio.get_running_loop()
+        last_block = None if self.checkpoint.last_block < 0 else self.checkpoint.last_block
+        head_subscription = None if self.args.poll_only else HeadSubscription(self.args.wss).start()
+        try:
+            chain_head = await loop.run_in_executor(None, fetch_chain_head, self.sidecar_client)
+            while True:
+                if chain_head is None:
+                    print(f"Failed to fetch chain head. Retrying in {self.args.poll_interval} seconds.")
+                elif last_block is None or chain_head > last_block:
+                    first_block = chain_head if last_block is None else last_block + 1
+                    for block_id in range(first_block, chain_head + 1):
+                        await self.block_ids.put(block_id)
+                    last_block = chain_head
+                # Waiting happens on the default executor so it never holds a fetch thread
+                chain_head = await loop.run_in_executor(
+                    None, wait_for_chain_head, self.sidecar_client, head_subscription,
+                    -1 if last_block is None else last_block, self.args.poll_interval
+                )
+        finally:
+            if head_subscription is not None:
+                head_subscription.close()
+
+    def gives_up(self, attempt):
+        """
+        Whether a block stage stops retrying after the given failed attempt.
+
+        Live blocks are retried until they succeed, like main.py's live loop: the
+        checkpoint only advances over a contiguous prefix, and a restart resumes
+        after the newest block written, so a skipped live block would never be
+        ingested.
+        """
+        return self.args.ingest_mode == "historical" and attempt >= self.args.block_retries
+
+    def attempt_label(self, attempt):
+        if self.args.ingest_mode == "historical":
+            return f"{attempt}/{self.args.block_retries}"
+        return str(attempt)
+
+    async def fetch(self):
+        while True:
+            block_id = await self.block_ids.get()
+            if block_id is _DONE:
+                return
+            started_at = time.perf_counter()
+            block_data = await self.fetch_block(block_id)
+            if block_data is None:
+                self.failed_blocks.append(block_id)
+                metrics.failed_blocks()
+                continue
+            await self.raw_blocks.put((block_data, time.perf_counter() - started_at))
+
+    async def fetch_block(self, block_id):
+        loop = asyncio.get_running_loop()
+        block_write_request = build_block_write_request(self.args, block_id, self.sidecar_client.endpoint)
+        attempt = 1
+        while True:
+            try:
+                return await loop.run_in_executor(
+                    self.fetch_executor, fetchBlock, block_write_request, self.sidecar_client
+                )
+            except Exception as e:
+                print(f"Attempt {self.attempt_label(attempt)} to fetch block {block_id} failed: {e}")
+                if self.gives_up(attempt):
+                    return None
+                metrics.block_retry()
+                await asyncio.sleep(self.sidecar_client.backoff_delay(attempt))
+                attempt += 1
+
+    async def transform(self):
+        while True:
+            item = await self.raw_blocks.get()
+            if item is _DONE:
+                return
+            block_data, fetch_seconds = item
+            block_id = int(block_data['number'])
+            row, transform_seconds = await self.transform_block(block_data)
+            attempt = 1
+            while row is None and self.args.ingest_mode != "historical":
+                # Fetch the live block again until sidecar returns it complete
+                metrics.block_retry()
+                await asyncio.sleep(self.sidecar_client.backoff_delay(attempt))
+                attempt += 1
+                block_data = await self.fetch_block(block_id)
+                row, transform_seconds = await self.transform_block(block_data)
+            if row is None:
+                self.failed_blocks.append(block_id)
+                metrics.failed_blocks()
+                continue
+            profiling.record_block(block_id, {'fetch': fetch_seconds, 'transform': transform_seconds}, row)
+            await self.rows.put(row)
+
+    async def transform_block(self, block_data):
+        loop = asyncio.get_running_loop()
+        block_id = int(block_data['number'])
+        started_at = time.perf_counter()
+        try:
+            row = await loop.run_in_executor(
+                self.transform_executor, transform_block, block_data, self.args.chain, self.args.relay_chain
+            )
+        except Exception as e:
+            print(f"Error transforming block {block_id}: {e}")
+            return None, None
+        # With --transform_processes this includes pickling the block to the worker and back
+        transform_seconds = time.perf_counter() - started_at
+        metrics.transform_time(transform_seconds)
+        if row is None:
+            print(f"Failed block {block_id}: sidecar returned incomplete data")
+        return row, transform_seconds
+
+    async def write(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        batch_started = None
+        finished = False
+        while not finished:
+            timeout = None
+            if batch_started is not None:
+                timeout = max(0.0, self.batch_linger - (time.time() - batch_started))
+            try:
+                row = await asyncio.wait_for(self.rows.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                row = None
+            if row is _DONE:
+                finished = True
+            elif row is not None:
+                if batch_started is None:
+                    batch_started = time.time()
+                batch.append(row)
+                if len(batch) < self.batch_size:
+                    continue
+
+            if batch:
+                await self.write_with_retry(loop, batch)
+                batch = []
+                batch_started = None
+
+    async def write_with_retry(self, loop, batch):
+        attempt = 1
+        while True:
+            try:
+                await loop.run_in_executor(self.write_executor, write_batch, self.database_info, batch)
+                break
+            except Exception as e:
+                print(f"Attempt {self.attempt_label(attempt)} to write a batch of {len(batch)} blocks failed: {e}")
+                if self.gives_up(attempt):
+                    self.failed_blocks.extend(int(block_data['number']) for block_data in batch)
+                    metrics.failed_blocks(len(batch))
+                    return
+                metrics.block_retry()
+                await asyncio.sleep(self.sidecar_client.backoff_delay(attempt))
+                attempt += 1
+
+        self.committed += len(batch)
+        numbers = [int(block_data['number']) for block_data in batch]
+        await loop.run_in_executor(self.write_executor, self.checkpoint.mark_committed, numbers)
+        rate = self.committed / max(time.time() - self.started_at, 1e-9)
+        print(f"Processed blocks {min(numbers)}..{max(numbers)} ({self.committed} committed, "
+              f"{rate:.2f} blocks/s, queues {self.block_ids.qsize()}/{self.raw_blocks.qsize()}/{self.rows.qsize()})")
+
+    async def run(self, producer):
+        fetchers = [asyncio.create_task(self.fetch()) for _ in range(self.args.fetchers)]
+        transformers = [asyncio.create_task(self.transform()) for _ in range(self.args.transformers)]
+        writer = asyncio.create_task(self.write())
+        try:
+            await producer
+            for _ in fetchers:
+                await self.block_ids.put(_DONE)
+            await asyncio.gather(*fetchers)
+            for _ in transformers:
+                await self.raw_blocks.put(_DONE)
+            await asyncio.gather(*transformers)
+            await self.rows.put(_DONE)
+            await writer
+        finally:
+            for task in fetchers + transformers + [writer]:
+                task.cancel()
+            self.fetch_executor.shutdown(wait=False)
+            self.transform_executor.shutdown(wait=False)
+            self.write_executor.shutdown(wait=True)
+
+
+async def run_pipeline(args, database_info, sidecar_client):
+    if args.ingest_mode == "historical":
+        checkpoint = load_historical_checkpoint(args, database_info)
+        pipeline = Pipeline(args, database_info, sidecar_client, checkpoint)
+        producer = pipeline.produce_range(checkpoint.last_block + 1, args.end_block)
+    else:
+        checkpoint = load_live_checkpoint(args, database_info)
+        reconcile_live_cursor(args, database_info, checkpoint)
+        pipeline = Pipeline(args, database_info, sidecar_client, checkpoint)
+        producer = pipeline.produce_live()
+    try:
+        await pipeline.run(producer)
+    finally:
+        checkpoint.save()
+
+    elapsed = time.time() - pipeline.started_at
+    print(f"Pipeline finished: {pipeline.committed} blocks in {elapsed:.1f}s")
+    if pipeline.failed_blocks:
+        print(f"Failed blocks: {sorted(pipeline.failed_blocks)}")
+    return pipeline.failed_blocks
+
+
+def main():
+    args = parse_arguments()
+    if args.best_blocks:
+        raise ValueError("--best_blocks is only supported by main.py")
+    if args.processes > 1:
+        raise ValueError("--processes is only supported by main.py")
+    database_info = build_database_info(args)
+    start_metrics(args)
+    start_profiling(args)
+
+    with database_connection(database_info) as db_connection:
+        create_tables(db_connection, database_info, args.chain, args.relay_chain, reset=args.reset_tables)
+    print(f"Connected to {args.database} and created tables for {args.chain} on {args.relay_chain}")
+
+    sidecar_client = build_sidecar_client(args, pool_size=args.fetchers)
+
+    deferred_indexes = None
+    try:
+        if database_info['database_bulk_load']:
+            with database_connection(database_info) as db_connection:
+                deferred_indexes = begin_bulk_load(db_connection, database_info, args.chain, args.relay_chain)
+        asyncio.run(run_pipeline(args, database_info, sidecar_client))
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        print(traceback.format_exc())
+    finally:
+        if deferred_indexes is not None:
+            with database_connection(database_info) as db_connection:
+                end_bulk_load(db_connection, database_info, args.chain, args.relay_chain, deferred_indexes)
+        close_connection_pools()
+        profiling.stop()
+    print("Completed the ingest")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 import psycopg2
 from psycopg2 import Error
+from psycopg2.extras import execute_values
+from serializer import sql_row, record_row, extrinsic_records, event_records, EXTRINSIC_COLUMNS, EVENT_COLUMNS
 import pandas as pd
 import json
+import csv
+import io
 
 def connect_to_postgres(host, port, database, user, password):
     """
@@ -31,26 +35,32 @@ def connect_to_postgres(host, port, database, user, password):
         print(f"Error connecting to PostgreSQL database: {e}")
         return None
 
-def create_tables(connection, chain, relay_chain):
+def create_tables(connection, chain, relay_chain, reset=False):
     """
     Create necessary tables in the PostgreSQL database if they don't exist.
 
+    Existing tables and their data are kept so ingest can resume from its
+    checkpoint, unless reset is set.
+
     Args:
         connection (psycopg2.extensions.connection): The database connection object.
         chain (str): The name of the chain.
         relay_chain (str): The name of the relay chain.
+        reset (bool): Drop the blocks table and this chain's checkpoints first.
     """
     try:
         cursor = connection.cursor()
 
-        delete_table(connection, f"blocks_{relay_chain}_{chain}")
+        if reset:
+            for table_name in block_table_names(chain, relay_chain):
+                delete_table(connection, table_name)
 
         cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS blocks_{relay_chain}_{chain} (
                 relay_chain VARCHAR(255),
                 chain VARCHAR(255),
                 timestamp BIGINT,
-                number VARCHAR(255) PRIMARY KEY,
+                number BIGINT PRIMARY KEY,
                 hash VARCHAR(255),
                 parenthash VARCHAR(255),
                 stateroot VARCHAR(255),
@@ -60,14 +70,206 @@ def create_tables(connection, chain, relay_chain):
                 oninitialize JSONB,
                 onfinalize JSONB,
                 logs JSONB,
-                extrinsics JSONB
+                extrinsics JSONB,
+                extrinsic_count INTEGER,
+                event_count INTEGER,
+                signed_extrinsic_count INTEGER,
+                failed_extrinsic_count INTEGER,
+                total_fee NUMERIC(39, 0),
+                total_tip NUMERIC(39, 0),
+                weight BIGINT
+            )
+        """)
+        migrate_number_column(cursor, chain, relay_chain)
+        migrate_summary_columns(cursor, chain, relay_chain)
+        # Covering index so head lookups and recent-block listings are index-only backward scans
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS blocks_{relay_chain}_{chain}_number_desc
+            ON blocks_{relay_chain}_{chain} (number DESC) INCLUDE (hash, timestamp, finalized)
+        """)
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS blocks_{relay_chain}_{chain}_hash
+            ON blocks_{relay_chain}_{chain} (hash)
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS extrinsics_{relay_chain}_{chain} (
+                number BIGINT NOT NULL,
+                extrinsic_index INTEGER NOT NULL,
+                hash VARCHAR(255),
+                pallet VARCHAR(255) NOT NULL,
+                method VARCHAR(255) NOT NULL,
+                signer VARCHAR(255),
+                nonce BIGINT,
+                tip NUMERIC(39, 0),
+                fee NUMERIC(39, 0),
+                success BOOLEAN,
+                paysfee BOOLEAN,
+                PRIMARY KEY (number, extrinsic_index)
+            )
+        """)
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS extrinsics_{relay_chain}_{chain}_pallet_method
+            ON extrinsics_{relay_chain}_{chain} (pallet, method)
+        """)
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS extrinsics_{relay_chain}_{chain}_signer
+            ON extrinsics_{relay_chain}_{chain} (signer, pallet, method)
+        """)
+        # Serves a signer's history newest first, one keyset page at a time
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS extrinsics_{relay_chain}_{chain}_signer_number
+            ON extrinsics_{relay_chain}_{chain} (signer, number DESC, extrinsic_index DESC)
+        """)
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS extrinsics_{relay_chain}_{chain}_hash
+            ON extrinsics_{relay_chain}_{chain} (hash)
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS events_{relay_chain}_{chain} (
+                number BIGINT NOT NULL,
+                event_index INTEGER NOT NULL,
+                extrinsic_index INTEGER,
+                phase VARCHAR(32) NOT NULL,
+                pallet VARCHAR(255) NOT NULL,
+                method VARCHAR(255) NOT NULL,
+                data JSONB,
+                PRIMARY KEY (number, event_index)
             )
         """)
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS events_{relay_chain}_{chain}_pallet_method
+            ON events_{relay_chain}_{chain} (pallet, method)
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+                relay_chain VARCHAR(255),
+                chain VARCHAR(255),
+                stream VARCHAR(255),
+                last_block BIGINT NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (relay_chain, chain, stream)
+            )
+        """)
+        if reset:
+            cursor.execute(
+                "DELETE FROM ingest_checkpoints WHERE relay_chain = %s AND chain = %s",
+                (relay_chain, chain)
+            )
         connection.commit()
         print("Tables created successfully")
     except Error as e:
         print(f"Error creating tables: {e}")
 
+def migrate_number_column(cursor, chain, relay_chain):
+    """
+    Convert the number column of a blocks table created with VARCHAR(255) to BIGINT in place.
+
+    Args:
+        cursor (psycopg2.extensions.cursor): A cursor on the database connection.
+        chain (str): The name of the chain.
+        relay_chain (str): The name of the relay chain.
+    """
+    table_name = f"blocks_{relay_chain}_{chain}"
+    cursor.execute("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_name = %s AND column_name = 'number' AND table_schema = current_schema()
+    """, (table_name.lower(),))
+    row = cursor.fetchone()
+    if row is not None and row[0] != 'bigint':
+        print(f"Migrating {table_name}.number from {row[0]} to BIGINT")
+        cursor.execute(f"ALTER TABLE {table_name} ALTER COLUMN number TYPE BIGINT USING number::bigint")
+
+
+# Per-block summary columns computed at ingest time, added to tables created before they existed
+SUMMARY_COLUMNS = {
+    "extrinsic_count": "INTEGER",
+    "event_count": "INTEGER",
+    "signed_extrinsic_count": "INTEGER",
+    "failed_extrinsic_count": "INTEGER",
+    "total_fee": "NUMERIC(39, 0)",
+    "total_tip": "NUMERIC(39, 0)",
+    "weight": "BIGINT",
+}
+
+
+def migrate_summary_columns(cursor, chain, relay_chain):
+    """
+    Add the summary columns to a blocks table created without them. Existing rows keep NULLs until re-ingested.
+
+    Args:
+        cursor (psycopg2.extensions.cursor): A cursor on the database connection.
+        chain (str): The name of the chain.
+        relay_chain (str): The name of the relay chain.
+    """
+    table_name = f"blocks_{relay_chain}_{chain}"
+    cursor.execute(f"""
+        ALTER TABLE {table_name}
+        {", ".join(f"ADD COLUMN IF NOT EXISTS {column} {column_type}" for column, column_type in SUMMARY_COLUMNS.items())}
+    """)
+
+
+BLOCK_COLUMNS = (
+    "relay_chain", "chain", "timestamp", "number", "hash", "parenthash", "stateroot",
+    "extrinsicsroot", "authorid", "finalized", "oninitialize", "onfinalize", "logs", "extrinsics"
+) + tuple(SUMMARY_COLUMNS)
+
+
+def block_row(block_data):
+    """
+    Build the row tuple for a block, in BLOCK_COLUMNS order.
+    """
+    return sql_row(block_data, BLOCK_COLUMNS)
+
+
+def block_table_names(chain, relay_chain):
+    """
+    Names of the tables written for each block: the blocks table, then the
+    normalized extrinsics and events tables.
+    """
+    return (f"blocks_{relay_chain}_{chain}", f"extrinsics_{relay_chain}_{chain}", f"events_{relay_chain}_{chain}")
+
+
+def replace_block_details(cursor, blocks, chain, relay_chain, copy=False, page_size=100):
+    """
+    Replace the extrinsics and events rows of the given blocks, on the caller's transaction.
+
+    Existing rows are deleted first, so re-ingesting a block never leaves rows
+    from an earlier version of it behind.
+
+    Args:
+        cursor (psycopg2.extensions.cursor): A cursor on the database connection.
+        blocks (list): The block data dicts whose details are written. Block numbers must be unique.
+        chain (str): The name of the chain.
+        relay_chain (str): The name of the relay chain.
+        copy (bool): Stream the rows with COPY instead of multi-row INSERT statements.
+        page_size (int): Number of rows sent per INSERT statement.
+    """
+    _, extrinsics_table, events_table = block_table_names(chain, relay_chain)
+    numbers = [block_data['number'] for block_data in blocks]
+    for table_name, columns, records in (
+        (extrinsics_table, EXTRINSIC_COLUMNS, extrinsic_records),
+        (events_table, EVENT_COLUMNS, event_records),
+    ):
+        cursor.execute(f"DELETE FROM {table_name} WHERE number = ANY(%s)", (numbers,))
+        rows = (record_row(record, columns) for block_data in blocks for record in records(block_data))
+        if copy:
+            cursor.copy_expert(
+                f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                _CopyStream(rows),
+                size=COPY_CHUNK_SIZE
+            )
+        else:
+            execute_values(
+                cursor, f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES %s", list(rows), page_size=page_size
+            )
+
+
+def _upsert_clause():
+    return "ON CONFLICT (number) DO UPDATE SET " + ", ".join(
+        f"{column} = EXCLUDED.{column}" for column in BLOCK_COLUMNS if column != "number"
+    )
+
+
 def insert_block_data(connection, block_data, chain, relay_chain):
     """
     Insert processed block data into the PostgreSQL database.
@@ -83,46 +285,269 @@ def insert_block_data(connection, block_data, chain, relay_chain):
         
         insert_query = f"""
         INSERT INTO blocks_{relay_chain}_{chain} 
-        (relay_chain, chain, timestamp, number, hash, parenthash, stateroot, extrinsicsroot, authorid, finalized, oninitialize, onfinalize, logs, extrinsics)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (number) DO UPDATE SET
-        relay_chain = EXCLUDED.relay_chain,
-        chain = EXCLUDED.chain,
-        timestamp = EXCLUDED.timestamp,
-        hash = EXCLUDED.hash,
-        parenthash = EXCLUDED.parenthash,
-        stateroot = EXCLUDED.stateroot,
-        extrinsicsroot = EXCLUDED.extrinsicsroot,
-        authorid = EXCLUDED.authorid,
-        finalized = EXCLUDED.finalized,
-        oninitialize = EXCLUDED.oninitialize,
-        onfinalize = EXCLUDED.onfinalize,
-        logs = EXCLUDED.logs,
-        extrinsics = EXCLUDED.extrinsics
+        ({", ".join(BLOCK_COLUMNS)})
+        VALUES ({", ".join(["%s"] * len(BLOCK_COLUMNS))})
+        {_upsert_clause()}
         """
         
-        values = (
-            block_data['relay_chain'],
-            block_data['chain'],
-            block_data['timestamp'],
-            block_data['number'],
-            block_data['hash'],
-            block_data['parentHash'],
-            block_data['stateRoot'],
-            block_data['extrinsicsRoot'],
-            block_data['authorId'],
-            block_data['finalized'],
-            json.dumps(block_data['onInitialize']),
-            json.dumps(block_data['onFinalize']),
-            json.dumps(block_data['logs']),
-            json.dumps(block_data['extrinsics'])
-        )
-        
-        cursor.execute(insert_query, values)
+        cursor.execute(insert_query, block_row(block_data))
+        replace_block_details(cursor, [block_data], chain, relay_chain)
         connection.commit()
         print(f"Block {block_data['number']} inserted/updated successfully")
     except Error as e:
         print(f"Error inserting block data: {e}")
+        connection.rollback()
+        raise
+
+
+def insert_blocks_data(connection, blocks, chain, relay_chain, page_size=100):
+    """
+    Upsert many blocks, with their extrinsics and events, using multi-row INSERT
+    statements and a single commit.
+
+    Args:
+        connection (psycopg2.extensions.connection): The database connection object.
+        blocks (list): The block data dicts to be inserted. Block numbers must be unique.
+        chain (str): The name of the chain.
+        relay_chain (str): The name of the relay chain.
+        page_size (int): Number of rows sent per INSERT statement.
+    """
+    try:
+        cursor = connection.cursor()
+        insert_query = f"""
+        INSERT INTO blocks_{relay_chain}_{chain}
+        ({", ".join(BLOCK_COLUMNS)})
+        VALUES %s
+        {_upsert_clause()}
+        """
+        execute_values(cursor, insert_query, [block_row(block_data) for block_data in blocks], page_size=page_size)
+        replace_block_details(cursor, blocks, chain, relay_chain, page_size=page_size)
+        connection.commit()
+        print(f"{len(blocks)} blocks inserted/updated successfully")
+    except Error as e:
+        print(f"Error inserting block batch: {e}")
+        connection.rollback()
+        raise
+
+COPY_CHUNK_SIZE = 1 << 16
+
+
+class _CopyStream(io.TextIOBase):
+    """
+    File-like object that renders rows as CSV lazily, so COPY can stream a batch
+    without building the whole payload in memory first.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+        self._pending = ""
+        self._offset = 0
+
+    def readable(self):
+        return True
+
+    def _refill(self):
+        row = next(self._rows, None)
+        if row is None:
+            return False
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._writer.writerow(row)
+        self._pending = self._pending[self._offset:] + self._buffer.getvalue()
+        self._offset = 0
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._pending) - self._offset < size:
+            if not self._refill():
+                break
+        end = len(self._pending) if size < 0 else self._offset + size
+        chunk = self._pending[self._offset:end]
+        self._offset += len(chunk)
+        return chunk
+
+
+def defer_secondary_indexes(connection, chain, relay_chain):
+    """
+    Drop the non-unique secondary indexes of the blocks, extrinsics and events
+    tables before a bulk load.
+
+    Unique indexes (including the primary key) are kept because the merge relies
+    on them for ON CONFLICT.
+
+    Returns:
+        list: The CREATE INDEX statements needed to restore the dropped indexes.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid)
+            FROM pg_index
+            WHERE indrelid = ANY(%s::regclass[]) AND NOT indisunique
+        """, (list(block_table_names(chain, relay_chain)),))
+        indexes = cursor.fetchall()
+        for index_name, _ in indexes:
+            cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+        connection.commit()
+        print(f"Deferred {len(indexes)} secondary indexes on the {relay_chain} {chain} tables")
+        return [index_definition for _, index_definition in indexes]
+    except Error as e:
+        print(f"Error deferring secondary indexes: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def restore_secondary_indexes(connection, chain, relay_chain, index_definitions):
+    """
+    Recreate indexes dropped by defer_secondary_indexes and refresh planner statistics.
+    """
+    cursor = connection.cursor()
+    try:
+        for index_definition in index_definitions:
+            cursor.execute(index_definition)
+        for table_name in block_table_names(chain, relay_chain):
+            cursor.execute(f"ANALYZE {table_name}")
+        connection.commit()
+        print(f"Restored {len(index_definitions)} secondary indexes on the {relay_chain} {chain} tables")
+    except Error as e:
+        print(f"Error restoring secondary indexes: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def bulk_load_blocks(connection, blocks, chain, relay_chain):
+    """
+    Load a chunk of blocks with COPY into a staging table, then merge it into the
+    blocks table with a single INSERT ... SELECT ... ON CONFLICT. Extrinsics and
+    events are copied straight into their tables in the same transaction.
+
+    The staging table is a temporary table: it is never WAL-logged, it is private
+    to the connection so concurrent loaders cannot collide, and ON COMMIT DELETE
+    ROWS empties it after every chunk.
+
+    Args:
+        connection (psycopg2.extensions.connection): The database connection object.
+        blocks (list): The block data dicts to be loaded. Block numbers must be unique.
+        chain (str): The name of the chain.
+        relay_chain (str): The name of the relay chain.
+    """
+    table_name = f"blocks_{relay_chain}_{chain}"
+    staging_table = f"{table_name}_staging"
+    columns = ", ".join(BLOCK_COLUMNS)
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS {staging_table}
+            (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+        """)
+        cursor.copy_expert(
+            f"COPY {staging_table} ({columns}) FROM STDIN WITH (FORMAT csv)",
+            _CopyStream(block_row(block_data) for block_data in blocks),
+            size=COPY_CHUNK_SIZE
+        )
+        cursor.execute(f"""
+            INSERT INTO {table_name} ({columns})
+            SELECT DISTINCT ON (number) {columns} FROM {staging_table} ORDER BY number
+            {_upsert_clause()}
+        """)
+        replace_block_details(cursor, blocks, chain, relay_chain, copy=True)
+        connection.commit()
+        print(f"{len(blocks)} blocks bulk loaded successfully")
+    except Error as e:
+        print(f"Error bulk loading blocks: {e}")
+        connection.rollback()
+        raise
+
+
+def mark_finalized(connection, chain, relay_chain, start_block, end_block):
+    """
+    Set finalized on blocks start_block..end_block (inclusive) with a single UPDATE.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"""
+            UPDATE blocks_{relay_chain}_{chain} SET finalized = TRUE
+            WHERE number BETWEEN %s AND %s AND finalized IS NOT TRUE
+        """, (start_block, end_block))
+        connection.commit()
+    except Error as e:
+        print(f"Error marking blocks finalized: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def delete_unfinalized_blocks(connection, chain, relay_chain, above_block):
+    """
+    Delete the unfinalized blocks above above_block, with their extrinsics and events, in one transaction.
+    """
+    blocks_table, extrinsics_table, events_table = block_table_names(chain, relay_chain)
+    cursor = connection.cursor()
+    try:
+        for table_name in (extrinsics_table, events_table):
+            cursor.execute(f"""
+                DELETE FROM {table_name} WHERE number IN (
+                    SELECT number FROM {blocks_table} WHERE number > %s AND finalized IS NOT TRUE
+                )
+            """, (above_block,))
+        cursor.execute(f"DELETE FROM {blocks_table} WHERE number > %s AND finalized IS NOT TRUE", (above_block,))
+        connection.commit()
+    except Error as e:
+        print(f"Error deleting blocks above {above_block}: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def load_checkpoint(connection, chain, relay_chain, stream):
+    """
+    Read the last committed block recorded for an ingest stream.
+
+    Returns:
+        int: The last committed block number, or None if the stream has no checkpoint.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT last_block FROM ingest_checkpoints WHERE relay_chain = %s AND chain = %s AND stream = %s",
+            (relay_chain, chain, stream)
+        )
+        row = cursor.fetchone()
+        connection.commit()
+        return None if row is None else int(row[0])
+    finally:
+        cursor.close()
+
+
+def save_checkpoint(connection, chain, relay_chain, stream, last_block):
+    """
+    Record the last committed block for an ingest stream.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO ingest_checkpoints (relay_chain, chain, stream, last_block, updated_at)
+            VALUES (%s, %s, %s, %s, now())
+            ON CONFLICT (relay_chain, chain, stream) DO UPDATE SET
+            last_block = EXCLUDED.last_block,
+            updated_at = EXCLUDED.updated_at
+        """, (relay_chain, chain, stream, last_block))
+        connection.commit()
+    except Error as e:
+        print(f"Error saving checkpoint: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
 
 def close_connection(connection):
     """
@@ -164,16 +589,23 @@ def delete_table(connection, table_name):
             cursor.close()
 
 
-def query(connection, query_str):
+def query(connection, query_str, params=None):
+    """
+    Run a query and return the results as a DataFrame, or None if it failed.
+
+    params are bound to %(name)s placeholders in query_str.
+    """
+    cursor = None
     try:
         cursor = connection.cursor()
-        cursor.execute(query_str)
+        cursor.execute(query_str, params)
         columns = [desc[0] for desc in cursor.description]
         results = cursor.fetchall()
         df = pd.DataFrame(results, columns=columns)
         return df
     except Error as e:
         print(f"Error executing query: {e}")
+        connection.rollback()
         return None
     finally:
         if cursor:
@@ -0,0 +1,269 @@
+"""
+Per-block profiling of the ingest hot path, enabled with --profile.
+
+Every block records how long it spent in each stage (the sidecar fetch, the
+transform and a JSON encoding of the transformed block, which stands in for
+the encoding the backends do) together with its shape: extrinsic and event
+counts, encoded bytes and the calls it contains. Database writes are recorded
+per batch. Every --profile_interval seconds a background thread prints
+percentiles per stage, the slowest blocks and the calls that are over-represented
+among them, so the block shapes behind the tail latency (large utility.batch
+calls, XCM transfers, ...) stand out.
+
+With --profile_stacks the same thread also samples the stacks of the threads
+that are transforming a block, and writes them in collapsed form
+("frame;frame;frame count" per line), ready for flamegraph.pl or speedscope.
+Only transforms running in this process are sampled, so pipeline.py with
+--transform_processes gets timings but no stacks.
+
+When profiling is off every hook returns straight away.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+DEFAULT_INTERVAL = 30
+# Seconds between stack samples of the transform threads
+SAMPLE_INTERVAL = 0.005
+SLOWEST_BLOCKS = 5
+TAIL_PERCENTILE = 99
+TAIL_CALLS = 5
+PERCENTILES = (50, 90, 99)
+BLOCK_STAGES = ('fetch', 'transform', 'encode')
+
+_profiler = None
+
+
+class Profiler:
+    """
+    Collects block and batch samples and reports them from a background thread.
+
+    Samples are kept only until the next report, so memory does not grow with the run.
+    Each report passes them to on_report(blocks, batches, elapsed), which prints
+    the summary by default.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, stacks_path=None, on_report=None):
+        self.interval = interval
+        self.stacks_path = stacks_path
+        self.on_report = on_report or print_report
+        self.stacks = Counter()
+        self.transform_threads = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._reset()
+
+    def _reset(self):
+        self.blocks = []
+        self.batches = []
+        self.window_started = time.time()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.report()
+
+    def _run(self):
+        next_report = time.monotonic() + self.interval
+        while not self._stop.is_set():
+            if self.stacks_path:
+                self._sample()
+                self._stop.wait(SAMPLE_INTERVAL)
+            else:
+                self._stop.wait(max(0.0, next_report - time.monotonic()))
+            if time.monotonic() >= next_report:
+                self.report()
+                next_report = time.monotonic() + self.interval
+
+    def _sample(self):
+        with self._lock:
+            threads = set(self.transform_threads)
+        if not threads:
+            return
+        for ident, frame in sys._current_frames().items():
+            if ident not in threads:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            collapsed = ";".join(reversed(stack))
+            with self._lock:
+                self.stacks[collapsed] += 1
+
+    def record_block(self, number, timings, block_data, encoded_bytes):
+        calls = Counter(
+            f"{extrinsic['method']['pallet']}.{extrinsic['method']['method']}"
+            for extrinsic in block_data['extrinsics']
+        )
+        sample = {
+            'number': number,
+            'timings': timings,
+            'extrinsics': len(block_data['extrinsics']),
+            'events': block_data.get('eventCount', 0),
+            'bytes': encoded_bytes,
+            'calls': calls,
+        }
+        with self._lock:
+            self.blocks.append(sample)
+
+    def record_write(self, seconds, batch_size):
+        with self._lock:
+            self.batches.append((seconds, batch_size))
+
+    def report(self):
+        with self._lock:
+            blocks, batches, window_started = self.blocks, self.batches, self.window_started
+            self._reset()
+            stacks = Counter(self.stacks)
+        if blocks or batches:
+            self.on_report(blocks, batches, time.time() - window_started)
+        if self.stacks_path and stacks:
+            write_stacks(self.stacks_path, stacks)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+
+def _distribution_row(name, values, scale=1, unit_format="{:10.1f}"):
+    values = sorted(values)
+    columns = [percentile(values, p) * scale for p in PERCENTILES] + [values[-1] * scale if values else 0]
+    return f"  {name:<14}" + "".join(unit_format.format(value) for value in columns)
+
+
+def format_report(blocks, batches, elapsed):
+    """
+    Format the percentile summary of one reporting window.
+    """
+    header = f"  {'':<14}" + "".join(f"{'p' + str(p):>10}" for p in PERCENTILES) + f"{'max':>10}"
+    lines = [f"Profile: {len(blocks)} blocks, {len(batches)} batch writes in the last {elapsed:.0f}s", header + "  (ms)"]
+    for stage in BLOCK_STAGES:
+        values = [block['timings'][stage] for block in blocks if stage in block['timings']]
+        if values:
+            lines.append(_distribution_row(stage, values, scale=1000))
+    if batches:
+        lines.append(_distribution_row("write/batch", [seconds for seconds, _ in batches], scale=1000))
+        lines.append(_distribution_row("write/block", [seconds / max(1, size) for seconds, size in batches], scale=1000))
+        lines.append(_distribution_row("batch size", [size for _, size in batches], unit_format="{:10.0f}"))
+    if blocks:
+        lines.append(header)
+        lines.append(_distribution_row("extrinsics", [block['extrinsics'] for block in blocks], unit_format="{:10.0f}"))
+        lines.append(_distribution_row("events", [block['events'] for block in blocks], unit_format="{:10.0f}"))
+        lines.append(_distribution_row("kB encoded", [block['bytes'] for block in blocks], scale=1 / 1024))
+
+        def total(block):
+            return sum(block['timings'].values())
+
+        by_time = sorted(blocks, key=total, reverse=True)
+        lines.append("  Slowest blocks (fetch + transform + encode):")
+        for block in by_time[:SLOWEST_BLOCKS]:
+            top_calls = ", ".join(f"{call} x{count}" for call, count in block['calls'].most_common(3))
+            lines.append(f"    #{block['number']}: {total(block) * 1000:.1f} ms, {block['extrinsics']} extrinsics, "
+                         f"{block['events']} events, {block['bytes'] / 1024:.1f} kB; {top_calls}")
+
+        # Calls found in more of the tail blocks than of all blocks drive the tail
+        tail = by_time[:max(1, len(blocks) * (100 - TAIL_PERCENTILE) // 100)]
+        in_all = Counter(call for block in blocks for call in block['calls'])
+        in_tail = Counter(call for block in tail for call in block['calls'])
+        lift = sorted(
+            (call for call in in_tail if in_tail[call] / len(tail) > in_all[call] / len(blocks)),
+            key=lambda call: (in_tail[call] / len(tail)) / (in_all[call] / len(blocks)), reverse=True
+        )
+        if lift:
+            lines.append(f"  Calls in the slowest {100 - TAIL_PERCENTILE}% of blocks (share of tail blocks vs all blocks):")
+            for call in lift[:TAIL_CALLS]:
+                lines.append(f"    {call}: {in_tail[call] / len(tail):.0%} vs {in_all[call] / len(blocks):.0%}")
+    return "\n".join(lines)
+
+
+def print_report(blocks, batches, elapsed):
+    print(format_report(blocks, batches, elapsed))
+
+
+def write_stacks(path, stacks):
+    # Written under a temporary name so a reader never sees a partial file
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    os.replace(temporary_path, path)
+
+
+def start(interval=DEFAULT_INTERVAL, stacks_path=None, on_report=None):
+    """
+    Turn profiling on for this process.
+    """
+    global _profiler
+    _profiler = Profiler(interval, stacks_path, on_report).start()
+    print(f"Profiling ingest, reporting every {interval}s" +
+          (f", transform stacks to {stacks_path}" if stacks_path else ""))
+
+
+def stop():
+    """
+    Print the last report, write the stacks and turn profiling off.
+    """
+    global _profiler
+    if _profiler is not None:
+        _profiler.stop()
+        _profiler = None
+
+
+def enabled():
+    return _profiler is not None
+
+
+@contextmanager
+def transform_stage():
+    """
+    Mark the current thread as transforming a block, so the stack sampler includes it.
+    """
+    profiler = _profiler
+    if profiler is None or not profiler.stacks_path:
+        yield
+        return
+    ident = threading.get_ident()
+    with profiler._lock:
+        profiler.transform_threads.add(ident)
+    try:
+        yield
+    finally:
+        with profiler._lock:
+            profiler.transform_threads.discard(ident)
+
+
+def record_block(number, timings, block_data):
+    """
+    Record the stage timings (seconds by stage) and shape of a transformed block.
+
+    The block is JSON encoded here, and the encoding is timed as its 'encode'
+    stage, so this adds that cost to each block while profiling.
+    """
+    profiler = _profiler
+    if profiler is None:
+        return
+    from serializer import dumps
+    started_at = time.perf_counter()
+    encoded_bytes = len(dumps(block_data))
+    timings = dict(timings, encode=time.perf_counter() - started_at)
+    profiler.record_block(number, timings, block_data, encoded_bytes)
+
+
+def record_write(seconds, batch_size):
+    profiler = _profiler
+    if profiler is not None:
+        profiler.record_write(seconds, batch_size)
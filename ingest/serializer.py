@@ -0,0 +1,225 @@
+"""
+Serialize transformed blocks into each backend's row format in a single pass.
+
+Nested structures (extrinsics, events, logs) are JSON encoded exactly once per
+row: SQL backends store them as real JSON documents, and BigQuery gets the
+repeated RECORD layout of its schema with only the free-form leaves (call args,
+dispatch info, event data, log values) encoded as JSON strings.
+
+Extrinsics and events are also flattened into rows of the normalized
+extrinsics_* and events_* tables, so they can be filtered by pallet, method or
+signer without parsing the JSON columns.
+
+orjson is used when it is installed and the standard library json module
+otherwise.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_LIBRARY = 'orjson' if orjson is not None else 'json'
+
+# SQL column name -> key in the transformed block
+SCALAR_FIELDS = {
+    'relay_chain': 'relay_chain',
+    'chain': 'chain',
+    'timestamp': 'timestamp',
+    'number': 'number',
+    'hash': 'hash',
+    'parenthash': 'parentHash',
+    'stateroot': 'stateRoot',
+    'extrinsicsroot': 'extrinsicsRoot',
+    'authorid': 'authorId',
+    'finalized': 'finalized',
+    'extrinsic_count': 'extrinsicCount',
+    'event_count': 'eventCount',
+    'signed_extrinsic_count': 'signedExtrinsicCount',
+    'failed_extrinsic_count': 'failedExtrinsicCount',
+    'total_fee': 'totalFee',
+    'total_tip': 'totalTip',
+    'weight': 'weight',
+}
+JSON_FIELDS = {
+    'oninitialize': 'onInitialize',
+    'onfinalize': 'onFinalize',
+    'logs': 'logs',
+    'extrinsics': 'extrinsics',
+}
+
+
+def dumps(value):
+    """
+    Encode value as compact JSON text.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(value).decode()
+        except TypeError:
+            # orjson rejects integers wider than 64 bits; json handles them.
+            pass
+    return json.dumps(value, separators=(',', ':'))
+
+
+def loads(data):
+    """
+    Decode JSON text or bytes.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def sql_row(block_data, columns):
+    """
+    Build a row tuple for a SQL backend.
+
+    Args:
+        block_data (dict): The transformed block.
+        columns (tuple): Column names, in the order the row should use.
+
+    Returns:
+        tuple: Scalar columns as-is and JSON columns as JSON text.
+    """
+    row = []
+    for column in columns:
+        if column in SCALAR_FIELDS:
+            row.append(block_data[SCALAR_FIELDS[column]])
+        else:
+            row.append(dumps(block_data[JSON_FIELDS[column]]))
+    return tuple(row)
+
+
+# Columns of the normalized extrinsics and events tables
+EXTRINSIC_COLUMNS = (
+    'number', 'extrinsic_index', 'hash', 'pallet', 'method', 'signer',
+    'nonce', 'tip', 'fee', 'success', 'paysfee'
+)
+EVENT_COLUMNS = ('number', 'event_index', 'extrinsic_index', 'phase', 'pallet', 'method', 'data')
+
+
+def _signer(signature):
+    if not signature:
+        return None
+    signer = signature.get('signer')
+    if isinstance(signer, dict):
+        signer = signer.get('id')
+    return signer
+
+
+def extrinsic_records(block_data):
+    """
+    Flatten a transformed block's extrinsics into rows of the extrinsics table.
+
+    Returns:
+        list: One dict per extrinsic, keyed by EXTRINSIC_COLUMNS.
+    """
+    records = []
+    for index, extrinsic in enumerate(block_data['extrinsics']):
+        info = extrinsic.get('info') or {}
+        records.append({
+            'number': block_data['number'],
+            'extrinsic_index': index,
+            'hash': extrinsic.get('hash'),
+            'pallet': extrinsic['method']['pallet'],
+            'method': extrinsic['method']['method'],
+            'signer': _signer(extrinsic.get('signature')),
+            'nonce': extrinsic.get('nonce'),
+            'tip': extrinsic.get('tip'),
+            'fee': info.get('partialFee'),
+            'success': extrinsic['success'],
+            'paysfee': extrinsic['paysFee'],
+        })
+    return records
+
+
+def event_records(block_data):
+    """
+    Flatten a transformed block's events into rows of the events table, in
+    execution order: initialization, then each extrinsic, then finalization.
+
+    Returns:
+        list: One dict per event, keyed by EVENT_COLUMNS, with data as JSON text.
+    """
+    phases = [('initialization', None, block_data['onInitialize']['events'])]
+    phases.extend(
+        ('applyExtrinsic', index, extrinsic['events'])
+        for index, extrinsic in enumerate(block_data['extrinsics'])
+    )
+    phases.append(('finalization', None, block_data['onFinalize']['events']))
+
+    records = []
+    for phase, extrinsic_index, events in phases:
+        for event in events:
+            records.append({
+                'number': block_data['number'],
+                'event_index': len(records),
+                'extrinsic_index': extrinsic_index,
+                'phase': phase,
+                'pallet': event['method']['pallet'],
+                'method': event['method']['method'],
+                'data': dumps(event['data']),
+            })
+    return records
+
+
+def record_row(record, columns):
+    """
+    Build a row tuple from an extrinsic or event record, in columns order.
+    """
+    return tuple(record[column] for column in columns)
+
+
+def _bigquery_event(event):
+    return {
+        'method': event['method'],
+        'data': dumps(event['data']),
+    }
+
+
+def _bigquery_signature(signature):
+    if not signature:
+        return None
+    return {'signature': signature.get('signature'), 'signer': _signer(signature)}
+
+
+def _bigquery_era(era):
+    if not era:
+        return None
+    return {
+        'immortalera': era.get('immortalEra'),
+        'mortalera': era.get('mortalEra') or [],
+    }
+
+
+def _bigquery_extrinsic(extrinsic):
+    return {
+        'method': extrinsic['method'],
+        'signature': _bigquery_signature(extrinsic.get('signature')),
+        'nonce': extrinsic.get('nonce'),
+        'args': dumps(extrinsic['args']),
+        'tip': extrinsic.get('tip'),
+        'hash': extrinsic.get('hash'),
+        'info': dumps(extrinsic['info']),
+        'era': _bigquery_era(extrinsic.get('era')),
+        'events': [_bigquery_event(event) for event in extrinsic['events']],
+        'success': extrinsic['success'],
+        'paysfee': extrinsic['paysFee'],
+    }
+
+
+def bigquery_row(block_data):
+    """
+    Build a row dict matching the BigQuery blocks table schema.
+    """
+    row = {column: block_data[key] for column, key in SCALAR_FIELDS.items()}
+    row['logs'] = [
+        {'type': log['type'], 'index': log['index'], 'value': dumps(log['value'])}
+        for log in block_data['logs']
+    ]
+    row['oninitialize'] = {'events': [_bigquery_event(event) for event in block_data['onInitialize']['events']]}
+    row['onfinalize'] = {'events': [_bigquery_event(event) for event in block_data['onFinalize']['events']]}
+    row['extrinsics'] = [_bigquery_extrinsic(extrinsic) for extrinsic in block_data['extrinsics']]
+    return row
@@ -0,0 +1,199 @@
+"""
+Historical ingest across a pool of processes.
+
+The range is split into shards of consecutive blocks, and each shard is
+ingested in its own process by the same threaded loop main.py runs, so the
+JSON transforms are spread over as many cores as there are processes instead
+of sharing one interpreter lock. Processes are started with the spawn method
+and open their own sidecar client and database pool.
+
+Every shard keeps its own checkpoint stream (historical:<shard_start>-<shard_end>),
+so an interrupted backfill resumes each shard where it stopped and a failed
+shard can be re-run on its own with --start_block/--end_block set to its range.
+"""
+import math
+import multiprocessing
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import metrics
+from checkpoint import Checkpoint, historical_stream
+
+SHARDS_PER_PROCESS = 4
+PROGRESS_INTERVAL = 10
+
+# Set in each worker process by _init_worker
+_progress_queue = None
+
+
+def plan_shards(start_block, end_block, processes, shard_size=None):
+    """
+    Split start_block..end_block into shards of consecutive blocks.
+
+    Without a shard_size the range is cut into SHARDS_PER_PROCESS shards per
+    process, so a slow shard does not leave the other processes idle at the end.
+
+    Returns:
+        list: (shard_start, shard_end) tuples, inclusive, in block order.
+    """
+    total_blocks = end_block - start_block + 1
+    if not shard_size:
+        shard_size = math.ceil(total_blocks / (max(1, processes) * SHARDS_PER_PROCESS))
+    shard_size = max(1, shard_size)
+    return [
+        (shard_start, min(shard_start + shard_size - 1, end_block))
+        for shard_start in range(start_block, end_block + 1, shard_size)
+    ]
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def run_shard(args, shard, last_block):
+    """
+    Ingest one shard in a worker process.
+
+    Args:
+        args (argparse.Namespace): The parsed main.py arguments.
+        shard (tuple): (shard_start, shard_end), inclusive.
+        last_block (int): Block to resume after when the shard has no checkpoint yet.
+
+    Returns:
+        dict: The shard, the blocks it committed, the blocks that failed, and the error that stopped it, if any.
+    """
+    # Imported here so the parent does not import main.py twice
+    from main import build_database_info, build_sidecar_client, checkpoint_save_interval, run_historical_ingest, start_profiling
+    from database_utils import close_connection_pools
+    import profiling
+
+    shard_start, shard_end = shard
+    result = {'shard': shard, 'committed': 0, 'failed_blocks': [], 'error': None}
+
+    def report(numbers):
+        result['committed'] += len(numbers)
+        _progress_queue.put(numbers)
+
+    try:
+        # Each shard profiles itself, with its own stacks file
+        start_profiling(args, suffix=f"{shard_start}-{shard_end}")
+        database_info = build_database_info(args)
+        sidecar_client = build_sidecar_client(args, pool_size=max(1, args.workers) + 1)
+        checkpoint = Checkpoint.load(
+            database_info, args.chain, args.relay_chain, historical_stream(shard_start, shard_end),
+            default_last_block=last_block, save_interval=checkpoint_save_interval(database_info)
+        )
+        if checkpoint.last_block < shard_end:
+            result['failed_blocks'] = run_historical_ingest(
+                args, database_info, sidecar_client, checkpoint.last_block + 1, shard_end, checkpoint, on_commit=report
+            )
+    except Exception as e:
+        print(f"Shard {shard_start}..{shard_end} failed: {e}")
+        print(traceback.format_exc())
+        result['error'] = str(e)
+    finally:
+        close_connection_pools()
+        profiling.stop()
+    return result
+
+
+def report_progress(progress_queue, total_blocks, started_at, done):
+    """
+    Print one combined progress line for all shards every PROGRESS_INTERVAL seconds, until done is set.
+    """
+    committed = 0
+    last_report = time.time()
+    while not done.is_set():
+        try:
+            numbers = progress_queue.get(timeout=1)
+            committed += len(numbers)
+            # Shard processes do not serve metrics, so the parent counts their blocks
+            metrics.blocks_ingested(numbers)
+        except queue.Empty:
+            pass
+        if time.time() - last_report >= PROGRESS_INTERVAL:
+            rate = committed / max(time.time() - started_at, 1e-9)
+            print(f"Backfill progress: {committed}/{total_blocks} blocks ({rate:.2f} blocks/s)")
+            last_report = time.time()
+
+
+def run_sharded_ingest(args, checkpoint):
+    """
+    Ingest args.start_block..args.end_block over args.processes processes.
+
+    Shards that raised or left blocks unwritten are run again, up to
+    args.shard_retries more times; each retry resumes from the shard's checkpoint.
+    The overall range checkpoint is advanced to the end once every shard is complete.
+
+    Args:
+        args (argparse.Namespace): The parsed main.py arguments.
+        checkpoint (Checkpoint): Checkpoint of the whole range; shards at or below it are skipped.
+
+    Returns:
+        list: The (shard_start, shard_end) tuples that still failed after every retry.
+    """
+    shards = [
+        shard for shard in plan_shards(args.start_block, args.end_block, args.processes, args.shard_size)
+        if shard[1] > checkpoint.last_block
+    ]
+    total_blocks = sum(shard_end - max(shard_start - 1, checkpoint.last_block) for shard_start, shard_end in shards)
+    print(f"Ingesting {total_blocks} blocks in {len(shards)} shard(s) over {args.processes} process(es)")
+
+    context = multiprocessing.get_context("spawn")
+    progress_queue = context.Queue()
+    started_at = time.time()
+    done = threading.Event()
+    reporter = threading.Thread(target=report_progress, args=(progress_queue, total_blocks, started_at, done), daemon=True)
+    reporter.start()
+
+    committed = 0
+    pending = shards
+    try:
+        for attempt in range(1, args.shard_retries + 2):
+            if attempt > 1:
+                print(f"Retrying {len(pending)} failed shard(s), attempt {attempt}/{args.shard_retries + 1}")
+            failed = []
+            # A fresh pool per attempt, since a worker that died breaks the pool it belonged to
+            with ProcessPoolExecutor(max_workers=args.processes, mp_context=context,
+                                     initializer=_init_worker, initargs=(progress_queue,)) as executor:
+                futures = {
+                    executor.submit(run_shard, args, shard, max(shard[0] - 1, checkpoint.last_block)): shard
+                    for shard in pending
+                }
+                for future in as_completed(futures):
+                    shard = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # The worker process died, e.g. killed for memory
+                        result = {'shard': shard, 'committed': 0, 'failed_blocks': [], 'error': str(e)}
+                    committed += result['committed']
+                    if result['error'] or result['failed_blocks']:
+                        failed.append(shard)
+                        reason = result['error'] or f"{len(result['failed_blocks'])} failed block(s)"
+                        print(f"Shard {shard[0]}..{shard[1]} incomplete: {reason}")
+                    else:
+                        print(f"Shard {shard[0]}..{shard[1]} complete")
+            pending = sorted(failed)
+            if not pending:
+                break
+    finally:
+        done.set()
+        reporter.join()
+
+    elapsed = time.time() - started_at
+    print(f"Sharded ingest finished: {committed}/{total_blocks} blocks in {elapsed:.1f}s "
+          f"({committed / max(elapsed, 1e-9):.2f} blocks/s) with {args.processes} process(es) "
+          f"of {args.workers} worker(s)")
+    if pending:
+        print("Shards still incomplete; re-run each with its own range to retry it:")
+        for shard_start, shard_end in pending:
+            print(f"  --start_block {shard_start} --end_block {shard_end}")
+    else:
+        checkpoint.advance_to(args.end_block)
+        checkpoint.save()
+    return pending
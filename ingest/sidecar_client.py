@@ -0,0 +1,220 @@
+import random
+import threading
+import time
+from collections import namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 30
+DEFAULT_EJECT_AFTER = 3
+DEFAULT_EJECT_SECONDS = 30
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Weight of the newest request in an endpoint's moving average latency
+LATENCY_SMOOTHING = 0.2
+
+SidecarResponse = namedtuple('SidecarResponse', ['data', 'status_code', 'latency', 'attempts', 'url'])
+
+
+class SidecarError(Exception):
+    """
+    Raised when sidecar did not return a usable response.
+
+    Attributes:
+        status_code (int): HTTP status of the last attempt, or None if no response was received.
+        latency (float): Seconds spent on the last attempt.
+        attempts (int): Number of attempts made.
+    """
+
+    def __init__(self, message, status_code=None, latency=None, attempts=0):
+        super().__init__(message)
+        self.status_code = status_code
+        self.latency = latency
+        self.attempts = attempts
+
+
+class Endpoint:
+    """
+    Routing state of one sidecar instance.
+
+    Attributes:
+        url (str): Base URL of the instance.
+        latency (float): Moving average of its response time in seconds, or None before its first response.
+        in_flight (int): Requests currently sent to it.
+        failures (int): Consecutive failed requests.
+        ejected_until (float): time.monotonic() before which it receives no requests.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.latency = None
+        self.in_flight = 0
+        self.failures = 0
+        self.ejected_until = 0
+
+    def score(self):
+        # Endpoints with no response yet score 0, so every endpoint gets tried
+        return (self.latency or 0) * (self.in_flight + 1)
+
+
+class SidecarClient:
+    """
+    Client for the Substrate API Sidecar REST API.
+
+    Requests share one keep-alive session whose connection pool is sized for
+    pool_size concurrent callers, so the client can be shared by worker threads.
+    Connection errors, timeouts and 429/5xx responses are retried with exponential
+    backoff and full jitter; other errors are raised straight away.
+
+    endpoint may be a list of sidecar instances serving the same chain. Each
+    request then goes to the better of two randomly picked instances, by
+    average latency times requests in flight, so faster instances take more of
+    the load without one taking all of it. A retry avoids the instance that
+    just failed, and an instance that fails eject_after requests in a row is
+    left out for eject_seconds.
+    """
+
+    def __init__(self, endpoint, pool_size=10, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_base=DEFAULT_BACKOFF_BASE, backoff_max=DEFAULT_BACKOFF_MAX,
+                 eject_after=DEFAULT_EJECT_AFTER, eject_seconds=DEFAULT_EJECT_SECONDS):
+        urls = [endpoint] if isinstance(endpoint, str) else list(endpoint)
+        self.endpoints = [Endpoint(url.rstrip('/')) for url in urls]
+        if not self.endpoints:
+            raise ValueError("At least one sidecar endpoint is required")
+        self.endpoint = self.endpoints[0].url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self._lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def backoff_delay(self, attempt):
+        """
+        Seconds to wait after the given failed attempt (1-based), with full jitter.
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def _choose(self, avoid=None):
+        """
+        Pick the endpoint for the next request and count it as in flight.
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [endpoint for endpoint in self.endpoints if endpoint.ejected_until <= now]
+            if not candidates:
+                # Everything is ejected: use the endpoint that comes back first rather than fail
+                candidates = [min(self.endpoints, key=lambda endpoint: endpoint.ejected_until)]
+            if avoid is not None and len(candidates) > 1:
+                candidates = [endpoint for endpoint in candidates if endpoint is not avoid]
+            if len(candidates) > 2:
+                candidates = random.sample(candidates, 2)
+            endpoint = min(candidates, key=Endpoint.score)
+            endpoint.in_flight += 1
+            return endpoint
+
+    def _record(self, endpoint, latency, failed):
+        with self._lock:
+            endpoint.in_flight -= 1
+            if failed:
+                endpoint.failures += 1
+                now = time.monotonic()
+                # Requests already in flight when it was ejected do not eject it again
+                if endpoint.failures >= self.eject_after and len(self.endpoints) > 1 and endpoint.ejected_until <= now:
+                    endpoint.ejected_until = now + self.eject_seconds
+                    endpoint.failures = 0
+                    print(f"Ejecting sidecar {endpoint.url} for {self.eject_seconds}s after {self.eject_after} failed requests")
+                return
+            endpoint.failures = 0
+            if endpoint.latency is None:
+                endpoint.latency = latency
+            else:
+                endpoint.latency += LATENCY_SMOOTHING * (latency - endpoint.latency)
+
+    def get(self, path, params=None):
+        """
+        GET a sidecar path and decode the JSON body.
+
+        Returns:
+            SidecarResponse: The decoded body with the status code, latency and attempt count.
+
+        Raises:
+            SidecarError: If the request failed with a non-retryable status or all retries were exhausted.
+        """
+        attempts = 1 + max(0, self.max_retries)
+        endpoint = None
+        for attempt in range(1, attempts + 1):
+            endpoint = self._choose(avoid=endpoint)
+            url = f"{endpoint.url}{path}"
+            started_at = time.monotonic()
+            status_code = None
+            failed = True
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                latency = time.monotonic() - started_at
+                status_code = response.status_code
+                if status_code == 200:
+                    data = response.json()
+                    failed = False
+                    return SidecarResponse(data, status_code, latency, attempt, url)
+                error = f"HTTP {status_code}"
+                if status_code not in RETRYABLE_STATUS_CODES:
+                    # The instance answered; the request itself is at fault
+                    failed = False
+                    raise SidecarError(f"GET {url} failed: {error}", status_code, latency, attempt)
+            except (requests.ConnectionError, requests.Timeout, ValueError) as e:
+                latency = time.monotonic() - started_at
+                error = str(e)
+            finally:
+                self._record(endpoint, time.monotonic() - started_at, failed)
+                metrics.sidecar_request(time.monotonic() - started_at, 'error' if failed else 'ok')
+
+            if attempt == attempts:
+                raise SidecarError(f"GET {url} failed after {attempt} attempts: {error}", status_code, latency, attempt)
+            delay = self.backoff_delay(attempt)
+            metrics.sidecar_retry()
+            print(f"GET {url} attempt {attempt} failed ({error}, {latency:.2f}s). Retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+    def get_block(self, block_id):
+        return self.get(f"/blocks/{block_id}")
+
+    def get_header(self, block_id):
+        return self.get(f"/blocks/{block_id}/header")
+
+    def get_head(self, finalized=True):
+        return self.get("/blocks/head", params=None if finalized else {'finalized': 'false'})
+
+    def get_head_header(self, finalized=True):
+        return self.get("/blocks/head/header", params=None if finalized else {'finalized': 'false'})
+
+    def close(self):
+        self.session.close()
+
+
+_default_clients = {}
+_default_clients_lock = threading.Lock()
+
+
+def get_default_client(endpoint):
+    """
+    Return a shared SidecarClient with default settings for endpoint.
+    """
+    with _default_clients_lock:
+        client = _default_clients.get(endpoint)
+        if client is None:
+            client = SidecarClient(endpoint)
+            _default_clients[endpoint] = client
+        return client
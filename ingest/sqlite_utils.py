@@ -0,0 +1,404 @@
+# SQLite Database Utilities
+"""
+Embedded single-file backend for dev boxes and single-node analytics.
+
+The database is the file at --db_path (a directory gets a dotlake.sqlite file
+inside it). It uses the same tables as the MySQL and Postgres backends, with
+JSON columns stored as text. Fees and tips are text too, since they can exceed
+64 bits. Connections use WAL journaling, so the explorer can read while ingest
+writes, and synchronous=NORMAL, so a commit does not wait for an fsync.
+Batches are written with executemany inside one transaction.
+
+Only one connection can write at a time; the others wait up to
+BUSY_TIMEOUT seconds for the write lock.
+"""
+import os
+import sqlite3
+
+import pandas as pd
+from serializer import sql_row, record_row, extrinsic_records, event_records, EXTRINSIC_COLUMNS, EVENT_COLUMNS
+
+DEFAULT_FILE_NAME = "dotlake.sqlite"
+BUSY_TIMEOUT = 30
+# Page cache per connection, in KiB
+CACHE_SIZE_KB = 65536
+
+def connect_to_sqlite(path):
+    """
+    Open the SQLite database file, creating it if needed, with WAL journaling.
+
+    Args:
+        path (str): The database file, or a directory to create dotlake.sqlite in.
+
+    Returns:
+        sqlite3.Connection: A connection object if successful, None otherwise.
+    """
+    try:
+        if os.path.isdir(path):
+            path = os.path.join(path, DEFAULT_FILE_NAME)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Pooled connections are handed between threads, but only used by one at a time
+        connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+        connection.execute("PRAGMA temp_store=MEMORY")
+        return connection
+    except sqlite3.Error as e:
+        print(f"Error connecting to SQLite database {path}: {e}")
+    return None
+
+def create_tables(connection, chain, relay_chain, reset=False):
+    """
+    Create necessary tables in the SQLite database if they don't exist.
+
+    Existing tables and their data are kept so ingest can resume from its
+    checkpoint, unless reset is set.
+
+    Args:
+        connection (sqlite3.Connection): The database connection object.
+        reset (bool): Drop the blocks table and this chain's checkpoints first.
+    """
+    try:
+        if reset:
+            for table_name in block_table_names(chain, relay_chain):
+                delete_table(connection, table_name)
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS blocks_{relay_chain}_{chain} (
+                relay_chain TEXT,
+                chain TEXT,
+                timestamp INTEGER,
+                number INTEGER PRIMARY KEY,
+                hash TEXT,
+                parenthash TEXT,
+                stateroot TEXT,
+                extrinsicsroot TEXT,
+                authorid TEXT,
+                finalized INTEGER,
+                extrinsics TEXT,
+                onfinalize TEXT,
+                oninitialize TEXT,
+                logs TEXT,
+                extrinsic_count INTEGER,
+                event_count INTEGER,
+                signed_extrinsic_count INTEGER,
+                failed_extrinsic_count INTEGER,
+                total_fee TEXT,
+                total_tip TEXT,
+                weight INTEGER
+            )
+        """)
+        # number is the rowid, so head lookups and range scans in either direction use it directly
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS blocks_{relay_chain}_{chain}_hash ON blocks_{relay_chain}_{chain} (hash)")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+                relay_chain TEXT,
+                chain TEXT,
+                stream TEXT,
+                last_block INTEGER NOT NULL,
+                updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (relay_chain, chain, stream)
+            )
+        """)
+        if reset:
+            cursor.execute(
+                "DELETE FROM ingest_checkpoints WHERE relay_chain = ? AND chain = ?",
+                (relay_chain, chain)
+            )
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS extrinsics_{relay_chain}_{chain} (
+                number INTEGER NOT NULL,
+                extrinsic_index INTEGER NOT NULL,
+                hash TEXT,
+                pallet TEXT NOT NULL,
+                method TEXT NOT NULL,
+                signer TEXT,
+                nonce INTEGER,
+                tip TEXT,
+                fee TEXT,
+                success INTEGER,
+                paysfee INTEGER,
+                PRIMARY KEY (number, extrinsic_index)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS events_{relay_chain}_{chain} (
+                number INTEGER NOT NULL,
+                event_index INTEGER NOT NULL,
+                extrinsic_index INTEGER,
+                phase TEXT NOT NULL,
+                pallet TEXT NOT NULL,
+                method TEXT NOT NULL,
+                data TEXT,
+                PRIMARY KEY (number, event_index)
+            ) WITHOUT ROWID
+        """)
+        for table_name, index_name, columns in SECONDARY_INDEXES:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table_name}_{relay_chain}_{chain}_{index_name} "
+                f"ON {table_name}_{relay_chain}_{chain} ({columns})"
+            )
+        connection.commit()
+        print("Tables created successfully")
+    except sqlite3.Error as e:
+        print(f"Error creating tables: {e}")
+
+# (table, index name, columns) of the extrinsics and events indexes, as on the other SQL backends
+SECONDARY_INDEXES = (
+    ("extrinsics", "pallet_method", "pallet, method"),
+    ("extrinsics", "signer", "signer, pallet, method"),
+    ("extrinsics", "signer_number", "signer, number DESC, extrinsic_index DESC"),
+    ("extrinsics", "hash", "hash"),
+    ("events", "pallet_method", "pallet, method"),
+)
+
+BLOCK_COLUMNS = (
+    "relay_chain", "chain", "timestamp", "number", "hash", "parenthash", "stateroot",
+    "extrinsicsroot", "authorid", "finalized", "extrinsics", "onfinalize", "oninitialize", "logs",
+    "extrinsic_count", "event_count", "signed_extrinsic_count", "failed_extrinsic_count",
+    "total_fee", "total_tip", "weight"
+)
+
+
+def block_table_names(chain, relay_chain):
+    """
+    Names of the tables written for each block: the blocks table, then the
+    normalized extrinsics and events tables.
+    """
+    return (f"blocks_{relay_chain}_{chain}", f"extrinsics_{relay_chain}_{chain}", f"events_{relay_chain}_{chain}")
+
+
+def replace_block_details(cursor, blocks, chain_name, relay_chain):
+    """
+    Replace the extrinsics and events rows of the given blocks, on the caller's transaction.
+
+    Existing rows are deleted first, so re-ingesting a block never leaves rows
+    from an earlier version of it behind.
+
+    Args:
+        cursor (sqlite3.Cursor): A cursor on the database connection.
+        blocks (list): The block data dicts whose details are written.
+        chain_name (str): The name of the chain.
+        relay_chain (str): The name of the relay chain.
+    """
+    _, extrinsics_table, events_table = block_table_names(chain_name, relay_chain)
+    numbers = [(block_data['number'],) for block_data in blocks]
+    for table_name, columns, records in (
+        (extrinsics_table, EXTRINSIC_COLUMNS, extrinsic_records),
+        (events_table, EVENT_COLUMNS, event_records),
+    ):
+        cursor.executemany(f"DELETE FROM {table_name} WHERE number = ?", numbers)
+        cursor.executemany(
+            f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})",
+            (record_row(record, columns) for block_data in blocks for record in records(block_data))
+        )
+
+
+def block_row(block_data):
+    """
+    Build the row tuple for a block, in BLOCK_COLUMNS order.
+    """
+    return sql_row(block_data, BLOCK_COLUMNS)
+
+
+def insert_block_data(connection, block_data, chain_name, relay_chain):
+    """
+    Insert processed block data into the SQLite database.
+
+    Args:
+        connection (sqlite3.Connection): The database connection object.
+        block_data (dict): The block data to be inserted.
+    """
+    insert_blocks_data(connection, [block_data], chain_name, relay_chain)
+
+
+def insert_blocks_data(connection, blocks, chain_name, relay_chain):
+    """
+    Upsert many blocks, with their extrinsics and events, using executemany and one commit.
+
+    Args:
+        connection (sqlite3.Connection): The database connection object.
+        blocks (list): The block data dicts to be inserted.
+        chain_name (str): The name of the chain.
+        relay_chain (str): The name of the relay chain.
+    """
+    try:
+        cursor = connection.cursor()
+        update_clause = ", ".join(f"{column} = excluded.{column}" for column in BLOCK_COLUMNS if column != "number")
+        block_insert_query = f"""
+        INSERT INTO blocks_{relay_chain}_{chain_name} ({", ".join(BLOCK_COLUMNS)})
+        VALUES ({", ".join(["?"] * len(BLOCK_COLUMNS))})
+        ON CONFLICT (number) DO UPDATE SET {update_clause}
+        """
+        cursor.executemany(block_insert_query, [block_row(block_data) for block_data in blocks])
+        replace_block_details(cursor, blocks, chain_name, relay_chain)
+        connection.commit()
+        print(f"{len(blocks)} blocks inserted/updated successfully")
+    except sqlite3.Error as e:
+        print(f"Error inserting block batch: {e}")
+        connection.rollback()
+        raise
+
+def query_block_data(connection, query_str, params=None):
+    """
+    Execute a given SQL query on the SQLite database and return the results as a DataFrame.
+
+    Args:
+        connection (sqlite3.Connection): The database connection object.
+        query_str (str): The SQL query string to execute.
+        params (dict): Values bound to :name placeholders in query_str.
+
+    Returns:
+        pandas.DataFrame: The query results as a DataFrame, or None if an error occurs.
+    """
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        cursor.execute(query_str, params or {})
+        columns = [description[0] for description in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+    except sqlite3.Error as e:
+        print(f"Error executing query: {e}")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+def mark_finalized(connection, chain, relay_chain, start_block, end_block):
+    """
+    Set finalized on blocks start_block..end_block (inclusive) with a single UPDATE.
+    """
+    try:
+        connection.execute(f"""
+            UPDATE blocks_{relay_chain}_{chain} SET finalized = 1
+            WHERE number BETWEEN ? AND ? AND finalized IS NOT 1
+        """, (start_block, end_block))
+        connection.commit()
+    except sqlite3.Error as e:
+        print(f"Error marking blocks finalized: {e}")
+        connection.rollback()
+        raise
+
+
+def delete_unfinalized_blocks(connection, chain, relay_chain, above_block):
+    """
+    Delete the unfinalized blocks above above_block, with their extrinsics and events, in one transaction.
+    """
+    blocks_table, extrinsics_table, events_table = block_table_names(chain, relay_chain)
+    try:
+        for table_name in (extrinsics_table, events_table):
+            connection.execute(f"""
+                DELETE FROM {table_name} WHERE number IN (
+                    SELECT number FROM {blocks_table} WHERE number > ? AND finalized IS NOT 1
+                )
+            """, (above_block,))
+        connection.execute(f"DELETE FROM {blocks_table} WHERE number > ? AND finalized IS NOT 1", (above_block,))
+        connection.commit()
+    except sqlite3.Error as e:
+        print(f"Error deleting blocks above {above_block}: {e}")
+        connection.rollback()
+        raise
+
+
+def defer_secondary_indexes(connection, chain, relay_chain):
+    """
+    Drop the secondary indexes of the blocks, extrinsics and events tables before a bulk load.
+
+    Primary keys are kept because the upserts rely on them.
+
+    Returns:
+        list: The CREATE INDEX statements needed to restore the dropped indexes.
+    """
+    try:
+        cursor = connection.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            f"AND tbl_name IN ({', '.join(['?'] * 3)})",
+            block_table_names(chain, relay_chain)
+        )
+        indexes = cursor.fetchall()
+        for index_name, _ in indexes:
+            connection.execute(f"DROP INDEX IF EXISTS {index_name}")
+        connection.commit()
+        print(f"Deferred {len(indexes)} secondary indexes on the {relay_chain} {chain} tables")
+        return [index_definition for _, index_definition in indexes]
+    except sqlite3.Error as e:
+        print(f"Error deferring secondary indexes: {e}")
+        connection.rollback()
+        raise
+
+
+def restore_secondary_indexes(connection, chain, relay_chain, index_definitions):
+    """
+    Recreate indexes dropped by defer_secondary_indexes and refresh planner statistics.
+    """
+    try:
+        for index_definition in index_definitions:
+            connection.execute(index_definition)
+        connection.execute("ANALYZE")
+        connection.commit()
+        print(f"Restored {len(index_definitions)} secondary indexes on the {relay_chain} {chain} tables")
+    except sqlite3.Error as e:
+        print(f"Error restoring secondary indexes: {e}")
+        connection.rollback()
+        raise
+
+
+def load_checkpoint(connection, chain, relay_chain, stream):
+    """
+    Read the last committed block recorded for an ingest stream.
+
+    Returns:
+        int: The last committed block number, or None if the stream has no checkpoint.
+    """
+    row = connection.execute(
+        "SELECT last_block FROM ingest_checkpoints WHERE relay_chain = ? AND chain = ? AND stream = ?",
+        (relay_chain, chain, stream)
+    ).fetchone()
+    return None if row is None else int(row[0])
+
+
+def save_checkpoint(connection, chain, relay_chain, stream, last_block):
+    """
+    Record the last committed block for an ingest stream.
+    """
+    try:
+        connection.execute("""
+            INSERT INTO ingest_checkpoints (relay_chain, chain, stream, last_block)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (relay_chain, chain, stream) DO UPDATE SET last_block = excluded.last_block, updated_at = CURRENT_TIMESTAMP
+        """, (relay_chain, chain, stream, last_block))
+        connection.commit()
+    except sqlite3.Error as e:
+        print(f"Error saving checkpoint: {e}")
+        connection.rollback()
+        raise
+
+
+def delete_table(connection, table_name):
+    """
+    Delete a table from the SQLite database if it exists.
+
+    Args:
+        connection (sqlite3.Connection): The database connection object.
+        table_name (str): The name of the table to delete.
+    """
+    try:
+        connection.execute(f"DROP TABLE IF EXISTS {table_name}")
+        connection.commit()
+        print(f"Table '{table_name}' deleted successfully (if it existed)")
+    except sqlite3.Error as e:
+        print(f"Error deleting table '{table_name}': {e}")
+
+
+def close_connection(connection):
+    """
+    Safely close the SQLite database connection.
+
+    Args:
+        connection (sqlite3.Connection): The database connection object.
+    """
+    connection.commit()
+    connection.close()
+    print("SQLite connection closed")
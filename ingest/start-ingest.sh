@@ -7,6 +7,7 @@ echo "Connection Info"
 echo "Chain: $CHAIN"
 echo "Relay Chain: $RELAY_CHAIN"
 echo "WebSocket URL: $WSS"
+echo "Sidecar Endpoints: $SIDECAR_ENDPOINTS"
 echo "Database Type: $DB_TYPE"
 echo "Database Path: $DB_PATH"
 echo "Database Project: $DB_PROJECT"
@@ -22,11 +23,57 @@ echo "SQLAlchemy URI: $SQLALCHEMY_URI"
 echo "Ingest Mode: $INGEST_MODE"
 echo "Start Block: $START_BLOCK"
 echo "End Block: $END_BLOCK"
+echo "Workers: ${WORKERS:-1}"
+echo "Processes: ${PROCESSES:-1}"
+echo "Shard Size: $SHARD_SIZE"
+echo "Database Pool Size: $DB_POOL_SIZE"
+echo "Batch Size: ${BATCH_SIZE:-50}"
+echo "Batch Linger: ${BATCH_LINGER:-5}"
+echo "Bulk Load: ${BULK_LOAD:-false}"
+echo "Reset Tables: ${RESET_TABLES:-false}"
+echo "Head Subscription: ${HEAD_SUBSCRIPTION:-true}"
+echo "Best Blocks: ${BEST_BLOCKS:-false}"
+echo "Block Cache: $BLOCK_CACHE"
+echo "Block Cache Size (MB): $BLOCK_CACHE_SIZE_MB"
+echo "From Cache: ${FROM_CACHE:-false}"
+echo "Metrics Port: $METRICS_PORT"
+echo "Parquet Partition By: ${PARQUET_PARTITION_BY:-range}"
+echo "Parquet Range Size: $PARQUET_RANGE_SIZE"
+echo "Parquet Row Group Size: $PARQUET_ROW_GROUP_SIZE"
+echo "Parquet Compression: $PARQUET_COMPRESSION"
+echo "BigQuery Write Method: ${BIGQUERY_WRITE_METHOD:-load}"
+echo "BigQuery Load Size: $BIGQUERY_LOAD_SIZE"
+echo "BigQuery Load Interval: $BIGQUERY_LOAD_INTERVAL"
+
+BULK_LOAD_FLAG=""
+if [[ "$BULK_LOAD" == "true" ]]; then
+    BULK_LOAD_FLAG="--bulk_load"
+fi
+
+RESET_TABLES_FLAG=""
+if [[ "$RESET_TABLES" == "true" ]]; then
+    RESET_TABLES_FLAG="--reset_tables"
+fi
+
+POLL_ONLY_FLAG=""
+if [[ "$HEAD_SUBSCRIPTION" == "false" ]]; then
+    POLL_ONLY_FLAG="--poll_only"
+fi
+
+BEST_BLOCKS_FLAG=""
+if [[ "$BEST_BLOCKS" == "true" ]]; then
+    BEST_BLOCKS_FLAG="--best_blocks"
+fi
+
+FROM_CACHE_FLAG=""
+if [[ "$FROM_CACHE" == "true" ]]; then
+    FROM_CACHE_FLAG="--from_cache"
+fi
 
 
 # Start the main.py script
 echo "Starting main.py script..."
-python3 main.py --chain "$CHAIN" --relay_chain "$RELAY_CHAIN" --wss "$WSS" --db_path "$DB_PATH" --database "$DB_TYPE" --db_project "$DB_PROJECT" --db_cred_path "$DB_CRED_PATH" --db_credentials "$DB_CREDENTIALS" --db_dataset "$DB_DATASET" --db_table "$DB_TABLE" --db_host "$DB_HOST" --db_port "$DB_PORT" --db_user "$DB_USER" --db_password "$DB_PASSWORD" --db_name "$DB_NAME" --ingest_mode "$INGEST_MODE" --start_block "$START_BLOCK" --end_block "$END_BLOCK" 2>&1 &
+python3 main.py --chain "$CHAIN" --relay_chain "$RELAY_CHAIN" --wss "$WSS" ${SIDECAR_ENDPOINTS:+--sidecar_url "$SIDECAR_ENDPOINTS"} --db_path "$DB_PATH" --database "$DB_TYPE" --db_project "$DB_PROJECT" --db_cred_path "$DB_CRED_PATH" --db_credentials "$DB_CREDENTIALS" --db_dataset "$DB_DATASET" --db_table "$DB_TABLE" --db_host "$DB_HOST" --db_port "$DB_PORT" --db_user "$DB_USER" --db_password "$DB_PASSWORD" --db_name "$DB_NAME" --ingest_mode "$INGEST_MODE" --start_block "$START_BLOCK" --end_block "$END_BLOCK" --workers "${WORKERS:-1}" --processes "${PROCESSES:-1}" ${SHARD_SIZE:+--shard_size "$SHARD_SIZE"} ${DB_POOL_SIZE:+--db_pool_size "$DB_POOL_SIZE"} --batch_size "${BATCH_SIZE:-50}" --batch_linger "${BATCH_LINGER:-5}" $BULK_LOAD_FLAG $RESET_TABLES_FLAG $POLL_ONLY_FLAG $BEST_BLOCKS_FLAG ${BLOCK_CACHE:+--block_cache "$BLOCK_CACHE"} ${BLOCK_CACHE_SIZE_MB:+--block_cache_size_mb "$BLOCK_CACHE_SIZE_MB"} $FROM_CACHE_FLAG ${METRICS_PORT:+--metrics_port "$METRICS_PORT"} --parquet_partition_by "${PARQUET_PARTITION_BY:-range}" ${PARQUET_RANGE_SIZE:+--parquet_range_size "$PARQUET_RANGE_SIZE"} ${PARQUET_ROW_GROUP_SIZE:+--parquet_row_group_size "$PARQUET_ROW_GROUP_SIZE"} ${PARQUET_COMPRESSION:+--parquet_compression "$PARQUET_COMPRESSION"} --bigquery_write_method "${BIGQUERY_WRITE_METHOD:-load}" ${BIGQUERY_LOAD_SIZE:+--bigquery_load_size "$BIGQUERY_LOAD_SIZE"} ${BIGQUERY_LOAD_INTERVAL:+--bigquery_load_interval "$BIGQUERY_LOAD_INTERVAL"} 2>&1 &
 
 
 # Start the Streamlit app
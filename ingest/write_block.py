@@ -1,74 +1,156 @@
-import requests
-from google.cloud import storage
-import datetime
-import json
-import logging
-
-def writeBlock(request, database_info):
-    request_json = request
-    logging.basicConfig(level='INFO')
-    logging.getLogger('writeBlock-logger')
-    logger = logging.getLogger('writeBlock-logger')
-    block_id = request_json['blockId']
-    url = request_json['endpoint']
-    chain_name = request_json['chainName']
-    relay_chain = request_json['relayChain']
-    bucket = request_json['bucket']
-    block_data = requests.get(f'{url}/blocks/{block_id}').json()
+from sidecar_client import get_default_client
+import time
+import metrics
+import profiling
+
+def fetchBlock(request, sidecar_client=None):
+    """
+    Fetch the raw sidecar JSON for the block in a block write request.
+
+    Args:
+        request (dict): The block write request.
+        sidecar_client (SidecarClient): Client to fetch with. Defaults to a shared
+            client for request['endpoint'].
+
+    Returns:
+        dict: The block as returned by sidecar.
+    """
+    block_id = request['blockId']
+    if sidecar_client is None:
+        sidecar_client = get_default_client(request['endpoint'])
+    response = sidecar_client.get_block(block_id)
+    block_data = response.data
     if int(block_id) != int(block_data['number']):
-        raise Exception(f"Block Id mismatch for {block_id}. Sidecar cloud run service returned wrong block. "
+        raise Exception(f"Block Id mismatch for {block_id}. Sidecar cloud run service returned wrong block "
+                        f"(HTTP {response.status_code} in {response.latency:.2f}s from {response.url}). "
                         f"Returned block data {block_data}")
-    block_id = block_data['number']
+    return block_data
+
+
+def prepareBlock(request, sidecar_client=None):
+    """
+    Fetch a block from sidecar and transform it into the row format the
+    database backends expect.
+
+    Returns:
+        dict: The transformed block, or None if sidecar returned an incomplete block.
+    """
+    started_at = time.perf_counter()
+    block_data = fetchBlock(request, sidecar_client)
+    fetched_at = time.perf_counter()
+    with profiling.transform_stage():
+        row = transformBlock(block_data, request['chainName'], request['relayChain'])
+    transformed_at = time.perf_counter()
+    metrics.transform_time(transformed_at - fetched_at)
+    if row is not None:
+        profiling.record_block(row['number'], {'fetch': fetched_at - started_at, 'transform': transformed_at - fetched_at}, row)
+    return row
+
+
+def transformBlock(block_data, chain_name, relay_chain):
+    """
+    Transform raw sidecar block JSON in place into the row format the database
+    backends expect. Pure CPU work, safe to run in a worker thread or process.
+
+    Returns:
+        dict: The transformed block, or None if sidecar returned an incomplete block.
+    """
+    block_data['number'] = int(block_data['number'])
 
     ts = [ex['args']['now'] for ex in block_data['extrinsics'] if ex['method']['pallet'] == 'timestamp']
 
     try:
-        timestamp = ts[0]
-        timestamp = int(timestamp)
-        dt = datetime.datetime.fromtimestamp(int(timestamp) / 1000)
-        block_data['timestamp'] = timestamp
+        block_data['timestamp'] = int(ts[0])
     except ValueError:
-        timestamp = 0
-        dt = datetime.datetime(2020, 5, 1, 16, 20, 0)
-        block_data['timestamp'] = timestamp
+        block_data['timestamp'] = 0
     except IndexError:
         # Might be genesis, or very first blocks.
-        timestamp = 0
-        dt = datetime.datetime(2020, 4, 1, 16, 20, 0)
-        block_data['timestamp'] = timestamp
+        block_data['timestamp'] = 0
 
     block_data['relay_chain'] = relay_chain
     block_data['chain'] = chain_name
 
-    for log in block_data['logs']:
-        log['value'] = json.dumps(log['value'])
-
-    for event in block_data['onInitialize']['events']:
-        event['data'] = json.dumps(event['data'])
-
-    for event in block_data['onFinalize']['events']:
-        event['data'] = json.dumps(event['data'])
-
+    # JSON encoding of the nested structures happens once, per backend, in serializer.py
     for extrinsic in block_data['extrinsics']:
         if extrinsic['success'] is not True and extrinsic['success'] is not False:
-            return False
+            return None
         if extrinsic['paysFee'] is not True and extrinsic['paysFee'] is not False:
-            return False
-        extrinsic['args'] = json.dumps(extrinsic['args'])
-        extrinsic['info'] = json.dumps(extrinsic['info'])
-        for event in extrinsic['events']:
-            event['data'] = json.dumps(event['data'])
+            return None
 
     if block_data['finalized'] is not True and block_data['finalized'] is not False:
+        return None
+
+    summarizeBlock(block_data)
+    return block_data
+
+
+# Events whose data carries the DispatchInfo of an extrinsic, and its position in the data
+DISPATCH_INFO_EVENTS = {
+    ('system', 'ExtrinsicSuccess'): 0,
+    ('system', 'ExtrinsicFailed'): 1,
+}
+
+
+def dispatchWeight(event):
+    """
+    Return the ref time weight of an ExtrinsicSuccess/ExtrinsicFailed event, or 0 for any other event.
+    """
+    position = DISPATCH_INFO_EVENTS.get((event['method']['pallet'], event['method']['method']))
+    if position is None or len(event['data']) <= position:
+        return 0
+    weight = (event['data'][position] or {}).get('weight') or 0
+    if isinstance(weight, dict):
+        # Weights v2: {refTime, proofSize}; older runtimes report a plain number
+        weight = weight.get('refTime') or 0
+    return int(weight)
+
+
+def summarizeBlock(block_data):
+    """
+    Add the per-block summary columns to a transformed block, so dashboards can
+    read them without parsing the JSON columns.
+
+    Fees and tips are in the chain's smallest unit and kept as decimal strings,
+    since their sums can exceed 64 bits. Weight is the total ref time of the
+    block's extrinsics, from their dispatch info.
+    """
+    extrinsics = block_data['extrinsics']
+    total_fee = total_tip = weight = 0
+    for extrinsic in extrinsics:
+        total_fee += int((extrinsic.get('info') or {}).get('partialFee') or 0)
+        total_tip += int(extrinsic.get('tip') or 0)
+        weight += sum(dispatchWeight(event) for event in extrinsic['events'])
+
+    block_data['extrinsicCount'] = len(extrinsics)
+    block_data['eventCount'] = (
+        len(block_data['onInitialize']['events']) +
+        sum(len(extrinsic['events']) for extrinsic in extrinsics) +
+        len(block_data['onFinalize']['events'])
+    )
+    block_data['signedExtrinsicCount'] = sum(1 for extrinsic in extrinsics if extrinsic.get('signature'))
+    block_data['failedExtrinsicCount'] = sum(1 for extrinsic in extrinsics if extrinsic['success'] is False)
+    block_data['totalFee'] = str(total_fee)
+    block_data['totalTip'] = str(total_tip)
+    block_data['weight'] = weight
+    return block_data
+
+
+def writeBlock(request, database_info, sidecar_client=None):
+    chain_name = request['chainName']
+    relay_chain = request['relayChain']
+    block_data = prepareBlock(request, sidecar_client)
+    if block_data is None:
         return False
+    block_id = block_data['number']
 
     try:
-        from database_utils import connect_to_database, insert_block_data, close_connection
-        
-        db_connection = connect_to_database(database_info)
-        insert_block_data(database_info , db_connection, block_data, chain_name, relay_chain)
+        from database_utils import database_connection, insert_block_data
+
+        started_at = time.perf_counter()
+        with database_connection(database_info) as db_connection:
+            insert_block_data(database_info, db_connection, block_data, chain_name, relay_chain)
+        profiling.record_write(time.perf_counter() - started_at, 1)
         print(f"Successfully inserted block {block_id} into {database_info['database']}")
-        close_connection(db_connection, database_info)
     except Exception as e:
         print(f"Error inserting block {block_id} into {database_info['database']}: {str(e)}")
         return False